@@ -1,16 +1,50 @@
 from typing import Any
 import json
+import logging
 
 from dify_plugin import ToolProvider
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
 
+from tools.agent_cards import probe_agents, PROBE_BUDGET_SECONDS
+from tools.oauth import (
+    OAUTH2_CLIENT_CREDENTIALS,
+    OAuthError,
+    TokenEndpointUnreachableError,
+    client_credentials_header,
+    parse_client_credentials
+)
+from tools.rate_limit import parse_limit
+
+logger = logging.getLogger(__name__)
+
 
 class A2AProvider(ToolProvider):
+    def _build_auth_header(self, auth_type: str, api_key: str) -> dict[str, str]:
+        """
+        Build the appropriate Authorization header based on auth type.
+        """
+        if auth_type == "none" or not api_key:
+            return {}
+        elif auth_type == "bearer":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "api-key":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "basic":
+            import base64
+            encoded = base64.b64encode(api_key.encode()).decode()
+            return {"Authorization": f"Basic {encoded}"}
+        else:
+            return {"Authorization": f"Bearer {api_key}"}
+
     def _validate_credentials(self, credentials: dict[str, Any]) -> None:
         """
         Validate the credentials for the A2A Client.
         This is called when the user configures the tool provider.
-        Builds agents_registry from individual agent fields.
+        Builds agents_registry from individual agent fields, then concurrently probes
+        every agent's Agent Card so the connection pool and card cache are warm for the
+        first real call. Malformed configuration fails validation; an agent or token
+        endpoint that is merely unreachable right now is only logged, since it may be
+        down temporarily (Get Agent Capabilities reports it when called).
         """
         registry = {}
 
@@ -39,9 +73,26 @@ class A2AProvider(ToolProvider):
                     f"Agent {i} ({agent_name}): API Key/Token is required when auth type is '{auth_type}'"
                 )
 
+            # OAuth2 client credentials keep "client_id:client_secret" in the API Key field
+            token_url = credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = credentials.get(f"agent_{i}_oauth_scope", "").strip()
+            if auth_type == OAUTH2_CLIENT_CREDENTIALS:
+                try:
+                    parse_client_credentials(api_key)
+                except OAuthError as e:
+                    raise ToolProviderCredentialValidationError(f"Agent {i} ({agent_name}): {str(e)}")
+
             # Get description (optional)
             description = credentials.get(f"agent_{i}_description", "").strip()
 
+            # Limits are optional, but must be positive numbers when given
+            for field, label in (("max_concurrency", "Max Concurrent Requests"), ("rate_limit", "Rate Limit")):
+                value = str(credentials.get(f"agent_{i}_{field}") or "").strip()
+                if value and parse_limit(value) <= 0:
+                    raise ToolProviderCredentialValidationError(
+                        f"Agent {i} ({agent_name}): {label} must be a positive number, got '{value}'"
+                    )
+
             # Check for duplicate agent names
             if agent_name in registry:
                 raise ToolProviderCredentialValidationError(
@@ -53,7 +104,9 @@ class A2AProvider(ToolProvider):
                 "base_url": agent_url,
                 "auth_type": auth_type,
                 "api_key": api_key,
-                "description": description
+                "description": description,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
             }
 
         # Ensure at least one agent is configured
@@ -62,5 +115,38 @@ class A2AProvider(ToolProvider):
                 "At least one agent must be configured. Please fill in Agent 1 fields."
             )
 
+        # Probe all agents in parallel within one shared time budget.
+        # OAuth2 agents are probed without a token: Agent Cards are public and may name the token endpoint.
+        unreachable = probe_agents(
+            {
+                name: (
+                    config["base_url"],
+                    {} if config["auth_type"] == OAUTH2_CLIENT_CREDENTIALS
+                    else self._build_auth_header(config["auth_type"], config["api_key"])
+                )
+                for name, config in registry.items()
+            },
+            budget=PROBE_BUDGET_SECONDS
+        )
+        for name, error in sorted(unreachable.items()):
+            logger.warning("Could not reach agent '%s' while saving credentials: %s", name, error)
+
+        # Mint the first OAuth2 tokens now: this checks the client credentials, and the
+        # cache then keeps them fresh so tool calls never wait on the token endpoint
+        for name, config in registry.items():
+            if config["auth_type"] != OAUTH2_CLIENT_CREDENTIALS:
+                continue
+            if name in unreachable and not config["token_url"]:
+                # The token endpoint is named by the card, which could not be fetched
+                continue
+            try:
+                client_credentials_header(
+                    config["base_url"], config["api_key"], config["token_url"], config["oauth_scope"]
+                )
+            except TokenEndpointUnreachableError as e:
+                logger.warning("Could not mint a token for agent '%s' while saving credentials: %s", name, e)
+            except OAuthError as e:
+                raise ToolProviderCredentialValidationError(f"Agent '{name}': {str(e)}")
+
         # Validation complete - tools will build the registry at runtime from raw credential fields
         # Do not transform or store modified credentials here
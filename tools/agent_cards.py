@@ -0,0 +1,311 @@
+from typing import Any, Optional
+import json
+import threading
+import time
+from tools.http_pool import get_session
+from tools.memory_budget import get_accountant
+from tools.persistent_store import get_store
+
+# How long a fetched Agent Card is trusted before it must be fetched again
+CARD_TTL_SECONDS = 300
+
+# How long a card is kept on disk. Past CARD_TTL_SECONDS a stored card is still
+# served, and revalidated in the background (a conditional GET when the agent
+# sent an ETag or Last-Modified), so a restart does not wait on the agent.
+# Cards fetched with auth headers cannot be revalidated without credentials,
+# which are never stored, so they keep the CARD_TTL_SECONDS lifetime instead.
+PERSISTED_CARD_TTL_SECONDS = 6 * 60 * 60
+
+# Timeout of a background card revalidation
+CARD_REFRESH_TIMEOUT = 10
+
+CARD_NAMESPACE = "agent_card"
+
+# Well-known paths, preferred first (agent.json is the pre-0.3 name)
+AGENT_CARD_FILENAMES = ("agent-card.json", "agent.json")
+
+# Total time credential validation may spend probing every configured agent
+PROBE_BUDGET_SECONDS = 5
+
+# base_url -> (fetched_at, card, approximate size in bytes)
+_card_cache: dict[str, tuple[float, dict[str, Any], int]] = {}
+_card_cache_lock = threading.Lock()
+_card_cache_bytes = 0
+
+# Cards being revalidated in the background, so each is refreshed once at a time
+_refreshing: set[str] = set()
+
+
+def _cache_key(base_url: str) -> str:
+    return base_url.rstrip("/")
+
+
+def _put_locked(key: str, card: dict[str, Any], fetched_at: float) -> None:
+    global _card_cache_bytes
+    _drop_locked(key)
+    size = len(json.dumps(card, default=str))
+    _card_cache[key] = (fetched_at, card, size)
+    _card_cache_bytes += size
+
+
+def _drop_locked(key: str) -> None:
+    global _card_cache_bytes
+    entry = _card_cache.pop(key, None)
+    if entry is not None:
+        _card_cache_bytes -= entry[2]
+
+
+def card_cache_bytes() -> int:
+    """
+    Approximate bytes held by the in-memory Agent Card cache.
+    """
+    return _card_cache_bytes
+
+
+def evict_cards(nbytes: int) -> int:
+    """
+    Drop the oldest cached cards until at least nbytes are freed (they are refetched on demand).
+    Returns the bytes freed.
+    """
+    freed = 0
+    with _card_cache_lock:
+        for key in sorted(_card_cache, key=lambda k: _card_cache[k][0]):
+            if freed >= nbytes:
+                break
+            freed += _card_cache[key][2]
+            _drop_locked(key)
+    return freed
+
+
+def get_cached_card(base_url: str) -> Optional[dict[str, Any]]:
+    """
+    Return the cached Agent Card for an agent, or None if absent or expired.
+    Falls back to the on-disk store (when enabled) so cards survive plugin restarts;
+    a stored public card older than CARD_TTL_SECONDS is returned while it is revalidated.
+    """
+    key = _cache_key(base_url)
+    with _card_cache_lock:
+        entry = _card_cache.get(key)
+        if entry is not None:
+            fetched_at, card, _ = entry
+            if time.monotonic() - fetched_at <= CARD_TTL_SECONDS:
+                return card
+            _drop_locked(key)
+
+    store = get_store()
+    stored = store.get(CARD_NAMESPACE, key) if store else None
+    if not stored:
+        return None
+
+    age = time.time() - stored["fetched_at"]
+    if age > (CARD_TTL_SECONDS if stored.get("authenticated") else PERSISTED_CARD_TTL_SECONDS):
+        return None
+    with _card_cache_lock:
+        if age <= CARD_TTL_SECONDS:
+            _put_locked(key, stored["card"], time.monotonic() - age)
+            return stored["card"]
+        # Serve the stale card from memory until the refresh lands (or for one TTL if it fails)
+        _put_locked(key, stored["card"], time.monotonic())
+        refresh = key not in _refreshing
+        _refreshing.add(key)
+    if refresh:
+        threading.Thread(
+            target=_revalidate_card, args=(key, stored), name="a2a-card-refresh", daemon=True
+        ).start()
+    return stored["card"]
+
+
+def store_card(
+    base_url: str,
+    card: dict[str, Any],
+    validators: Optional[dict[str, str]] = None,
+    authenticated: bool = False
+) -> None:
+    """
+    Cache an Agent Card for an agent (in memory, and on disk when enabled).
+    validators holds the card's URL and the ETag/Last-Modified it was served with;
+    authenticated marks a card fetched with auth headers.
+    """
+    key = _cache_key(base_url)
+    with _card_cache_lock:
+        _put_locked(key, card, time.monotonic())
+
+    store = get_store()
+    if store:
+        store.put(
+            CARD_NAMESPACE, key,
+            {"fetched_at": time.time(), "card": card, "validators": validators or {}, "authenticated": authenticated},
+            ttl=PERSISTED_CARD_TTL_SECONDS
+        )
+
+
+def _validators(url: str, response: Any) -> dict[str, str]:
+    validators = {"url": url}
+    for header, name in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+        value = response.headers.get(header)
+        if isinstance(value, str) and value:
+            validators[name] = value
+    return validators
+
+
+def _revalidate_card(key: str, stored: dict[str, Any]) -> None:
+    """
+    Refresh a stale stored card. Sends a conditional GET when the card has validators
+    (a 304 only renews it), else fetches it again. Failures keep the stale card.
+    """
+    import requests
+
+    validators = stored.get("validators") or {}
+    conditional = {}
+    if validators.get("etag"):
+        conditional["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        conditional["If-Modified-Since"] = validators["last_modified"]
+
+    try:
+        if conditional and validators.get("url"):
+            response = get_session().get(validators["url"], headers=conditional, timeout=CARD_REFRESH_TIMEOUT)
+            if response.status_code == 304:
+                store_card(key, stored["card"], validators)
+                return
+            response.raise_for_status()
+            store_card(key, response.json(), _validators(validators["url"], response))
+        else:
+            _fetch_card(key, {}, CARD_REFRESH_TIMEOUT)
+    except (requests.exceptions.RequestException, ValueError):
+        pass
+    finally:
+        with _card_cache_lock:
+            _refreshing.discard(key)
+
+
+def clear_card_cache() -> None:
+    """
+    Drop every Agent Card cached in memory.
+    """
+    global _card_cache_bytes
+    with _card_cache_lock:
+        _card_cache.clear()
+        _card_cache_bytes = 0
+
+
+get_accountant().register_cache("agent_cards", card_cache_bytes, evict_cards)
+
+
+def _fetch_card(
+    base_url: str,
+    headers: dict[str, str],
+    timeout: float
+) -> tuple[Optional[dict[str, Any]], Optional[str], bool]:
+    """
+    Try each well-known path in turn.
+    Returns (card, last_error, reachable) where reachable means the server answered at all.
+    """
+    import requests
+
+    last_error = None
+    reachable = False
+
+    for filename in AGENT_CARD_FILENAMES:
+        agent_card_url = f"{base_url.rstrip('/')}/.well-known/{filename}"
+
+        try:
+            response = get_session().get(agent_card_url, headers=headers, timeout=timeout)
+            reachable = True
+            response.raise_for_status()
+            card = response.json()
+        except requests.exceptions.RequestException as e:
+            last_error = f"{filename}: {str(e)}"
+            continue  # Try next filename
+        except json.JSONDecodeError as e:
+            last_error = f"{filename}: Invalid JSON - {str(e)}"
+            continue
+
+        store_card(base_url, card, _validators(agent_card_url, response), authenticated=bool(headers))
+        return card, None, True
+
+    return None, last_error, reachable
+
+
+def fetch_agent_card(
+    base_url: str,
+    headers: dict[str, str],
+    timeout: float = 10
+) -> tuple[Optional[dict[str, Any]], Optional[str]]:
+    """
+    Fetch the Agent Card from /.well-known/agent-card.json (with fallback to agent.json).
+    Returns (card, None) on success and caches the card, or (None, last_error) on failure.
+    """
+    card, last_error, _ = _fetch_card(base_url, headers, timeout)
+    return card, last_error
+
+
+def probe_agents(
+    agents: dict[str, tuple[str, dict[str, str]]],
+    budget: float = PROBE_BUDGET_SECONDS
+) -> dict[str, str]:
+    """
+    Concurrently fetch the Agent Card of every agent within a total time budget.
+    agents maps agent name to (base_url, auth headers). Successful fetches warm the
+    card cache and the pooled connections as a side effect.
+    Returns {agent_name: error} for agents that could not be reached at all;
+    agents that answer without a card (e.g. 404) count as reachable.
+    """
+    if not agents:
+        return {}
+
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    unreachable: dict[str, str] = {}
+    executor = ThreadPoolExecutor(max_workers=len(agents), thread_name_prefix="a2a-probe")
+    futures = {
+        executor.submit(_fetch_card, base_url, headers, budget): name
+        for name, (base_url, headers) in agents.items()
+    }
+
+    try:
+        done, not_done = wait(futures, timeout=budget)
+        for future in done:
+            name = futures[future]
+            try:
+                _, last_error, reachable = future.result()
+            except Exception as e:
+                unreachable[name] = str(e)
+                continue
+            if not reachable:
+                unreachable[name] = last_error or "unreachable"
+        for future in not_done:
+            unreachable[futures[future]] = f"no response within {budget:g}s"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return unreachable
+
+
+def _parse_version(version: Any) -> tuple[int, ...]:
+    parts = []
+    for piece in str(version).split("."):
+        digits = "".join(ch for ch in piece if ch.isdigit())
+        if not digits:
+            break
+        parts.append(int(digits))
+    return tuple(parts)
+
+
+def supports_non_blocking_send(card: Optional[dict[str, Any]]) -> bool:
+    """
+    Whether an agent can be sent message/send with configuration.blocking=false.
+    MessageSendConfiguration.blocking exists from protocol 0.2.0 onwards, on every
+    transport (which one to use is negotiated by tools.transports.select_endpoint).
+    """
+    if not card:
+        return False
+
+    return _parse_version(card.get("protocolVersion", "")) >= (0, 2)
+
+
+def supports_push_notifications(card: Optional[dict[str, Any]]) -> bool:
+    """
+    Whether an agent accepts a pushNotificationConfig (capabilities.pushNotifications).
+    """
+    return bool(card) and (card.get("capabilities") or {}).get("pushNotifications") is True
@@ -0,0 +1,214 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import json
+import threading
+import time
+from tools.memory_budget import get_accountant
+from tools.persistent_store import scoped_key
+
+# Artifacts whose serialized size exceeds this are stored and replaced by a manifest
+INLINE_ARTIFACT_BYTES = 16 * 1024
+
+# Total size of the artifact store; least recently read artifacts are evicted first
+MAX_ARTIFACT_STORE_BYTES = 32 * 1024 * 1024
+
+# How long a stored artifact is kept
+ARTIFACT_TTL_SECONDS = 60 * 60
+
+RANGE_UNITS = ("lines", "bytes")
+
+# Default and maximum slice sizes returned by get_artifact
+DEFAULT_RANGE = {"lines": 200, "bytes": 8 * 1024}
+MAX_RANGE = {"lines": 2000, "bytes": 64 * 1024}
+
+
+def part_content(part: Any) -> str:
+    """
+    The readable content of a Part: text, JSON for data parts (one key per line),
+    base64 or URI for file parts.
+    """
+    if not isinstance(part, dict):
+        return json.dumps(part, indent=2, default=str)
+    kind = part.get("kind")
+    if kind == "text":
+        return str(part.get("text", ""))
+    if kind == "data":
+        return json.dumps(part.get("data"), indent=2, default=str)
+    if kind == "file":
+        file = part.get("file") or {}
+        return str(file.get("bytes") or file.get("uri") or "")
+    return json.dumps(part, indent=2, default=str)
+
+
+def readable_artifact(artifact: dict[str, Any]) -> dict[str, Any]:
+    """
+    The form artifacts are stored in: metadata plus each part's kind and readable content.
+    """
+    parts = []
+    for part in artifact.get("parts") or []:
+        entry = {"kind": part.get("kind", "unknown") if isinstance(part, dict) else "unknown"}
+        file = part.get("file") if isinstance(part, dict) else None
+        if isinstance(file, dict):
+            entry["mimeType"] = file.get("mimeType")
+            entry["name"] = file.get("name")
+        entry["content"] = part_content(part)
+        parts.append(entry)
+    stored = {"artifactId": artifact.get("artifactId"), "parts": parts}
+    for field in ("name", "description"):
+        if artifact.get(field):
+            stored[field] = artifact[field]
+    return stored
+
+
+def artifact_manifest(stored: dict[str, Any]) -> dict[str, Any]:
+    """
+    Compact description of a stored artifact: its ID, and the kind and size of each part.
+    """
+    manifest = {key: value for key, value in stored.items() if key != "parts"}
+    parts = []
+    total = 0
+    for index, part in enumerate(stored["parts"]):
+        size = len(part["content"].encode("utf-8"))
+        total += size
+        entry = {"index": index, "kind": part["kind"], "bytes": size, "lines": part["content"].count("\n") + 1}
+        for field in ("mimeType", "name"):
+            if part.get(field):
+                entry[field] = part[field]
+        parts.append(entry)
+    manifest.update({"stored": True, "bytes": total, "parts": parts})
+    return manifest
+
+
+def slice_content(content: str, unit: str, start: int, length: int) -> dict[str, Any]:
+    """
+    Cut a line or byte range out of a part's content.
+    Byte ranges are moved onto UTF-8 character boundaries so no character is split;
+    a range shorter than the character at start still returns that whole character,
+    so paging forward from end always advances.
+    """
+    if unit == "lines":
+        lines = content.split("\n")
+        end = min(len(lines), start + length)
+        return {
+            "unit": unit, "start": start, "end": end, "total": len(lines),
+            "content": "\n".join(lines[start:end]), "hasMore": end < len(lines)
+        }
+
+    data = content.encode("utf-8")
+    start = min(start, len(data))
+    end = min(len(data), start + length)
+    # UTF-8 continuation bytes look like 0b10xxxxxx
+    while start < len(data) and data[start] & 0xC0 == 0x80:
+        start += 1
+    while end < len(data) and end > start and data[end] & 0xC0 == 0x80:
+        end -= 1
+    if end == start and start < len(data) and length > 0:
+        end += 1
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end += 1
+    return {
+        "unit": unit, "start": start, "end": end, "total": len(data),
+        "content": data[start:end].decode("utf-8"), "hasMore": end < len(data)
+    }
+
+
+class ArtifactStore:
+    """
+    Size-bounded in-memory store for large task artifacts, keyed by agent,
+    credential, task and artifact ID, so get_artifact can serve slices of them
+    without the whole artifact ever entering the conversation.
+    """
+
+    def __init__(self, max_bytes: int = MAX_ARTIFACT_STORE_BYTES):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[float, dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+    @staticmethod
+    def key(base_url: str, credential: str, task_id: str, artifact_id: str) -> str:
+        return scoped_key(base_url, credential, task_id, artifact_id)
+
+    def _drop_locked(self, key: str) -> int:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        self._bytes -= entry[2]
+        return entry[2]
+
+    def put(self, key: str, artifact: dict[str, Any]) -> dict[str, Any]:
+        """
+        Store an artifact and return its manifest. Artifacts larger than the
+        whole store are not kept; get_artifact fetches those from the agent again.
+        """
+        stored = readable_artifact(artifact)
+        manifest = artifact_manifest(stored)
+        size = manifest["bytes"]
+        with self._lock:
+            self._drop_locked(key)
+            if size > self._max_bytes:
+                manifest["stored"] = False
+                return manifest
+            self._entries[key] = (time.monotonic(), stored, size)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                self._drop_locked(next(iter(self._entries)))
+        return manifest
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > ARTIFACT_TTL_SECONDS:
+                self._drop_locked(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+    def evict(self, nbytes: int) -> int:
+        """
+        Drop the least recently read artifacts; they are re-fetched from the agent on demand.
+        """
+        freed = 0
+        with self._lock:
+            while self._entries and freed < nbytes:
+                freed += self._drop_locked(next(iter(self._entries)))
+        return freed
+
+
+def offload_artifacts(view: Any, base_url: str, credential: str, task_id: str) -> Any:
+    """
+    Replace artifacts larger than INLINE_ARTIFACT_BYTES in a task view
+    (full, final-artifacts or delta) with manifests, storing the originals.
+    """
+    if not isinstance(view, dict):
+        return view
+
+    view = dict(view)
+    for field in ("artifacts", "updatedArtifacts"):
+        artifacts = view.get(field)
+        if not isinstance(artifacts, list):
+            continue
+        replaced = []
+        for index, artifact in enumerate(artifacts):
+            if isinstance(artifact, dict) and len(json.dumps(artifact, default=str)) > INLINE_ARTIFACT_BYTES:
+                artifact_id = str(artifact.get("artifactId", index))
+                key = ArtifactStore.key(base_url, credential, task_id, artifact_id)
+                artifact = artifact_store.put(key, {**artifact, "artifactId": artifact_id})
+            replaced.append(artifact)
+        view[field] = replaced
+    return view
+
+
+# Shared by every GetTaskStatusTool and GetArtifactTool invocation in this process
+artifact_store = ArtifactStore()
+get_accountant().register_cache("artifacts", artifact_store.memory_bytes, artifact_store.evict)
@@ -1,11 +1,15 @@
 from collections.abc import Generator
-from typing import Any
+from typing import Any, Optional
 import json
-import uuid
-import base64
-import requests
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header
+from tools.agent_cards import get_cached_card
+from tools.file_parts import FILE_TRANSFER_MODES, build_file_parts
+from tools.memory_budget import MemoryBudgetExceededError, get_accountant
+from tools.rate_limit import AgentRateLimitedError, get_limiter, send_with_limits
+from tools.transports import read_result, select_endpoint, send_request
+from tools.profiling import profiled
 
 class CallAgentTool(Tool):
     def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
@@ -24,17 +28,30 @@ class CallAgentTool(Tool):
             auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
             api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
             description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            max_concurrency = self.runtime.credentials.get(f"agent_{i}_max_concurrency", "")
+            rate_limit = self.runtime.credentials.get(f"agent_{i}_rate_limit", "")
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
 
             registry[agent_name] = {
                 "base_url": agent_url,
                 "auth_type": auth_type,
                 "api_key": api_key,
-                "description": description
+                "description": description,
+                "max_concurrency": max_concurrency,
+                "rate_limit": rate_limit,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
             }
 
         return registry
 
-    def _build_auth_header(self, auth_type: str, api_key: str) -> dict[str, str]:
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
         """
         Build the appropriate Authorization header based on auth type.
         """
@@ -47,12 +64,20 @@ class CallAgentTool(Tool):
             return {"Authorization": f"Bearer {api_key}"}
         elif auth_type == "basic":
             # For basic auth, api_key should be in format "username:password"
+            import base64
             encoded = base64.b64encode(api_key.encode()).decode()
             return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
         else:
             # Default to Bearer if unknown type
             return {"Authorization": f"Bearer {api_key}"}
 
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
         Invoke the Call Agent tool (Synchronous message/send).
@@ -79,48 +104,73 @@ class CallAgentTool(Tool):
 
         instruction = tool_parameters.get("instruction")
 
-        # Construct JSON-RPC 2.0 Request with proper A2A Message object format
-        rpc_request = {
-            "jsonrpc": "2.0",
-            "method": "message/send",
-            "params": {
-                "message": {
-                    "kind": "message",
-                    "role": "user",
-                    "messageId": str(uuid.uuid4()),
-                    "parts": [
-                        {
-                            "kind": "text",
-                            "text": instruction
-                        }
-                    ]
+        # Dify files become FileParts, sent by URI or streamed inline as base64
+        file_transfer = tool_parameters.get("file_transfer") or "auto"
+        if file_transfer not in FILE_TRANSFER_MODES:
+            yield self.create_text_message(
+                f"Invalid file_transfer '{file_transfer}'. Use one of: {', '.join(FILE_TRANSFER_MODES)}."
+            )
+            return
+        try:
+            file_parts, inline_files = build_file_parts(tool_parameters.get("files"), file_transfer)
+        except ValueError as e:
+            yield self.create_text_message(f"Error: {str(e)}")
+            return
+
+        import uuid
+        import requests
+
+        # Proper A2A Message object format
+        message = {
+            "kind": "message",
+            "role": "user",
+            "messageId": str(uuid.uuid4()),
+            "parts": [
+                {
+                    "kind": "text",
+                    "text": instruction
                 }
-            },
-            "id": str(uuid.uuid4())
+            ] + file_parts
         }
 
+        # Transport negotiated from the cached Agent Card (JSON-RPC when there is none)
+        endpoint = select_endpoint(agent_base_url, get_cached_card(agent_base_url))
+
         # Build headers with appropriate authentication
         headers = {"Content-Type": "application/json"}
-        headers.update(self._build_auth_header(auth_type, api_key))
+        try:
+            headers.update(self._build_auth_header(auth_type, api_key, agent_config))
+        except OAuthError as e:
+            yield self.create_text_message(f"Auth Error: {str(e)}")
+            return
+
+        # Per-agent concurrency and rate limits (honors 429/503 Retry-After)
+        limiter = get_limiter(
+            agent_base_url,
+            agent_config.get("max_concurrency"),
+            agent_config.get("rate_limit")
+        )
 
         try:
-            response = requests.post(
-                agent_base_url,
-                json=rpc_request,
-                headers=headers,
-                timeout=60
-            )
-            response.raise_for_status()
+            # Response bodies count against the plugin's memory budget while they are held
+            with get_accountant().reserve_response(agent_base_url) as reservation:
+                response = send_with_limits(limiter, lambda: send_request(
+                    endpoint, "message/send", {"message": message}, headers, 60, inline_files
+                ))
+                reservation.charge_response(response)
 
-            rpc_response = response.json()
+                result, error = read_result(endpoint, response)
 
-            if "error" in rpc_response:
-                yield self.create_text_message(f"A2A Error: {json.dumps(rpc_response['error'])}")
-                return
+                if error is not None:
+                    yield self.create_text_message(f"A2A Error: {json.dumps(error)}")
+                    return
 
-            result = rpc_response.get("result")
-            yield self.create_text_message(json.dumps(result) if result is not None else "Success")
+                yield self.create_text_message(json.dumps(result) if result is not None else "Success")
 
+        except AgentRateLimitedError as e:
+            yield self.create_text_message(f"Rate Limited: {str(e)}")
+        except MemoryBudgetExceededError as e:
+            yield self.create_text_message(f"Memory Budget Exceeded: {str(e)}")
         except requests.exceptions.RequestException as e:
             yield self.create_text_message(f"Network Error: {str(e)}")
         except json.JSONDecodeError:
@@ -0,0 +1,240 @@
+from collections.abc import Generator
+from typing import Any, Optional
+import json
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header, scope_credential
+from tools.agent_cards import get_cached_card
+from tools.job_queue import Job, get_scheduler
+from tools.memory_budget import MemoryBudgetExceededError
+from tools.rate_limit import AgentRateLimitedError, get_limiter
+from tools.task_reaper import cancel_task, get_reaper
+from tools.task_views import task_state
+from tools.transports import select_endpoint
+from tools.profiling import profiled
+
+# Upper bound on task IDs per call
+MAX_CANCEL_TASKS = 100
+
+# Cancels sent at once; the agent's own max_concurrency still applies on top
+MAX_CANCEL_WORKERS = 8
+
+
+def parse_task_ids(value: Any) -> list[str]:
+    """
+    Accept a JSON array of task IDs or IDs separated by commas, spaces or newlines.
+    Duplicates are dropped, order is kept.
+    """
+    if isinstance(value, list):
+        ids = value
+    else:
+        text = str(value or "").strip()
+        if text.startswith("["):
+            ids = json.loads(text)
+            if not isinstance(ids, list):
+                raise ValueError("task_ids must be a JSON array of strings")
+        else:
+            ids = text.replace(",", " ").split()
+    return list(dict.fromkeys(str(task_id).strip() for task_id in ids if str(task_id).strip()))
+
+
+class CancelTaskTool(Tool):
+    def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
+        """
+        Build agents registry from raw credential fields.
+        This is called at runtime by the tool.
+        """
+        registry = {}
+
+        for i in range(1, 6):
+            agent_name = self.runtime.credentials.get(f"agent_{i}_name", "").strip()
+            if not agent_name:
+                continue
+
+            agent_url = self.runtime.credentials.get(f"agent_{i}_url", "").strip()
+            auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
+            api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
+            description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            max_concurrency = self.runtime.credentials.get(f"agent_{i}_max_concurrency", "")
+            rate_limit = self.runtime.credentials.get(f"agent_{i}_rate_limit", "")
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
+
+            registry[agent_name] = {
+                "base_url": agent_url,
+                "auth_type": auth_type,
+                "api_key": api_key,
+                "description": description,
+                "max_concurrency": max_concurrency,
+                "rate_limit": rate_limit,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
+            }
+
+        return registry
+
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
+        """
+        Build the appropriate Authorization header based on auth type.
+        """
+        if auth_type == "none" or not api_key:
+            return {}
+        elif auth_type == "bearer":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "api-key":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "basic":
+            import base64
+            encoded = base64.b64encode(api_key.encode()).decode()
+            return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
+        else:
+            return {"Authorization": f"Bearer {api_key}"}
+
+    def _cancel_one(
+        self,
+        endpoint: Any,
+        task_id: str,
+        headers: dict[str, str],
+        limiter: Any
+    ) -> dict[str, Any]:
+        """
+        Cancel one task and describe the outcome; errors use the same prefixes as the other tools.
+        """
+        import requests
+
+        try:
+            result, error = cancel_task(endpoint, task_id, headers, limiter)
+        except AgentRateLimitedError as e:
+            return {"taskId": task_id, "error": f"Rate Limited: {str(e)}"}
+        except MemoryBudgetExceededError as e:
+            return {"taskId": task_id, "error": f"Memory Budget Exceeded: {str(e)}"}
+        except requests.exceptions.RequestException as e:
+            return {"taskId": task_id, "error": f"Network Error: {str(e)}"}
+        except json.JSONDecodeError:
+            return {"taskId": task_id, "error": "Invalid JSON Response"}
+        except Exception as e:
+            return {"taskId": task_id, "error": f"Error: {str(e)}"}
+
+        if error is not None:
+            return {"taskId": task_id, "error": f"A2A Error: {json.dumps(error)}"}
+        return {"taskId": task_id, "state": task_state(result) or "canceled"}
+
+    def _cancel_job(
+        self,
+        endpoint: Any,
+        job: Job,
+        headers: dict[str, str],
+        limiter: Any
+    ) -> dict[str, Any]:
+        """
+        Cancel a queued submit_task job: dropped from the queue if it has not been sent yet,
+        otherwise the agent task it was submitted as is cancelled.
+        """
+        job_id = job.id
+        if get_scheduler().cancel(job):
+            return {"taskId": job_id, "state": "canceled"}
+        if job.task_id is None:
+            return {"taskId": job_id, "error": f"Error: Job '{job_id}' is already {job.state}"}
+        return {**self._cancel_one(endpoint, job.task_id, headers, limiter), "taskId": job_id, "agentTaskId": job.task_id}
+
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Invoke the Cancel Task tool (tasks/cancel).
+        Cancels one or many tasks on an agent concurrently and reports each outcome.
+        """
+        agents_registry = self._build_agents_registry()
+        if not agents_registry:
+            yield self.create_text_message("Agents Registry is not configured.")
+            return
+
+        agent_name = tool_parameters.get("agent_name")
+        if not agent_name or agent_name not in agents_registry:
+            yield self.create_text_message(f"Agent '{agent_name}' not found in registry.")
+            return
+
+        agent_config = agents_registry[agent_name]
+        agent_base_url = agent_config.get("base_url")
+        auth_type = agent_config.get("auth_type", "none")
+        api_key = agent_config.get("api_key", "")
+
+        if not agent_base_url:
+            yield self.create_text_message(f"Base URL missing for agent '{agent_name}'.")
+            return
+
+        try:
+            task_ids = parse_task_ids(tool_parameters.get("task_ids"))
+        except (ValueError, json.JSONDecodeError) as e:
+            yield self.create_text_message(f"Invalid task_ids: {str(e)}")
+            return
+        if not task_ids:
+            yield self.create_text_message("Invalid task_ids: no task ID given")
+            return
+        if len(task_ids) > MAX_CANCEL_TASKS:
+            yield self.create_text_message(f"Invalid task_ids: at most {MAX_CANCEL_TASKS} tasks per call")
+            return
+
+        # Transport negotiated from the cached Agent Card (JSON-RPC when there is none)
+        endpoint = select_endpoint(agent_base_url, get_cached_card(agent_base_url))
+
+        # Build headers with appropriate authentication
+        headers = {"Content-Type": "application/json"}
+        try:
+            headers.update(self._build_auth_header(auth_type, api_key, agent_config))
+        except OAuthError as e:
+            yield self.create_text_message(f"Auth Error: {str(e)}")
+            return
+
+        # Per-agent concurrency and rate limits (honors 429/503 Retry-After)
+        limiter = get_limiter(
+            agent_base_url,
+            agent_config.get("max_concurrency"),
+            agent_config.get("rate_limit")
+        )
+
+        def cancel(task_id: str) -> dict[str, Any]:
+            # Only handles the job queue holds are jobs; anything else is an agent task ID
+            job = get_scheduler().find(task_id, agent_base_url, scope_credential(headers))
+            if job is not None:
+                return self._cancel_job(endpoint, job, headers, limiter)
+            return self._cancel_one(endpoint, task_id, headers, limiter)
+
+        if len(task_ids) == 1:
+            results = [cancel(task_ids[0])]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(
+                max_workers=min(len(task_ids), MAX_CANCEL_WORKERS),
+                thread_name_prefix="a2a-cancel"
+            ) as executor:
+                results = list(executor.map(cancel, task_ids))
+
+        # Whatever the outcome, the caller has taken charge of these tasks
+        reaper = get_reaper()
+        if reaper:
+            for result in results:
+                task_id = result.get("agentTaskId", result["taskId"])
+                reaper.forget(agent_base_url, scope_credential(headers), task_id)
+
+        if len(results) == 1 and "error" in results[0]:
+            yield self.create_text_message(results[0]["error"])
+            return
+
+        canceled = sum(1 for result in results if "error" not in result)
+        yield self.create_text_message(json.dumps({
+            "canceled": canceled,
+            "failed": len(results) - canceled,
+            "results": results
+        }))
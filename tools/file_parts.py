@@ -0,0 +1,157 @@
+from collections.abc import Iterator
+from typing import Any, Optional
+import json
+from tools.http_pool import get_session
+
+FILE_TRANSFER_MODES = ("auto", "uri", "bytes")
+
+# Raw bytes read from the source per chunk; a multiple of 3 so each chunk base64-encodes without padding
+UPLOAD_CHUNK_BYTES = 48 * 1024
+
+# How long downloading a Dify file for inline upload may stall
+FILE_DOWNLOAD_TIMEOUT = 60
+
+
+def _file_field(file: Any, name: str) -> Any:
+    if isinstance(file, dict):
+        return file.get(name)
+    return getattr(file, name, None)
+
+
+def normalize_files(value: Any) -> list[Any]:
+    """
+    Accept a single Dify file, a list of them, or nothing.
+    """
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [file for file in value if file]
+    return [value]
+
+
+def agent_can_fetch(url: Optional[str]) -> bool:
+    """
+    Guess whether a remote agent can download a Dify file URL itself.
+    Loopback, private and single-label hosts (e.g. a docker-compose "api" service)
+    are only reachable from inside the Dify deployment.
+    """
+    if not url:
+        return False
+
+    from urllib.parse import urlsplit
+    import ipaddress
+
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if parts.scheme not in ("http", "https") or not host or host == "localhost":
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return "." in host
+    return address.is_global
+
+
+class InlineFile:
+    """
+    A Dify file sent as base64 bytes inside the JSON-RPC body.
+    The file is read from its URL chunk by chunk while the request body is being
+    written, so at most one chunk of it is held in memory at a time.
+    """
+
+    def __init__(self, file: Any, index: int):
+        self.url = _file_field(file, "url")
+        self.file = file
+        # Placeholder written into the JSON body where the base64 content goes
+        self.placeholder = f"\u0000a2a-inline-file-{index}\u0000"
+
+    def _raw_chunks(self) -> Iterator[bytes]:
+        if self.url and self.url.startswith(("http://", "https://")):
+            response = get_session().get(self.url, stream=True, timeout=FILE_DOWNLOAD_TIMEOUT)
+            try:
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size=UPLOAD_CHUNK_BYTES)
+            finally:
+                response.close()
+        else:
+            # Dify file without a fetchable URL: fall back to the SDK's in-memory blob
+            blob = _file_field(self.file, "blob") or b""
+            for start in range(0, len(blob), UPLOAD_CHUNK_BYTES):
+                yield blob[start:start + UPLOAD_CHUNK_BYTES]
+
+    def iter_base64(self) -> Iterator[bytes]:
+        """
+        Yield the file's base64 encoding in chunks.
+        """
+        import base64
+
+        pending = b""
+        for chunk in self._raw_chunks():
+            if not chunk:
+                continue
+            pending += chunk
+            usable = len(pending) - len(pending) % 3
+            if usable:
+                yield base64.b64encode(pending[:usable])
+                pending = pending[usable:]
+        if pending:
+            yield base64.b64encode(pending)
+
+
+def build_file_parts(files: Any, mode: str = "auto") -> tuple[list[dict[str, Any]], list[InlineFile]]:
+    """
+    Turn Dify files into A2A FileParts.
+    uri: send the file URL (FileWithUri); bytes: send the content inline (FileWithBytes);
+    auto: URI when the agent can likely fetch it, otherwise bytes.
+    Returns (parts, inline_files); inline parts carry placeholders that
+    request_payload() replaces with the streamed content.
+    """
+    parts = []
+    inline_files = []
+
+    for file in normalize_files(files):
+        url = _file_field(file, "url")
+        file_info: dict[str, Any] = {}
+        if _file_field(file, "filename"):
+            file_info["name"] = _file_field(file, "filename")
+        if _file_field(file, "mime_type"):
+            file_info["mimeType"] = _file_field(file, "mime_type")
+
+        if mode == "uri" or (mode == "auto" and agent_can_fetch(url)):
+            if not url:
+                raise ValueError(f"File '{file_info.get('name', 'attachment')}' has no URL to send")
+            file_info["uri"] = url
+        else:
+            inline = InlineFile(file, len(inline_files))
+            inline_files.append(inline)
+            file_info["bytes"] = inline.placeholder
+
+        parts.append({"kind": "file", "file": file_info})
+
+    return parts, inline_files
+
+
+def iter_request_body(rpc_request: dict[str, Any], inline_files: list[InlineFile]) -> Iterator[bytes]:
+    """
+    Serialize a JSON-RPC request, streaming each inline file's base64 content
+    in place of its placeholder.
+    """
+    body = json.dumps(rpc_request)
+    for inline in inline_files:
+        # json.dumps escapes the NUL characters, so match the escaped form
+        marker = json.dumps(inline.placeholder)[1:-1]
+        head, _, body = body.partition(marker)
+        yield head.encode()
+        yield from inline.iter_base64()
+    yield body.encode()
+
+
+def request_payload(rpc_request: dict[str, Any], inline_files: list[InlineFile]) -> dict[str, Any]:
+    """
+    Keyword arguments for Session.post: plain json= when nothing is inline,
+    otherwise a generator body sent with chunked transfer encoding.
+    Call once per attempt; the generator cannot be replayed.
+    """
+    if not inline_files:
+        return {"json": rpc_request}
+    return {"data": iter_request_body(rpc_request, inline_files)}
@@ -1,10 +1,11 @@
 from collections.abc import Generator
-from typing import Any
+from typing import Any, Optional
 import json
-import base64
-import requests
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header
+from tools.agent_cards import fetch_agent_card, get_cached_card
+from tools.profiling import profiled
 
 class GetAgentCapabilitiesTool(Tool):
     def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
@@ -23,17 +24,26 @@ class GetAgentCapabilitiesTool(Tool):
             auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
             api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
             description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
 
             registry[agent_name] = {
                 "base_url": agent_url,
                 "auth_type": auth_type,
                 "api_key": api_key,
-                "description": description
+                "description": description,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
             }
 
         return registry
 
-    def _build_auth_header(self, auth_type: str, api_key: str) -> dict[str, str]:
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
         """
         Build the appropriate Authorization header based on auth type.
         """
@@ -44,11 +54,19 @@ class GetAgentCapabilitiesTool(Tool):
         elif auth_type == "api-key":
             return {"Authorization": f"Bearer {api_key}"}
         elif auth_type == "basic":
+            import base64
             encoded = base64.b64encode(api_key.encode()).decode()
             return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
         else:
             return {"Authorization": f"Bearer {api_key}"}
 
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
         Invoke the Get Agent Capabilities tool.
@@ -75,26 +93,20 @@ class GetAgentCapabilitiesTool(Tool):
             return
 
         # Build headers with appropriate authentication (some servers may require auth for agent card)
-        headers = self._build_auth_header(auth_type, api_key)
+        try:
+            headers = self._build_auth_header(auth_type, api_key, agent_config)
+        except OAuthError:
+            # The token endpoint may only be known from the card itself, which A2A serves publicly
+            headers = {}
 
-        # Try both agent-card.json (preferred) and agent.json (fallback)
-        agent_card = None
+        # Serve from the shared card cache (memory, then disk) when fresh
+        agent_card = get_cached_card(agent_base_url)
         last_error = None
 
-        for filename in ["agent-card.json", "agent.json"]:
-            agent_card_url = f"{agent_base_url.rstrip('/')}/.well-known/{filename}"
-
-            try:
-                response = requests.get(agent_card_url, headers=headers, timeout=10)
-                response.raise_for_status()
-                agent_card = response.json()
-                break  # Successfully fetched, exit loop
-            except requests.exceptions.RequestException as e:
-                last_error = f"{filename}: {str(e)}"
-                continue  # Try next filename
-            except json.JSONDecodeError as e:
-                last_error = f"{filename}: Invalid JSON - {str(e)}"
-                continue
+        # Otherwise try both agent-card.json (preferred) and agent.json (fallback);
+        # a successful fetch also refreshes the cache used by the other tools
+        if agent_card is None:
+            agent_card, last_error = fetch_agent_card(agent_base_url, headers)
 
         # If neither path worked, return error
         if agent_card is None:
@@ -109,6 +121,8 @@ class GetAgentCapabilitiesTool(Tool):
                 "name": agent_card.get("name", "Unknown Agent"),
                 "description": agent_card.get("description", "No description provided."),
                 "protocolVersion": agent_card.get("protocolVersion", "unknown"),
+                "preferredTransport": agent_card.get("preferredTransport", "JSONRPC"),
+                "additionalInterfaces": agent_card.get("additionalInterfaces", []),
                 "capabilities": agent_card.get("capabilities", {}),
                 "skills": agent_card.get("skills", []),
                 "securitySchemes": agent_card.get("securitySchemes", {}),
@@ -0,0 +1,225 @@
+from collections.abc import Generator
+from typing import Any, Optional
+import json
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header, scope_credential
+from tools.agent_cards import get_cached_card
+from tools.artifact_store import DEFAULT_RANGE, MAX_RANGE, RANGE_UNITS, artifact_store, readable_artifact, slice_content
+from tools.job_queue import resolve_task_id
+from tools.memory_budget import MemoryBudgetExceededError, get_accountant
+from tools.rate_limit import AgentRateLimitedError, get_limiter, send_with_limits
+from tools.transports import read_result, select_endpoint, send_request
+from tools.profiling import profiled
+
+
+def _non_negative_int(value: Any, name: str, default: int) -> int:
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name} '{value}'.")
+    if number < 0:
+        raise ValueError(f"Invalid {name} '{value}'.")
+    return number
+
+
+class GetArtifactTool(Tool):
+    def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
+        """
+        Build agents registry from raw credential fields.
+        This is called at runtime by the tool.
+        """
+        registry = {}
+
+        for i in range(1, 6):
+            agent_name = self.runtime.credentials.get(f"agent_{i}_name", "").strip()
+            if not agent_name:
+                continue
+
+            agent_url = self.runtime.credentials.get(f"agent_{i}_url", "").strip()
+            auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
+            api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
+            description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            max_concurrency = self.runtime.credentials.get(f"agent_{i}_max_concurrency", "")
+            rate_limit = self.runtime.credentials.get(f"agent_{i}_rate_limit", "")
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
+
+            registry[agent_name] = {
+                "base_url": agent_url,
+                "auth_type": auth_type,
+                "api_key": api_key,
+                "description": description,
+                "max_concurrency": max_concurrency,
+                "rate_limit": rate_limit,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
+            }
+
+        return registry
+
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
+        """
+        Build the appropriate Authorization header based on auth type.
+        """
+        if auth_type == "none" or not api_key:
+            return {}
+        elif auth_type == "bearer":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "api-key":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "basic":
+            import base64
+            encoded = base64.b64encode(api_key.encode()).decode()
+            return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
+        else:
+            return {"Authorization": f"Bearer {api_key}"}
+
+    def _fetch_artifact(
+        self,
+        agent_base_url: str,
+        headers: dict[str, str],
+        limiter: Any,
+        task_id: str,
+        artifact_id: str
+    ) -> tuple[Optional[dict[str, Any]], Optional[str]]:
+        """
+        Re-read a task from the agent (without history) when its artifact is not stored.
+        Returns (readable artifact, None) or (None, error text).
+        """
+        endpoint = select_endpoint(agent_base_url, get_cached_card(agent_base_url))
+        with get_accountant().reserve_response(agent_base_url) as reservation:
+            response = send_with_limits(limiter, lambda: send_request(
+                endpoint, "tasks/get", {"id": task_id, "historyLength": 0}, headers, 30
+            ))
+            reservation.charge_response(response)
+            try:
+                result, error = read_result(endpoint, response)
+            except json.JSONDecodeError:
+                return None, f"Invalid JSON Response: {response.text}"
+
+        if error is not None:
+            return None, f"A2A Error: {json.dumps(error)}"
+
+        artifacts = (result.get("artifacts") or []) if isinstance(result, dict) else []
+        for index, artifact in enumerate(artifacts):
+            if isinstance(artifact, dict) and str(artifact.get("artifactId", index)) == artifact_id:
+                artifact = {**artifact, "artifactId": artifact_id}
+                key = artifact_store.key(agent_base_url, scope_credential(headers), task_id, artifact_id)
+                artifact_store.put(key, artifact)
+                return artifact_store.get(key) or readable_artifact(artifact), None
+        return None, f"Error: Artifact '{artifact_id}' not found in task '{task_id}'"
+
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Invoke the Get Artifact tool.
+        Returns a line or byte range of one part of a task artifact. Large artifacts
+        are kept locally by get_task_status; anything else is read from the agent with tasks/get.
+        """
+        agents_registry = self._build_agents_registry()
+        if not agents_registry:
+            yield self.create_text_message("Agents Registry is not configured.")
+            return
+
+        agent_name = tool_parameters.get("agent_name")
+        if not agent_name or agent_name not in agents_registry:
+            yield self.create_text_message(f"Agent '{agent_name}' not found in registry.")
+            return
+
+        agent_config = agents_registry[agent_name]
+        agent_base_url = agent_config.get("base_url")
+        auth_type = agent_config.get("auth_type", "none")
+        api_key = agent_config.get("api_key", "")
+
+        if not agent_base_url:
+            yield self.create_text_message(f"Base URL missing for agent '{agent_name}'.")
+            return
+
+        task_id = str(tool_parameters.get("task_id") or "")
+        artifact_id = str(tool_parameters.get("artifact_id") or "")
+
+        unit = tool_parameters.get("unit") or "lines"
+        if unit not in RANGE_UNITS:
+            yield self.create_text_message(f"Invalid unit '{unit}'. Use one of: {', '.join(RANGE_UNITS)}.")
+            return
+        try:
+            part_index = _non_negative_int(tool_parameters.get("part_index"), "part_index", 0)
+            start = _non_negative_int(tool_parameters.get("start"), "start", 0)
+            length = _non_negative_int(tool_parameters.get("length"), "length", DEFAULT_RANGE[unit])
+            if length == 0:
+                raise ValueError(f"Invalid length '{tool_parameters.get('length')}'.")
+            length = min(MAX_RANGE[unit], length)
+        except ValueError as e:
+            yield self.create_text_message(str(e))
+            return
+
+        import requests
+
+        # Build headers with appropriate authentication
+        headers = {"Content-Type": "application/json"}
+        try:
+            headers.update(self._build_auth_header(auth_type, api_key, agent_config))
+        except OAuthError as e:
+            yield self.create_text_message(f"Auth Error: {str(e)}")
+            return
+
+        # Per-agent concurrency and rate limits (honors 429/503 Retry-After)
+        limiter = get_limiter(
+            agent_base_url,
+            agent_config.get("max_concurrency"),
+            agent_config.get("rate_limit")
+        )
+
+        # A queued submit_task job has no artifacts until the agent has a task for it
+        task_id, job_view = resolve_task_id(task_id, agent_base_url, scope_credential(headers))
+        if job_view:
+            yield self.create_text_message(job_view)
+            return
+
+        try:
+            # Stored artifacts are bound to the credential that fetched them
+            artifact = artifact_store.get(
+                artifact_store.key(agent_base_url, scope_credential(headers), task_id, artifact_id)
+            )
+            if artifact is None:
+                artifact, error = self._fetch_artifact(agent_base_url, headers, limiter, task_id, artifact_id)
+                if error:
+                    yield self.create_text_message(error)
+                    return
+
+            parts = artifact["parts"]
+            if part_index >= len(parts):
+                yield self.create_text_message(
+                    f"Error: Artifact '{artifact_id}' has {len(parts)} part(s); part_index {part_index} does not exist"
+                )
+                return
+
+            yield self.create_text_message(json.dumps({
+                "artifactId": artifact_id,
+                "partIndex": part_index,
+                "kind": parts[part_index]["kind"],
+                **slice_content(parts[part_index]["content"], unit, start, length)
+            }))
+
+        except AgentRateLimitedError as e:
+            yield self.create_text_message(f"Rate Limited: {str(e)}")
+        except MemoryBudgetExceededError as e:
+            yield self.create_text_message(f"Memory Budget Exceeded: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            yield self.create_text_message(f"Network Error: {str(e)}")
+        except Exception as e:
+            yield self.create_text_message(f"Error: {str(e)}")
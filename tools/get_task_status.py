@@ -1,11 +1,22 @@
 from collections.abc import Generator
-from typing import Any
+from typing import Any, Optional
 import json
-import uuid
-import base64
-import requests
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header, scope_credential
+from tools.agent_cards import get_cached_card
+from tools.artifact_store import offload_artifacts
+from tools.memory_budget import MemoryBudgetExceededError, get_accountant
+from tools.rate_limit import AgentRateLimitedError, get_limiter, send_with_limits
+from tools.persistent_store import TASK_RESULT_NAMESPACE, TASK_RESULT_TTL_SECONDS, get_store, scoped_key
+from tools.push_notifications import get_push_receiver, trim_history
+from tools.task_durations import duration_estimator
+from tools.subscriptions import MAX_WAIT_SECONDS, subscription_manager
+from tools.task_reaper import get_reaper
+from tools.job_queue import resolve_task_id
+from tools.task_views import OUTPUT_MODES, TERMINAL_STATES, delta_tracker, project_task, task_state
+from tools.transports import read_result, select_endpoint, send_request
+from tools.profiling import profiled
 
 class GetTaskStatusTool(Tool):
     def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
@@ -24,17 +35,30 @@ class GetTaskStatusTool(Tool):
             auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
             api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
             description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            max_concurrency = self.runtime.credentials.get(f"agent_{i}_max_concurrency", "")
+            rate_limit = self.runtime.credentials.get(f"agent_{i}_rate_limit", "")
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
 
             registry[agent_name] = {
                 "base_url": agent_url,
                 "auth_type": auth_type,
                 "api_key": api_key,
-                "description": description
+                "description": description,
+                "max_concurrency": max_concurrency,
+                "rate_limit": rate_limit,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
             }
 
         return registry
 
-    def _build_auth_header(self, auth_type: str, api_key: str) -> dict[str, str]:
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
         """
         Build the appropriate Authorization header based on auth type.
         """
@@ -45,15 +69,29 @@ class GetTaskStatusTool(Tool):
         elif auth_type == "api-key":
             return {"Authorization": f"Bearer {api_key}"}
         elif auth_type == "basic":
+            import base64
             encoded = base64.b64encode(api_key.encode()).decode()
             return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
         else:
             return {"Authorization": f"Bearer {api_key}"}
 
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
         Invoke the Get Task Status tool (tasks/get).
         Implements A2A Protocol JSON-RPC 2.0 task status check.
+        output_mode trims the Task (status-only, final-artifacts, full, or delta since the caller's `since` cursor).
+        Tasks the agent pushed to the embedded receiver are answered locally without polling.
+        Large artifacts are kept locally and returned as manifests; read them with get_artifact.
+        Running tasks come with a pollHint estimating completion from the agent's past task durations.
+        wait_seconds waits for a running task to change state on a tasks/resubscribe stream
+        shared with every other caller watching the same task.
         """
         agents_registry = self._build_agents_registry()
         if not agents_registry:
@@ -76,36 +114,140 @@ class GetTaskStatusTool(Tool):
 
         task_id = tool_parameters.get("task_id")
 
-        # Construct JSON-RPC 2.0 Request (tasks/get)
-        rpc_request = {
-            "jsonrpc": "2.0",
-            "method": "tasks/get",
-            "params": {"id": task_id},
-            "id": str(uuid.uuid4())
-        }
+        output_mode = tool_parameters.get("output_mode") or "full"
+        if output_mode not in OUTPUT_MODES:
+            yield self.create_text_message(
+                f"Invalid output_mode '{output_mode}'. Use one of: {', '.join(OUTPUT_MODES)}."
+            )
+            return
+
+        # Modes that drop history don't need the agent to send it at all
+        history_length = tool_parameters.get("history_length")
+        if history_length in (None, "") and output_mode in ("status-only", "final-artifacts"):
+            history_length = 0
+
+        params: dict[str, Any] = {"id": task_id}
+        if history_length not in (None, ""):
+            try:
+                params["historyLength"] = max(0, int(history_length))
+            except (TypeError, ValueError):
+                yield self.create_text_message(f"Invalid history_length '{history_length}'.")
+                return
+
+        wait_seconds = tool_parameters.get("wait_seconds")
+        try:
+            wait_seconds = min(MAX_WAIT_SECONDS, max(0.0, float(wait_seconds or 0)))
+        except (TypeError, ValueError):
+            yield self.create_text_message(f"Invalid wait_seconds '{wait_seconds}'.")
+            return
+
+        import requests
+
+        # Transport negotiated from the cached Agent Card (JSON-RPC when there is none)
+        endpoint = select_endpoint(agent_base_url, get_cached_card(agent_base_url))
 
         # Build headers with appropriate authentication
         headers = {"Content-Type": "application/json"}
-        headers.update(self._build_auth_header(auth_type, api_key))
+        try:
+            headers.update(self._build_auth_header(auth_type, api_key, agent_config))
+        except OAuthError as e:
+            yield self.create_text_message(f"Auth Error: {str(e)}")
+            return
+
+        # Per-agent concurrency and rate limits (honors 429/503 Retry-After)
+        limiter = get_limiter(
+            agent_base_url,
+            agent_config.get("max_concurrency"),
+            agent_config.get("rate_limit")
+        )
+
+        # Queued submit_task jobs report their own state until the agent has a task for them
+        task_id, job_view = resolve_task_id(task_id, agent_base_url, scope_credential(headers))
+        if job_view:
+            yield self.create_text_message(job_view)
+            return
+        params["id"] = task_id
+
+        # Terminal task results may be served from the on-disk store across restarts
+        store = get_store()
+        cache_key = scoped_key(
+            agent_base_url, scope_credential(headers), task_id, params.get("historyLength", "all")
+        )
+
+        # Pushed task updates, when submit_task registered this task with the receiver
+        receiver = get_push_receiver()
+        credential = scope_credential(headers)
 
         try:
-            response = requests.post(
-                agent_base_url,
-                json=rpc_request,
-                headers=headers,
-                timeout=30
-            )
-            response.raise_for_status()
+            result = receiver.get_task(agent_base_url, credential, task_id) if receiver else None
+            if result is None and "historyLength" in params:
+                # A live shared stream knows the state, though not necessarily the whole history
+                result = subscription_manager.latest(agent_base_url, credential, task_id)
+            if result is not None:
+                result = trim_history(result, params.get("historyLength"))
+            elif store:
+                result = store.get(TASK_RESULT_NAMESPACE, cache_key)
+
+            if result is None:
+                # Response bodies count against the plugin's memory budget while they are parsed
+                with get_accountant().reserve_response(agent_base_url) as reservation:
+                    response = send_with_limits(limiter, lambda: send_request(
+                        endpoint, "tasks/get", params, headers, 30
+                    ))
+                    reservation.charge_response(response)
+
+                    result, error = read_result(endpoint, response)
+
+                if error is not None:
+                    yield self.create_text_message(f"A2A Error: {json.dumps(error)}")
+                    return
+
+                if store and task_state(result) in TERMINAL_STATES:
+                    store.put(TASK_RESULT_NAMESPACE, cache_key, result, ttl=TASK_RESULT_TTL_SECONDS)
+                if receiver and "historyLength" not in params:
+                    # A poll after pushes went quiet resets the freshness of the pushed copy
+                    receiver.refresh(agent_base_url, credential, task_id, result)
+
+            if wait_seconds and isinstance(result, dict) and task_state(result) not in TERMINAL_STATES \
+                    and endpoint.streaming and subscription_manager.supported(agent_base_url):
+                # One upstream stream per task, however many runs are waiting on it
+                result = trim_history(subscription_manager.wait(
+                    endpoint, agent_base_url, headers, limiter, task_id, result, wait_seconds
+                ), params.get("historyLength"))
+                if store and task_state(result) in TERMINAL_STATES:
+                    store.put(TASK_RESULT_NAMESPACE, cache_key, result, ttl=TASK_RESULT_TTL_SECONDS)
+
+            # When to look again, from how long this agent's tasks have taken so far
+            poll_hint = duration_estimator.observe(agent_base_url, credential, task_id, task_state(result)) \
+                if result is not None else None
 
-            rpc_response = response.json()
+            # Someone is still watching this task, so the reaper leaves it alone
+            reaper = get_reaper()
+            if reaper and result is not None:
+                reaper.touch(
+                    agent_base_url, credential, task_id, task_state(result),
+                    next_poll=poll_hint["nextPollSeconds"] if poll_hint else None
+                )
 
-            if "error" in rpc_response:
-                yield self.create_text_message(f"A2A Error: {json.dumps(rpc_response['error'])}")
+            if result is None:
+                yield self.create_text_message("Success")
                 return
 
-            result = rpc_response.get("result")
-            yield self.create_text_message(json.dumps(result) if result is not None else "Success")
+            if output_mode == "delta":
+                # Cursors are scoped like every other cache, and each run passes back its own
+                view = delta_tracker.delta(
+                    scoped_key(agent_base_url, credential), result, tool_parameters.get("since") or None
+                )
+            else:
+                view = project_task(result, output_mode)
+            if poll_hint and isinstance(view, dict):
+                view = {**view, "pollHint": poll_hint}
+            yield self.create_text_message(json.dumps(offload_artifacts(view, agent_base_url, credential, task_id)))
 
+        except AgentRateLimitedError as e:
+            yield self.create_text_message(f"Rate Limited: {str(e)}")
+        except MemoryBudgetExceededError as e:
+            yield self.create_text_message(f"Memory Budget Exceeded: {str(e)}")
         except requests.exceptions.RequestException as e:
             yield self.create_text_message(f"Network Error: {str(e)}")
         except json.JSONDecodeError:
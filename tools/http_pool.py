@@ -0,0 +1,40 @@
+from typing import TYPE_CHECKING, Optional
+import threading
+
+if TYPE_CHECKING:
+    import requests
+
+# Connections kept alive per host; Dify may run several tool invocations concurrently
+POOL_MAXSIZE = 32
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """
+    Return the process-wide pooled HTTP session shared by every tool.
+    Reusing it keeps DNS, TCP and TLS setup off the per-call path.
+    requests is imported here rather than at module level: it is the single most
+    expensive import in the plugin, and tools that never touch the network
+    (e.g. list_agents) should not pay for it at startup.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from tools.traffic_capture import CapturingAdapter, get_recorder
+
+                session = requests.Session()
+                recorder = get_recorder()
+                if recorder is not None:
+                    # A2A_TRAFFIC_CAPTURE is set: record every exchange for offline replay
+                    adapter = CapturingAdapter(recorder, pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+                else:
+                    adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
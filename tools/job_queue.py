@@ -0,0 +1,353 @@
+from collections import deque
+from collections.abc import Callable
+from typing import Any, Optional
+import heapq
+import itertools
+import logging
+import threading
+import time
+from tools.persistent_store import scoped_key
+from tools.rate_limit import parse_limit
+
+# Prefix of the handles returned for queued submissions. Agent task IDs may look
+# the same, so tools only treat a value as a job when the scheduler holds it.
+JOB_ID_PREFIX = "job-"
+
+DISPATCH_MODES = ("immediate", "queued")
+
+# Dispatch order: interactive jobs first, batch jobs only when nothing else waits
+PRIORITIES = ("interactive", "normal", "batch")
+
+# Submission workers per agent when it has no max_concurrency configured
+DEFAULT_AGENT_WORKERS = 4
+
+# Jobs waiting per agent before new ones are refused
+MAX_QUEUED_JOBS = 1000
+
+# Idle workers exit after this long; new ones start when jobs arrive
+WORKER_IDLE_SECONDS = 60
+
+# How long finished job records stay resolvable, and how many are kept
+JOB_TTL_SECONDS = 24 * 60 * 60
+MAX_JOB_RECORDS = 10000
+
+# Queue waits remembered for the wait-time percentiles
+WAIT_SAMPLES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when an agent's job queue is at MAX_QUEUED_JOBS."""
+
+
+def workers_for(max_concurrency: Any) -> int:
+    """
+    Submission workers for an agent. One of its max_concurrency slots is left
+    free, so call_agent and get_task_status are never stuck behind queued jobs.
+    """
+    limit = int(parse_limit(max_concurrency))
+    if not limit:
+        return DEFAULT_AGENT_WORKERS
+    return max(1, limit - 1)
+
+
+class Job:
+    """A submit_task call waiting for, or done with, dispatch to its agent."""
+
+    def __init__(
+        self,
+        job_id: str,
+        queue_key: tuple[str, int],
+        scope: str,
+        submit: Callable[[], tuple[Optional[str], Optional[str]]],
+        priority: str,
+        deadline: Optional[float]
+    ):
+        self.id = job_id
+        # (agent URL, workers) of the _AgentQueue holding the job
+        self.queue_key = queue_key
+        self.scope = scope
+        self.submit = submit
+        self.priority = priority
+        self.deadline = deadline
+        # queued -> dispatching -> submitted | failed; queued -> expired | canceled
+        self.state = "queued"
+        self.task_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def view(self) -> dict[str, Any]:
+        """
+        What get_task_status reports for a job that has no agent task yet.
+        """
+        waited = (self.started_at or self.finished_at or time.monotonic()) - self.enqueued_at
+        view = {
+            "id": self.id,
+            "kind": "job",
+            "status": {"state": self.state},
+            "priority": self.priority,
+            "waitedMs": int(waited * 1000)
+        }
+        if self.error:
+            view["status"]["message"] = self.error
+        return view
+
+
+class _AgentQueue:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.heap: list[tuple[int, float, int, Job]] = []
+        self.running = 0
+        self.idle = 0
+        self.threads = 0
+
+
+class JobScheduler:
+    """
+    Priority queue with deadlines in front of submit_task, dispatched to each
+    agent by a bounded pool of worker threads. Jobs are ordered by priority,
+    then earliest deadline, then arrival. A job still queued when its deadline
+    passes expires without being sent. Each (agent, workers) pair has its own
+    queue, so credential sets with different max_concurrency for one agent do
+    not overwrite each other's worker limit.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queues: dict[tuple[str, int], _AgentQueue] = {}
+        self._jobs: dict[str, Job] = {}
+        self._seq = itertools.count()
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._counts = {"enqueued": 0, "submitted": 0, "failed": 0, "expired": 0, "canceled": 0, "rejected": 0}
+
+    def enqueue(
+        self,
+        base_url: str,
+        credential: str,
+        submit: Callable[[], tuple[Optional[str], Optional[str]]],
+        priority: str = "normal",
+        deadline_seconds: Optional[float] = None,
+        workers: int = DEFAULT_AGENT_WORKERS
+    ) -> Job:
+        """
+        Queue a submission. submit() runs on a worker and returns (task_id, error_text).
+        Raises QueueFullError when the agent already has MAX_QUEUED_JOBS waiting.
+        """
+        import uuid
+
+        queue_key = (base_url.rstrip("/"), workers)
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        job = Job(
+            f"{JOB_ID_PREFIX}{uuid.uuid4().hex}", queue_key, scoped_key(base_url, credential),
+            submit, priority, deadline
+        )
+
+        with self._cond:
+            queue = self._queues.get(queue_key)
+            if queue is None:
+                queue = self._queues[queue_key] = _AgentQueue(workers)
+            self._expire_queue_locked(queue)
+            if len(queue.heap) >= MAX_QUEUED_JOBS:
+                self._counts["rejected"] += 1
+                raise QueueFullError(f"{len(queue.heap)} jobs already queued for this agent")
+
+            self._prune_locked()
+            self._jobs[job.id] = job
+            heapq.heappush(queue.heap, (
+                PRIORITIES.index(priority), deadline if deadline is not None else float("inf"), next(self._seq), job
+            ))
+            self._counts["enqueued"] += 1
+
+            if queue.idle:
+                self._cond.notify_all()
+            if len(queue.heap) > queue.idle and queue.threads < queue.workers:
+                queue.threads += 1
+                threading.Thread(
+                    target=self._work, args=(queue_key,), name="a2a-job-worker", daemon=True
+                ).start()
+        return job
+
+    def _prune_locked(self) -> None:
+        if len(self._jobs) < MAX_JOB_RECORDS:
+            return
+        now = time.monotonic()
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and now - j.finished_at > JOB_TTL_SECONDS]:
+            del self._jobs[job_id]
+        # Still full: forget the oldest finished jobs
+        finished = sorted((j for j in self._jobs.values() if j.finished_at), key=lambda j: j.finished_at)
+        for job in finished[:max(0, len(self._jobs) - MAX_JOB_RECORDS + 1)]:
+            del self._jobs[job.id]
+
+    def _expire_locked(self, job: Job, now: float) -> bool:
+        """
+        Mark a queued job past its deadline as expired; True if it was.
+        """
+        if job.state != "queued" or job.deadline is None or job.deadline >= now:
+            return False
+        job.state = "expired"
+        job.error = "Deadline passed before the job could be dispatched"
+        job.finished_at = now
+        job.submit = None
+        self._counts["expired"] += 1
+        return True
+
+    def _expire_queue_locked(self, queue: _AgentQueue) -> None:
+        """
+        Expire every overdue job in a queue, so none of them counts toward MAX_QUEUED_JOBS.
+        """
+        now = time.monotonic()
+        if not any(self._expire_locked(entry[3], now) for entry in list(queue.heap)):
+            return
+        queue.heap = [entry for entry in queue.heap if entry[3].state == "queued"]
+        heapq.heapify(queue.heap)
+
+    def _next_locked(self, queue: _AgentQueue) -> Optional[Job]:
+        now = time.monotonic()
+        while queue.heap:
+            job = heapq.heappop(queue.heap)[3]
+            if job.state != "queued" or self._expire_locked(job, now):
+                continue  # Canceled or expired while waiting
+            return job
+        return None
+
+    def _work(self, queue_key: tuple[str, int]) -> None:
+        queue = self._queues[queue_key]
+        while True:
+            with self._cond:
+                job = self._next_locked(queue)
+                idle_deadline = time.monotonic() + WORKER_IDLE_SECONDS
+                while job is None:
+                    remaining = idle_deadline - time.monotonic()
+                    if remaining <= 0 or queue.threads > queue.workers:
+                        queue.threads -= 1
+                        return
+                    queue.idle += 1
+                    self._cond.wait(remaining)
+                    queue.idle -= 1
+                    job = self._next_locked(queue)
+                job.state = "dispatching"
+                job.started_at = time.monotonic()
+                self._waits.append(job.started_at - job.enqueued_at)
+                queue.running += 1
+
+            try:
+                task_id, error = job.submit()
+            except Exception as e:
+                task_id, error = None, f"Error: {str(e)}"
+
+            with self._cond:
+                queue.running -= 1
+                job.finished_at = time.monotonic()
+                job.submit = None
+                if task_id:
+                    job.state, job.task_id = "submitted", task_id
+                    self._counts["submitted"] += 1
+                else:
+                    job.state, job.error = "failed", error or "Error: No taskId received from agent"
+                    self._counts["failed"] += 1
+                    logger.info("Queued job %s failed: %s", job.id, job.error)
+
+    def find(self, job_id: Any, base_url: str, credential: str) -> Optional[Job]:
+        """
+        Look up a job by handle; only the agent and credential that queued it can see it.
+        """
+        if not isinstance(job_id, str) or not job_id.startswith(JOB_ID_PREFIX):
+            return None
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.scope != scoped_key(base_url, credential):
+                return None
+            # A job past its deadline reports expired even before a worker reaches it
+            if self._expire_locked(job, time.monotonic()):
+                queue = self._queues.get(job.queue_key)
+                if queue is not None:
+                    queue.heap = [entry for entry in queue.heap if entry[3] is not job]
+                    heapq.heapify(queue.heap)
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """
+        Cancel a job that has not been dispatched yet, freeing its place in the queue.
+        Returns False once it has been dispatched.
+        """
+        with self._cond:
+            if job.state != "queued":
+                return False
+            queue = self._queues.get(job.queue_key)
+            if queue is not None:
+                queue.heap = [entry for entry in queue.heap if entry[3] is not job]
+                heapq.heapify(queue.heap)
+            job.state = "canceled"
+            job.finished_at = time.monotonic()
+            job.submit = None
+            self._counts["canceled"] += 1
+            return True
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Queue depth per agent and priority, running submissions, and queue wait times.
+        An agent queued with several worker limits reports their totals.
+        """
+        with self._cond:
+            agents = {}
+            for (agent_key, _), queue in self._queues.items():
+                agent = agents.setdefault(agent_key, {
+                    "queued": {priority: 0 for priority in PRIORITIES}, "running": 0, "workers": 0
+                })
+                for _, _, _, job in queue.heap:
+                    if job.state == "queued":
+                        agent["queued"][job.priority] += 1
+                agent["running"] += queue.running
+                agent["workers"] += queue.workers
+            waits = sorted(self._waits)
+            counts = dict(self._counts)
+
+        def percentile(p: float) -> int:
+            return int(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000) if waits else 0
+
+        return {
+            "agents": agents,
+            **counts,
+            "waitMs": {
+                "avg": int(sum(waits) / len(waits) * 1000) if waits else 0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": int(waits[-1] * 1000) if waits else 0
+            }
+        }
+
+
+def resolve_task_id(value: Any, base_url: str, credential: str) -> tuple[Optional[str], Optional[str]]:
+    """
+    Map a job handle to the agent task it was submitted as. Returns (task_id, None),
+    or (None, the job's view as JSON) when there is no agent task yet. Values the
+    scheduler does not hold for this agent and credential are agent task IDs and
+    are returned unchanged.
+    """
+    import json
+
+    job = get_scheduler().find(value, base_url, credential)
+    if job is None:
+        return value, None
+    if job.task_id is None:
+        return None, json.dumps(job.view())
+    return job.task_id, None
+
+
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    """
+    Return the process-wide job scheduler.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = JobScheduler()
+    return _scheduler
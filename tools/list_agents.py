@@ -3,6 +3,7 @@ from typing import Any
 import json
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from tools.profiling import profiled
 
 class ListAgentsTool(Tool):
     def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
@@ -31,6 +32,7 @@ class ListAgentsTool(Tool):
 
         return registry
 
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
         Invoke the List Agents tool.
@@ -0,0 +1,282 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# resource.memory in manifest.yaml; the runner is killed above this
+MANIFEST_MEMORY_BYTES = 128 * 1024 * 1024
+
+# Optional override in MiB for the bytes the accountant may hand out
+MEMORY_BUDGET_MB_ENV = "A2A_MEMORY_BUDGET_MB"
+
+# Share of the manifest limit left for response bodies and caches once the
+# interpreter, the Dify SDK and their libraries are loaded
+DEFAULT_BUDGET_BYTES = MANIFEST_MEMORY_BYTES // 2
+
+# Above this share of the budget caches are evicted and large requests queue
+SOFT_WATERMARK_FRACTION = 0.75
+
+# Reservations at least this big are held back (not just tracked) above the soft watermark
+LARGE_RESERVATION_BYTES = 1024 * 1024
+
+# Reserved for a response before its size is known
+RESPONSE_RESERVATION_BYTES = 64 * 1024
+
+# A JSON body held as bytes plus its parsed Python objects
+RESPONSE_MEMORY_FACTOR = 5
+
+# Longest a large request may queue for memory before it is rejected
+ADMISSION_TIMEOUT_SECONDS = 30
+
+# Number of agents whose last response size is remembered
+MAX_TRACKED_AGENTS = 256
+
+
+class MemoryBudgetExceededError(Exception):
+    """Raised when a request does not fit in the plugin's memory budget."""
+
+
+class MemoryReservation:
+    """
+    Bytes held by one in-flight request. Grows as the response turns out to be
+    bigger than estimated; released when the context manager exits.
+    """
+
+    def __init__(self, accountant: "MemoryAccountant", nbytes: int, key: Optional[str]):
+        self._accountant = accountant
+        self.nbytes = nbytes
+        self.key = key
+
+    def resize(self, nbytes: int) -> None:
+        """
+        Change the bytes held. Raises MemoryBudgetExceededError (and keeps the old size)
+        if growing would exceed the budget even after evicting caches.
+        """
+        self._accountant._resize(self, max(0, int(nbytes)))
+
+    def charge_response(self, response: Any) -> None:
+        """
+        Account for a buffered response body and the objects parsed from it.
+        """
+        content = getattr(response, "content", None)
+        if isinstance(content, (bytes, bytearray)):
+            self.resize(len(content) * RESPONSE_MEMORY_FACTOR)
+            self._accountant.observe_response(self.key, len(content))
+
+    def release(self) -> None:
+        self._accountant._release(self)
+
+    def __enter__(self) -> "MemoryReservation":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class MemoryAccountant:
+    """
+    Tracks bytes held by in-flight responses and in-memory caches against a budget
+    derived from the manifest memory limit.
+    Below the soft watermark everything is admitted. Above it caches are evicted
+    first; large requests then queue until memory frees up (or are rejected after
+    a timeout), while small ones are admitted until the hard budget is reached.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES, soft_fraction: float = SOFT_WATERMARK_FRACTION):
+        self.budget_bytes = int(budget_bytes)
+        self.soft_watermark_bytes = int(budget_bytes * soft_fraction)
+        self._cond = threading.Condition()
+        self._in_flight_bytes = 0
+        self._reservations = 0
+        self._queued = 0
+        self._caches: dict[str, tuple[Callable[[], int], Callable[[int], int]]] = {}
+        self._response_sizes: OrderedDict[str, int] = OrderedDict()
+        self.peak_bytes = 0
+        self.rejected = 0
+        self.evicted_bytes = 0
+
+    def register_cache(self, name: str, usage: Callable[[], int], evict: Callable[[int], int]) -> None:
+        """
+        Register an in-memory cache. usage() returns the bytes it holds;
+        evict(nbytes) drops at least that many bytes if it can and returns the bytes freed.
+        """
+        with self._cond:
+            self._caches[name] = (usage, evict)
+
+    def _cache_bytes_locked(self) -> dict[str, int]:
+        return {name: usage() for name, (usage, _) in self._caches.items()}
+
+    def _used_locked(self) -> int:
+        return self._in_flight_bytes + sum(self._cache_bytes_locked().values())
+
+    def _evict_locked(self, target: int) -> int:
+        """
+        Evict caches until usage is at or below target. Returns the resulting usage.
+        """
+        used = self._used_locked()
+        for name, (usage, evict) in self._caches.items():
+            if used <= target:
+                break
+            freed = evict(used - target)
+            if freed:
+                self.evicted_bytes += freed
+                logger.info("Evicted %d bytes from %s cache (memory budget)", freed, name)
+            used = self._used_locked()
+        return used
+
+    def _admit_locked(self, nbytes: int) -> None:
+        self._in_flight_bytes += nbytes
+        self._reservations += 1
+        self.peak_bytes = max(self.peak_bytes, self._used_locked())
+
+    def expected_response_bytes(self, key: Optional[str]) -> int:
+        """
+        Memory to reserve for a response from an agent: sized from its last response when
+        that was bigger than the default, capped at the soft watermark so it can still be admitted.
+        """
+        with self._cond:
+            last = self._response_sizes.get(key, 0) if key else 0
+        return min(self.soft_watermark_bytes, max(RESPONSE_RESERVATION_BYTES, last * RESPONSE_MEMORY_FACTOR))
+
+    def observe_response(self, key: Optional[str], size: int) -> None:
+        if not key:
+            return
+        with self._cond:
+            self._response_sizes.pop(key, None)
+            self._response_sizes[key] = size
+            while len(self._response_sizes) > MAX_TRACKED_AGENTS:
+                self._response_sizes.popitem(last=False)
+
+    def reserve(
+        self,
+        nbytes: int = RESPONSE_RESERVATION_BYTES,
+        key: Optional[str] = None,
+        timeout: float = ADMISSION_TIMEOUT_SECONDS
+    ) -> MemoryReservation:
+        """
+        Admit a request that will hold about nbytes. key (usually the agent URL) lets
+        later responses from the same agent be sized from this one.
+        Raises MemoryBudgetExceededError if it cannot be admitted within timeout.
+        """
+        nbytes = max(0, int(nbytes))
+        if nbytes > self.budget_bytes:
+            with self._cond:
+                self.rejected += 1
+            raise MemoryBudgetExceededError(
+                f"request needs {nbytes} bytes, more than the {self.budget_bytes} byte memory budget"
+            )
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._queued += 1
+            try:
+                while True:
+                    used = self._used_locked()
+                    if used + nbytes > self.soft_watermark_bytes:
+                        used = self._evict_locked(self.soft_watermark_bytes - nbytes)
+
+                    fits_soft = used + nbytes <= self.soft_watermark_bytes
+                    fits_hard = used + nbytes <= self.budget_bytes
+                    if fits_soft or (fits_hard and nbytes < LARGE_RESERVATION_BYTES):
+                        self._admit_locked(nbytes)
+                        return MemoryReservation(self, nbytes, key)
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        logger.warning("Rejected %d byte request: %s", nbytes, self._snapshot_locked())
+                        raise MemoryBudgetExceededError(
+                            f"{used} of {self.budget_bytes} bytes in use; "
+                            f"no room for a {nbytes} byte request after waiting {timeout:g}s"
+                        )
+                    # Caches and reservations shrink without notifying, so re-check periodically
+                    self._cond.wait(min(remaining, 0.5))
+            finally:
+                self._queued -= 1
+
+    def reserve_response(self, key: str, timeout: float = ADMISSION_TIMEOUT_SECONDS) -> MemoryReservation:
+        """
+        Admit a request to an agent, sized from that agent's last response.
+        """
+        return self.reserve(self.expected_response_bytes(key), key=key, timeout=timeout)
+
+    def _resize(self, reservation: MemoryReservation, nbytes: int) -> None:
+        with self._cond:
+            growth = nbytes - reservation.nbytes
+            if growth > 0:
+                used = self._used_locked()
+                if used + growth > self.budget_bytes:
+                    used = self._evict_locked(self.budget_bytes - growth)
+                if used + growth > self.budget_bytes:
+                    self.rejected += 1
+                    logger.warning("Rejected %d byte response: %s", nbytes, self._snapshot_locked())
+                    raise MemoryBudgetExceededError(
+                        f"response needs {nbytes} bytes but only "
+                        f"{self.budget_bytes - used + reservation.nbytes} of the memory budget are free"
+                    )
+            self._in_flight_bytes += growth
+            reservation.nbytes = nbytes
+            self.peak_bytes = max(self.peak_bytes, self._used_locked())
+            if growth < 0:
+                self._cond.notify_all()
+
+    def _release(self, reservation: MemoryReservation) -> None:
+        with self._cond:
+            if reservation.nbytes < 0:
+                return  # already released
+            self._in_flight_bytes -= reservation.nbytes
+            self._reservations -= 1
+            reservation.nbytes = -1
+            self._cond.notify_all()
+
+    def _snapshot_locked(self) -> dict[str, Any]:
+        cache_bytes = self._cache_bytes_locked()
+        return {
+            "manifest_limit_bytes": MANIFEST_MEMORY_BYTES,
+            "budget_bytes": self.budget_bytes,
+            "soft_watermark_bytes": self.soft_watermark_bytes,
+            "used_bytes": self._in_flight_bytes + sum(cache_bytes.values()),
+            "in_flight_bytes": self._in_flight_bytes,
+            "in_flight_requests": self._reservations,
+            "cache_bytes": cache_bytes,
+            "queued_requests": self._queued,
+            "peak_bytes": self.peak_bytes,
+            "rejected_requests": self.rejected,
+            "evicted_bytes": self.evicted_bytes
+        }
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Current memory accounting, for instrumentation.
+        """
+        with self._cond:
+            return self._snapshot_locked()
+
+
+def _budget_from_env() -> int:
+    try:
+        megabytes = float(os.environ.get(MEMORY_BUDGET_MB_ENV, "").strip())
+    except ValueError:
+        return DEFAULT_BUDGET_BYTES
+    return int(megabytes * 1024 * 1024) if megabytes > 0 else DEFAULT_BUDGET_BYTES
+
+
+_accountant: Optional[MemoryAccountant] = None
+_accountant_lock = threading.Lock()
+
+
+def get_accountant() -> MemoryAccountant:
+    """
+    Return the process-wide memory accountant shared by every tool and cache.
+    """
+    global _accountant
+    if _accountant is None:
+        with _accountant_lock:
+            if _accountant is None:
+                _accountant = MemoryAccountant(_budget_from_env())
+    return _accountant
@@ -0,0 +1,290 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import logging
+import threading
+import time
+from tools.persistent_store import scoped_key
+
+OAUTH2_CLIENT_CREDENTIALS = "oauth2-client-credentials"
+
+# Timeout for a single token endpoint request
+TOKEN_TIMEOUT = 30
+
+# Lifetime assumed when the token endpoint does not send expires_in
+DEFAULT_TOKEN_TTL_SECONDS = 3600
+
+# Tokens are not sent in their last seconds (at most a tenth of their lifetime), so they cannot expire in flight
+EXPIRY_SKEW_SECONDS = 10
+
+# Background refresh starts at this fraction of the lifetime, or this long before expiry if earlier,
+# but never before half the lifetime has passed
+REFRESH_FRACTION = 0.8
+REFRESH_MARGIN_SECONDS = 60
+
+# A failed background refresh is retried after this long, while the current token lasts
+REFRESH_RETRY_SECONDS = 10
+
+# Tokens not used for this long are dropped instead of refreshed
+TOKEN_IDLE_SECONDS = 60 * 60
+
+# Issued tokens remembered so results scoped by them stay reachable after rotation
+MAX_ISSUED_TOKENS = 1000
+
+# Timeout for fetching an Agent Card to discover the token endpoint
+CARD_DISCOVERY_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+class OAuthError(Exception):
+    """Raised when no access token can be obtained for an agent."""
+
+
+class TokenEndpointUnreachableError(OAuthError):
+    """Raised when the token endpoint could not be contacted at all."""
+
+
+def parse_client_credentials(api_key: str) -> tuple[str, str]:
+    """
+    Split the "client_id:client_secret" kept in the agent's API Key field.
+    """
+    client_id, separator, client_secret = (api_key or "").partition(":")
+    if not separator or not client_id:
+        raise OAuthError("API Key/Token must be 'client_id:client_secret' for OAuth2 client credentials")
+    return client_id, client_secret
+
+
+def token_url_from_card(card: Optional[dict[str, Any]]) -> Optional[str]:
+    """
+    The clientCredentials tokenUrl of the first OAuth2 security scheme the Agent Card declares.
+    """
+    if not isinstance(card, dict):
+        return None
+    for scheme in (card.get("securitySchemes") or {}).values():
+        if not isinstance(scheme, dict) or scheme.get("type") != "oauth2":
+            continue
+        flow = (scheme.get("flows") or {}).get("clientCredentials") or {}
+        if flow.get("tokenUrl"):
+            return flow["tokenUrl"]
+    return None
+
+
+class _Token:
+    def __init__(self, access_token: str, token_type: str, expires_in: float):
+        now = time.monotonic()
+        expires_in = max(1.0, expires_in)
+        self.header = f"{'Bearer' if token_type.lower() == 'bearer' else token_type} {access_token}"
+        self.expires_at = now + expires_in - min(EXPIRY_SKEW_SECONDS, expires_in / 10)
+        self.refresh_at = now + max(
+            expires_in / 2, min(expires_in * REFRESH_FRACTION, expires_in - REFRESH_MARGIN_SECONDS)
+        )
+
+
+class _Client:
+    def __init__(self, key: str, token_url: str, client_id: str, client_secret: str, scope: str):
+        self.key = key
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.token: Optional[_Token] = None
+        self.last_used = time.monotonic()
+        # Single flight: one token request per client at a time
+        self.flight = threading.Lock()
+
+
+def fetch_token(token_url: str, client_id: str, client_secret: str, scope: str = "") -> _Token:
+    """
+    Request a token with the client_credentials grant, authenticating with HTTP Basic.
+    """
+    import requests
+    from tools.http_pool import get_session
+
+    data = {"grant_type": "client_credentials"}
+    if scope:
+        data["scope"] = scope
+    try:
+        response = get_session().post(
+            token_url, data=data, auth=(client_id, client_secret),
+            headers={"Accept": "application/json"}, timeout=TOKEN_TIMEOUT
+        )
+    except requests.exceptions.RequestException as e:
+        raise TokenEndpointUnreachableError(f"token endpoint unreachable: {str(e)}")
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if response.status_code >= 400:
+        detail = body.get("error_description") or body.get("error") if isinstance(body, dict) else None
+        raise OAuthError(f"token endpoint returned {response.status_code}" + (f": {detail}" if detail else ""))
+    if not isinstance(body, dict) or not body.get("access_token"):
+        raise OAuthError("token endpoint response has no access_token")
+
+    try:
+        expires_in = float(body.get("expires_in") or DEFAULT_TOKEN_TTL_SECONDS)
+    except (TypeError, ValueError):
+        expires_in = DEFAULT_TOKEN_TTL_SECONDS
+    return _Token(body["access_token"], str(body.get("token_type") or "Bearer"), expires_in)
+
+
+class TokenCache:
+    """
+    Access tokens per (token endpoint, client, scope). Callers get the cached
+    token without waiting; a daemon thread replaces each one before it expires.
+    Only when there is no valid token at all does a caller fetch one inline,
+    and concurrent callers then share that single request.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._clients: dict[str, _Client] = {}
+        # Authorization header value -> client it was issued to
+        self._issued: "OrderedDict[str, _Client]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+
+    def header(self, token_url: str, client_id: str, client_secret: str, scope: str = "") -> dict[str, str]:
+        key = scoped_key(token_url, f"{client_id}:{client_secret}", scope)
+        with self._cond:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = _Client(key, token_url, client_id, client_secret, scope)
+            client.last_used = time.monotonic()
+            token = client.token
+        if token is None or time.monotonic() >= token.expires_at:
+            token = self._refresh(client)
+        return {"Authorization": token.header}
+
+    def _refresh(self, client: _Client) -> _Token:
+        with client.flight:
+            token = client.token
+            if token is not None and time.monotonic() < token.refresh_at:
+                # Another caller or the refresher got a fresh one while we waited
+                return token
+            token = fetch_token(client.token_url, client.client_id, client.client_secret, client.scope)
+            with self._cond:
+                client.token = token
+                self._issued[token.header] = client
+                while len(self._issued) > MAX_ISSUED_TOKENS:
+                    self._issued.popitem(last=False)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="a2a-oauth-refresh", daemon=True)
+                    self._thread.start()
+                self._cond.notify_all()
+            return token
+
+    def _due(self) -> list[_Client]:
+        """
+        Wait until some token needs refreshing and return those clients; idle ones are dropped.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                for key in [k for k, c in self._clients.items() if now - c.last_used > TOKEN_IDLE_SECONDS]:
+                    del self._clients[key]
+                due = [c for c in self._clients.values() if c.token is not None and c.token.refresh_at <= now]
+                if due:
+                    return due
+                upcoming = [c.token.refresh_at for c in self._clients.values() if c.token is not None]
+                self._cond.wait(min(upcoming) - now if upcoming else TOKEN_IDLE_SECONDS)
+
+    def _run(self) -> None:
+        while True:
+            for client in self._due():
+                try:
+                    self._refresh(client)
+                except Exception as e:
+                    logger.warning("Could not refresh OAuth2 token from %s: %s", client.token_url, e)
+                    with self._cond:
+                        if client.token is not None:
+                            client.token.refresh_at = time.monotonic() + REFRESH_RETRY_SECONDS
+
+    def identity(self, authorization: str) -> Optional[str]:
+        """
+        Stable name of the client an Authorization header value was issued to, or None.
+        """
+        with self._cond:
+            client = self._issued.get(authorization)
+        return f"oauth2:{client.key}" if client else None
+
+    def current(self, authorization: str) -> Optional[str]:
+        """
+        The valid Authorization header value for the client that was issued this one, or None.
+        """
+        with self._cond:
+            client = self._issued.get(authorization)
+        if client is None:
+            return None
+        return self.header(client.token_url, client.client_id, client.client_secret, client.scope)["Authorization"]
+
+    def clear(self) -> None:
+        with self._cond:
+            self._clients.clear()
+            self._issued.clear()
+        with _discovered_lock:
+            _discovered_token_urls.clear()
+
+
+# Shared by every tool and the provider in this process
+token_cache = TokenCache()
+
+# Agent URL -> token endpoint its Agent Card declared; kept after the card expires
+_discovered_token_urls: dict[str, str] = {}
+_discovered_lock = threading.Lock()
+
+
+def _discover_token_url(base_url: str) -> Optional[str]:
+    """
+    The token endpoint an agent's card declares: remembered from an earlier card,
+    read from the cached card, or fetched from the agent's well-known card.
+    """
+    from tools.agent_cards import fetch_agent_card, get_cached_card
+
+    key = base_url.rstrip("/")
+    with _discovered_lock:
+        token_url = _discovered_token_urls.get(key)
+    if token_url:
+        return token_url
+
+    token_url = token_url_from_card(get_cached_card(base_url))
+    if not token_url:
+        # Agent Cards are public, so discovery needs no token
+        card, _ = fetch_agent_card(base_url, {}, timeout=CARD_DISCOVERY_TIMEOUT)
+        token_url = token_url_from_card(card)
+    if token_url:
+        with _discovered_lock:
+            _discovered_token_urls[key] = token_url
+    return token_url
+
+
+def client_credentials_header(base_url: str, api_key: str, token_url: str = "", scope: str = "") -> dict[str, str]:
+    """
+    Authorization header for an agent using OAuth2 client credentials. The token
+    endpoint is the configured Token URL, or the one the agent's Agent Card declares.
+    """
+    client_id, client_secret = parse_client_credentials(api_key)
+    token_url = token_url or _discover_token_url(base_url)
+    if not token_url:
+        raise OAuthError(
+            "no token endpoint: set the agent's Token URL, or publish an Agent Card that declares "
+            "an OAuth2 clientCredentials flow"
+        )
+    return token_cache.header(token_url, client_id, client_secret, scope)
+
+
+def scope_credential(headers: dict[str, str]) -> str:
+    """
+    The credential that cached and tracked results are scoped by. OAuth2 tokens
+    rotate, so they stand for the client they were issued to; other
+    Authorization values are used as they are.
+    """
+    authorization = headers.get("Authorization", "")
+    return token_cache.identity(authorization) or authorization
+
+
+def current_headers(headers: dict[str, str]) -> dict[str, str]:
+    """
+    Headers built earlier, with an OAuth2 token that may have expired since replaced by a valid one.
+    """
+    fresh = token_cache.current(headers.get("Authorization", ""))
+    return {**headers, "Authorization": fresh} if fresh else headers
@@ -0,0 +1,169 @@
+from typing import TYPE_CHECKING, Any, Optional
+import json
+import os
+import threading
+import time
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# Set to a file path to enable the on-disk cache (disabled when unset)
+PERSISTENT_CACHE_ENV = "A2A_PERSISTENT_CACHE"
+
+# Optional size cap in MiB for the on-disk cache
+PERSISTENT_CACHE_MAX_MB_ENV = "A2A_PERSISTENT_CACHE_MAX_MB"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# How long a completed/failed/canceled task result is served from disk
+TASK_RESULT_TTL_SECONDS = 24 * 60 * 60
+
+TASK_RESULT_NAMESPACE = "task_result"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+
+class PersistentStore:
+    """
+    SQLite-backed key/value store (WAL mode) that survives plugin restarts.
+    Values are JSON, every entry has a TTL, and the total size is capped by
+    evicting the oldest entries first. Each thread gets its own connection.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)")
+
+    def _connection(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Return the stored value, or None if absent, expired or unreadable.
+        """
+        import sqlite3
+
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None or row[1] < time.time():
+                return None
+            return json.loads(row[0])
+        except (sqlite3.Error, json.JSONDecodeError):
+            return None
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """
+        Store a JSON-serializable value for ttl seconds, then enforce the size cap.
+        Write failures (locked or full disk) are ignored; the cache is best-effort.
+        """
+        import sqlite3
+
+        encoded = json.dumps(value, separators=(",", ":"))
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, stored_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, encoded, size, now, now + ttl)
+                )
+                conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+                self._evict_locked(conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict_locked(self, conn: "sqlite3.Connection") -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop oldest entries until we are back under the cap
+        for namespace, key, size in conn.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY stored_at"
+        ).fetchall():
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def total_bytes(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def scoped_key(base_url: str, credential: str, *parts: Any) -> str:
+    """
+    Build a cache key bound to an agent and the credential used to reach it,
+    so a cached result is only served to callers that could fetch it themselves.
+    """
+    import hashlib
+
+    scope = hashlib.sha256(f"{base_url.rstrip('/')}\n{credential}".encode()).hexdigest()
+    return ":".join([scope, *(str(part) for part in parts)])
+
+
+_store: Optional[PersistentStore] = None
+_store_path: Optional[str] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[PersistentStore]:
+    """
+    Return the shared on-disk store, or None when A2A_PERSISTENT_CACHE is not set.
+    """
+    global _store, _store_path
+    path = os.environ.get(PERSISTENT_CACHE_ENV, "").strip()
+    if not path:
+        return None
+    if _store is not None and _store_path == path:
+        return _store
+
+    import sqlite3
+
+    with _store_lock:
+        if _store is None or _store_path != path:
+            try:
+                max_mb = float(os.environ.get(PERSISTENT_CACHE_MAX_MB_ENV, "") or 0)
+            except ValueError:
+                max_mb = 0
+            max_bytes = int(max_mb * 1024 * 1024) if max_mb > 0 else DEFAULT_MAX_BYTES
+            try:
+                _store = PersistentStore(path, max_bytes=max_bytes)
+            except (OSError, sqlite3.Error):
+                # A broken cache location must never break the tools themselves
+                return None
+            _store_path = path
+        return _store
@@ -0,0 +1,282 @@
+from collections.abc import Callable, Generator
+from typing import TYPE_CHECKING, Any, Optional
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+# Directory profile reports are written to; setting it enables profiling
+PROFILE_DIR_ENV = "A2A_PROFILE_DIR"
+
+# Fraction of invocations profiled at random (default 0.01)
+PROFILE_SAMPLE_RATE_ENV = "A2A_PROFILE_SAMPLE_RATE"
+
+# Comma-separated agent names whose invocations are always profiled
+PROFILE_AGENTS_ENV = "A2A_PROFILE_AGENTS"
+
+# Largest share of tool time that may run under the profiler (default 0.05)
+PROFILE_MAX_SHARE_ENV = "A2A_PROFILE_MAX_SHARE"
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_MAX_SHARE = 0.05
+
+# A report is written per tool and agent after this many profiled invocations, or this long
+REPORT_EVERY_INVOCATIONS = 50
+REPORT_INTERVAL_SECONDS = 60
+
+# Reports kept in the directory; the oldest are deleted beyond this
+MAX_REPORTS = 50
+
+# Functions listed in each section of a text report
+TOP_FUNCTIONS = 30
+
+REPORT_PREFIX = "profile-"
+
+# From Python 3.12 cProfile is built on sys.monitoring and records every thread while enabled
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+logger = logging.getLogger(__name__)
+
+# Held while an invocation is profiled; one session at a time, so each report's
+# samples belong to the one invocation that was profiled when they were taken
+_session_lock = threading.Lock()
+
+
+class _Aggregate:
+    def __init__(self):
+        self.stats: Optional["pstats.Stats"] = None
+        self.invocations = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.since = time.time()
+
+
+def _slug(value: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in value)[:64] or "-"
+
+
+class InvocationProfiler:
+    """
+    Profiles a sample of tool invocations with cProfile and aggregates the
+    results per tool and agent into hot-function reports. The profiler is on
+    only while the invocation itself runs, and one invocation is profiled at a
+    time; picked invocations that overlap a session run unprofiled. On Python
+    3.12+ a session also records whatever other threads did meanwhile. Invocations
+    stop being picked while profiled wall time exceeds max_share of all tool time.
+    """
+
+    def __init__(self, directory: str, sample_rate: float, agents: frozenset[str], max_share: float):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.agents = agents
+        self.max_share = max_share
+        self.reports = 0
+        self._lock = threading.Lock()
+        self._aggregates: dict[tuple[str, str], _Aggregate] = {}
+        self._total_seconds = 0.0
+        self._profiled_seconds = 0.0
+        self._seq = 0
+
+    def should_profile(self, agent_name: str) -> bool:
+        import random
+
+        with self._lock:
+            if self._profiled_seconds > self.max_share * self._total_seconds:
+                return False
+        return agent_name in self.agents or random.random() < self.sample_rate
+
+    def account(self, seconds: float, profiled: bool = False) -> None:
+        """
+        Add one invocation's wall time to the totals the overhead cap is computed from.
+        """
+        with self._lock:
+            self._total_seconds += seconds
+            if profiled:
+                self._profiled_seconds += seconds
+
+    def run(self, tool: str, agent_name: str, invocation: Generator[Any, None, None]) -> Generator[Any, None, None]:
+        """
+        Drive an _invoke generator with the profiler on while it runs, not while its consumer does.
+        The caller holds the session lock.
+        """
+        import cProfile
+
+        profile = cProfile.Profile()
+        wall = cpu = 0.0
+        try:
+            while True:
+                started, cpu_started = time.perf_counter(), time.thread_time()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiler owns this thread; run unprofiled
+                    yield from invocation
+                    return
+                try:
+                    item = next(invocation)
+                except StopIteration:
+                    break
+                finally:
+                    profile.disable()
+                    wall += time.perf_counter() - started
+                    cpu += time.thread_time() - cpu_started
+                yield item
+        finally:
+            invocation.close()
+            self._add(tool, agent_name, profile, wall, cpu)
+
+    def _add(self, tool: str, agent_name: str, profile: "cProfile.Profile", wall: float, cpu: float) -> None:
+        import pstats
+
+        try:
+            stats = pstats.Stats(profile)
+        except TypeError:
+            return  # Nothing was recorded
+
+        key = (tool, agent_name)
+        with self._lock:
+            aggregate = self._aggregates.setdefault(key, _Aggregate())
+            if aggregate.stats is None:
+                aggregate.stats = stats
+            else:
+                aggregate.stats.add(stats)
+            aggregate.invocations += 1
+            aggregate.wall_seconds += wall
+            aggregate.cpu_seconds += cpu
+            due = aggregate.invocations >= REPORT_EVERY_INVOCATIONS or \
+                time.time() - aggregate.since >= REPORT_INTERVAL_SECONDS
+            if due:
+                del self._aggregates[key]
+        if due:
+            self._write(key, aggregate)
+
+    def flush(self) -> None:
+        """
+        Write reports for everything aggregated so far.
+        """
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+        for key, aggregate in aggregates.items():
+            self._write(key, aggregate)
+
+    def _write(self, key: tuple[str, str], aggregate: _Aggregate) -> None:
+        import io
+
+        tool, agent_name = key
+        with self._lock:
+            self._seq += 1
+            name = f"{REPORT_PREFIX}{time.strftime('%Y%m%dT%H%M%S')}-{self._seq:06d}-{_slug(tool)}-{_slug(agent_name)}"
+
+        wall, cpu = aggregate.wall_seconds, aggregate.cpu_seconds
+        text = io.StringIO()
+        text.write(f"# tool={tool} agent={agent_name} invocations={aggregate.invocations}\n")
+        if PROFILES_ALL_THREADS:
+            text.write("# threads=all: includes work other threads did while these invocations were profiled\n")
+        text.write(f"# window={time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(aggregate.since))}..{time.strftime('%Y-%m-%dT%H:%M:%S')}\n")
+        text.write(
+            f"# wall={wall:.3f}s cpu={cpu:.3f}s waiting={max(0.0, wall - cpu):.3f}s "
+            f"({(cpu / wall * 100) if wall else 0:.0f}% CPU; waiting is mostly network I/O and limiter queues)\n\n"
+        )
+        stats = aggregate.stats
+        stats.stream = text
+        text.write("## By own time\n")
+        stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+        text.write("## By cumulative time\n")
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{name}.txt"), "w") as f:
+                f.write(text.getvalue())
+            # Binary form for snakeviz, gprof2dot or pstats
+            stats.dump_stats(os.path.join(self.directory, f"{name}.prof"))
+            self._rotate()
+        except OSError as e:
+            logger.warning("Could not write profile report to %s: %s", self.directory, e)
+            return
+        with self._lock:
+            self.reports += 1
+
+    def _rotate(self) -> None:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith(REPORT_PREFIX))
+        reports = sorted({n.rsplit(".", 1)[0] for n in names})
+        for stale in reports[:max(0, len(reports) - MAX_REPORTS)]:
+            for suffix in (".txt", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, stale + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        value = float(os.environ.get(name, "").strip())
+    except ValueError:
+        return default
+    return min(1.0, max(0.0, value))
+
+
+_profiler: Optional[InvocationProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Optional[InvocationProfiler]:
+    """
+    Return the shared profiler, or None when A2A_PROFILE_DIR is unset.
+    Settings are re-read on every call, so they can change without a restart.
+    """
+    global _profiler
+    directory = os.environ.get(PROFILE_DIR_ENV, "").strip()
+    if not directory:
+        return None
+
+    sample_rate = _float_env(PROFILE_SAMPLE_RATE_ENV, DEFAULT_SAMPLE_RATE)
+    agents = frozenset(a.strip() for a in os.environ.get(PROFILE_AGENTS_ENV, "").split(",") if a.strip())
+    max_share = _float_env(PROFILE_MAX_SHARE_ENV, DEFAULT_MAX_SHARE)
+    with _profiler_lock:
+        if _profiler is None or _profiler.directory != directory:
+            if _profiler is not None:
+                _profiler.flush()
+            else:
+                import atexit
+                # Reports still aggregating are written when the plugin exits
+                atexit.register(lambda: _profiler and _profiler.flush())
+            _profiler = InvocationProfiler(directory, sample_rate, agents, max_share)
+        else:
+            _profiler.sample_rate, _profiler.agents, _profiler.max_share = sample_rate, agents, max_share
+        return _profiler
+
+
+def profiled(invoke: Callable[..., Generator[Any, None, None]]) -> Callable[..., Generator[Any, None, None]]:
+    """
+    Decorator for a tool's _invoke: runs it under the profiler when
+    A2A_PROFILE_DIR is set and this invocation is picked. Costs one
+    environment lookup per invocation otherwise.
+    """
+    @functools.wraps(invoke)
+    def wrapper(self: Any, tool_parameters: dict[str, Any]) -> Generator[Any, None, None]:
+        profiler = get_profiler()
+        if profiler is None:
+            yield from invoke(self, tool_parameters)
+            return
+
+        agent_name = str(tool_parameters.get("agent_name") or "-")
+        picked = profiler.should_profile(agent_name) and _session_lock.acquire(blocking=False)
+        started = time.perf_counter()
+        try:
+            if picked:
+                yield from profiler.run(type(self).__name__, agent_name, invoke(self, tool_parameters))
+            else:
+                yield from invoke(self, tool_parameters)
+        finally:
+            if picked:
+                _session_lock.release()
+            profiler.account(time.perf_counter() - started, profiled=picked)
+
+    return wrapper
@@ -0,0 +1,338 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Optional
+from urllib.parse import urlsplit
+import json
+import logging
+import os
+import threading
+import time
+from tools.memory_budget import get_accountant
+from tools.persistent_store import scoped_key
+from tools.task_durations import duration_estimator
+from tools.task_reaper import get_reaper
+from tools.task_views import TERMINAL_STATES, task_state
+from tools.transports import normalize_rest_object
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# URL agents POST task updates to; setting it enables the embedded receiver
+PUSH_RECEIVER_URL_ENV = "A2A_PUSH_RECEIVER_URL"
+
+# host:port the receiver listens on (default: all interfaces, port taken from the URL)
+PUSH_RECEIVER_BIND_ENV = "A2A_PUSH_RECEIVER_BIND"
+
+DEFAULT_RECEIVER_PORT = 8765
+
+# Header carrying the per-task token from pushNotificationConfig.token
+TOKEN_HEADER = "X-A2A-Notification-Token"
+
+# Largest notification body accepted
+MAX_NOTIFICATION_BYTES = 4 * 1024 * 1024
+
+# How long a push registration and the tasks it delivered are kept
+PUSH_TTL_SECONDS = 24 * 60 * 60
+
+# A non-terminal pushed task older than this is re-polled, in case notifications stopped arriving
+PUSH_TRUST_SECONDS = 300
+
+# Number of pushed tasks kept in memory
+MAX_PUSHED_TASKS = 10000
+
+# After the receiver fails to listen it is not retried for this long, doubling up to the maximum
+BIND_RETRY_SECONDS = 60
+MAX_BIND_RETRY_SECONDS = 30 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def merge_task_update(task: Optional[dict[str, Any]], update: dict[str, Any]) -> dict[str, Any]:
+    """
+    Apply a pushed Task, TaskStatusUpdateEvent or TaskArtifactUpdateEvent to the stored task.
+    """
+    kind = update.get("kind")
+    if kind == "task" or (kind is None and "status" in update and "taskId" not in update):
+        return update
+
+    task_id = update.get("taskId")
+    task = dict(task or {"kind": "task", "id": task_id, "status": {"state": "unknown"}})
+    if update.get("contextId"):
+        task.setdefault("contextId", update["contextId"])
+
+    if kind == "status-update":
+        task["status"] = update.get("status") or task["status"]
+    elif kind == "artifact-update" and isinstance(update.get("artifact"), dict):
+        artifact = update["artifact"]
+        artifacts = list(task.get("artifacts") or [])
+        for i, existing in enumerate(artifacts):
+            if existing.get("artifactId") == artifact.get("artifactId"):
+                if update.get("append"):
+                    artifact = {**existing, "parts": list(existing.get("parts") or []) + list(artifact.get("parts") or [])}
+                artifacts[i] = artifact
+                break
+        else:
+            artifacts.append(artifact)
+        task["artifacts"] = artifacts
+    return task
+
+
+class PushReceiver:
+    """
+    Webhook receiver for A2A push notifications, served from a daemon thread.
+    Each submitted task gets its own registration token; notifications carrying
+    a known token are merged into an in-memory task store that get_task_status
+    reads before polling the agent. Stored tasks are bound to the agent URL and
+    credential that submitted them, like the on-disk task cache.
+    """
+
+    def __init__(self, public_url: str, host: str = "0.0.0.0", port: int = DEFAULT_RECEIVER_PORT):
+        self.public_url = public_url
+        self.path = urlsplit(public_url).path or "/"
+        self._lock = threading.Lock()
+        # token -> {"scope", "task_id", "expires_at"}
+        self._registrations: dict[str, dict[str, Any]] = {}
+        # scoped (agent, credential, task) key -> (received_at, task, size)
+        self._tasks: "OrderedDict[str, tuple[float, dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self.server = self._build_server(host, port)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _build_server(self, host: str, port: int) -> "ThreadingHTTPServer":
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _reply(self, status: int, body: str = "") -> None:
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self) -> None:
+                # Endpoint validation: echo validationToken back
+                from urllib.parse import parse_qs
+
+                parts = urlsplit(self.path)
+                token = parse_qs(parts.query).get("validationToken")
+                if parts.path != receiver.path or not token:
+                    self._reply(404)
+                    return
+                self._reply(200, token[0])
+
+            def do_POST(self) -> None:
+                if urlsplit(self.path).path != receiver.path:
+                    self._reply(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_NOTIFICATION_BYTES:
+                    self.close_connection = True
+                    self._reply(413)
+                    return
+                try:
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self._reply(400)
+                    return
+                self._reply(receiver.accept(self.headers.get(TOKEN_HEADER, ""), update))
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def register(self, base_url: str, credential: str) -> dict[str, Any]:
+        """
+        Create a pushNotificationConfig for one task submission.
+        """
+        import secrets
+        import uuid
+
+        token = secrets.token_urlsafe(24)
+        now = time.time()
+        with self._lock:
+            for expired in [t for t, r in self._registrations.items() if r["expires_at"] < now]:
+                del self._registrations[expired]
+            self._registrations[token] = {
+                "scope": scoped_key(base_url, credential),
+                "task_id": None,
+                "expires_at": now + PUSH_TTL_SECONDS
+            }
+        return {"id": str(uuid.uuid4()), "url": self.public_url, "token": token}
+
+    def bind(self, token: str, task_id: str) -> None:
+        """
+        Tie a registration to the task the agent created for it.
+        """
+        with self._lock:
+            registration = self._registrations.get(token)
+            if registration is not None and registration["task_id"] is None:
+                registration["task_id"] = task_id
+
+    def unregister(self, token: str) -> None:
+        with self._lock:
+            self._registrations.pop(token, None)
+
+    def accept(self, token: str, update: Any) -> int:
+        """
+        Validate and store one notification; returns the HTTP status to answer with.
+        """
+        update = normalize_rest_object(update)
+        if not isinstance(update, dict):
+            return 400
+        task_id = update.get("taskId") or update.get("id")
+        if not task_id:
+            return 400
+
+        with self._lock:
+            registration = self._registrations.get(token) if token else None
+            if registration is None or registration["expires_at"] < time.time():
+                return 401
+            if registration["task_id"] is None:
+                # The notification can beat the submit response
+                registration["task_id"] = task_id
+            elif registration["task_id"] != task_id:
+                return 403
+            key = f"{registration['scope']}:{task_id}"
+            entry = self._tasks.get(key)
+            task = merge_task_update(entry[1] if entry else None, update)
+            self._put_locked(key, task)
+        if task_state(task) in TERMINAL_STATES:
+            # Pushed completions time the task more precisely than the next poll would
+            duration_estimator.finished(key)
+            reaper = get_reaper()
+            if reaper:
+                reaper.finished(key)
+        return 200
+
+    def _put_locked(self, key: str, task: dict[str, Any]) -> None:
+        self._drop_locked(key)
+        size = len(json.dumps(task, default=str))
+        self._tasks[key] = (time.monotonic(), task, size)
+        self._bytes += size
+        while len(self._tasks) > MAX_PUSHED_TASKS:
+            self._drop_locked(next(iter(self._tasks)))
+
+    def _drop_locked(self, key: str) -> None:
+        entry = self._tasks.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def get_task(self, base_url: str, credential: str, task_id: str) -> Optional[dict[str, Any]]:
+        """
+        Latest pushed state of a task, or None when polling is needed: nothing was
+        pushed, or the task is still running and has not been heard from recently.
+        """
+        key = scoped_key(base_url, credential, task_id)
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is None:
+                return None
+            received_at, task, _ = entry
+            age = time.monotonic() - received_at
+            if age > PUSH_TTL_SECONDS:
+                self._drop_locked(key)
+                return None
+        if task_state(task) not in TERMINAL_STATES and age > PUSH_TRUST_SECONDS:
+            return None
+        return task
+
+    def refresh(self, base_url: str, credential: str, task_id: str, task: Any) -> None:
+        """
+        Replace a tracked task with a freshly polled copy.
+        """
+        key = scoped_key(base_url, credential, task_id)
+        with self._lock:
+            if key in self._tasks and isinstance(task, dict):
+                self._put_locked(key, task)
+
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+    def evict(self, nbytes: int) -> int:
+        """
+        Drop the oldest pushed tasks; get_task_status polls for them instead.
+        """
+        freed = 0
+        with self._lock:
+            while self._tasks and freed < nbytes:
+                key = next(iter(self._tasks))
+                freed += self._tasks[key][2]
+                self._drop_locked(key)
+        return freed
+
+
+def trim_history(task: Any, history_length: Any) -> Any:
+    """
+    Apply tasks/get historyLength to a locally stored task.
+    """
+    if not isinstance(task, dict) or history_length in (None, "") or "history" not in task:
+        return task
+    length = max(0, int(history_length))
+    return {**task, "history": task["history"][-length:] if length else []}
+
+
+_receiver: Optional[PushReceiver] = None
+_receiver_url: Optional[str] = None
+_receiver_lock = threading.Lock()
+# ((url, bind), retry_at, backoff) of the last configuration that failed to listen
+_bind_failure: Optional[tuple[tuple[str, str], float, float]] = None
+
+
+def get_push_receiver() -> Optional[PushReceiver]:
+    """
+    Return the running receiver, starting it on first use, or None when
+    A2A_PUSH_RECEIVER_URL is not set or the receiver cannot listen. A failure to
+    listen is logged once per configuration and retried with backoff.
+    """
+    global _receiver, _receiver_url, _bind_failure
+    url = os.environ.get(PUSH_RECEIVER_URL_ENV, "").strip()
+    if not url:
+        return None
+    if _receiver is not None and _receiver_url == url:
+        return _receiver
+
+    with _receiver_lock:
+        if _receiver is None or _receiver_url != url:
+            bind = os.environ.get(PUSH_RECEIVER_BIND_ENV, "").strip()
+            failed = _bind_failure if _bind_failure and _bind_failure[0] == (url, bind) else None
+            if failed and time.monotonic() < failed[1]:
+                return None
+            host, _, port = bind.rpartition(":") if bind else ("", "", "")
+            try:
+                receiver = PushReceiver(
+                    url,
+                    host or "0.0.0.0",
+                    int(port) if port else urlsplit(url).port or DEFAULT_RECEIVER_PORT
+                )
+            except (OSError, ValueError) as e:
+                # Another plugin process may hold the port; tasks are polled as before
+                if failed:
+                    backoff = min(failed[2] * 2, MAX_BIND_RETRY_SECONDS)
+                    logger.debug("Push receiver still disabled: %s", e)
+                else:
+                    backoff = BIND_RETRY_SECONDS
+                    logger.warning("Push receiver disabled: %s", e)
+                _bind_failure = ((url, bind), time.monotonic() + backoff, backoff)
+                return None
+            _bind_failure = None
+            receiver.start()
+            if _receiver is not None:
+                _receiver.close()
+            _receiver = receiver
+            _receiver_url = url
+            get_accountant().register_cache("push_tasks", receiver.memory_bytes, receiver.evict)
+        return _receiver
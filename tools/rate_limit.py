@@ -0,0 +1,271 @@
+from collections import deque
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional
+import threading
+import time
+
+if TYPE_CHECKING:
+    import requests
+
+# Longest a call may wait in an agent's queue before giving up
+QUEUE_TIMEOUT_SECONDS = 30
+
+# Extra attempts after a 429/503 before the throttling is reported to the caller
+MAX_THROTTLE_RETRIES = 2
+
+# Pause applied on 429/503 when the agent sends no usable Retry-After
+DEFAULT_THROTTLE_BACKOFF_SECONDS = 1.0
+
+# Adaptive rate never drops below this many requests/second
+MIN_ADAPTIVE_RATE = 0.1
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class AgentRateLimitedError(Exception):
+    """Raised when an agent keeps throttling us or its local queue wait runs out."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_limit(value: Any) -> float:
+    """
+    Parse a configured limit; blank, zero or invalid values mean unlimited (0).
+    """
+    try:
+        limit = float(str(value).strip())
+    except (TypeError, ValueError):
+        return 0.0
+    return limit if limit > 0 else 0.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either as delta-seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class AgentLimiter:
+    """
+    Per-agent admission control: a max-in-flight cap plus a token bucket, served
+    first-come first-served. Throttling responses pause the agent for Retry-After
+    and halve the request rate, which then recovers additively on success.
+    """
+
+    def __init__(self, max_in_flight: int = 0, rate: float = 0.0):
+        self._cond = threading.Condition()
+        self._waiters: deque[object] = deque()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self.configure(max_in_flight, rate)
+
+    def configure(self, max_in_flight: int, rate: float) -> None:
+        """
+        Apply (possibly changed) limits; 0 means unlimited.
+        """
+        with self._cond:
+            self.max_in_flight = int(max_in_flight)
+            self.configured_rate = float(rate)
+            self.rate = float(rate)
+            self._tokens = max(1.0, self.rate)
+            self._last_refill = time.monotonic()
+            self._cond.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _refill_locked(self, now: float) -> None:
+        if self.rate > 0:
+            burst = max(1.0, self.rate)
+            self._tokens = min(burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _delay_locked(self, now: float) -> Optional[float]:
+        """
+        Seconds until the head of the queue may proceed, or None if it must wait for a release.
+        """
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            return None
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        if self.rate > 0:
+            self._refill_locked(now)
+            if self._tokens < 1.0:
+                return (1.0 - self._tokens) / self.rate
+        return 0.0
+
+    def acquire(self, timeout: float = QUEUE_TIMEOUT_SECONDS) -> bool:
+        """
+        Wait (in FIFO order) for a slot and a token. Returns False if timeout expires first.
+        """
+        deadline = time.monotonic() + timeout
+        ticket = object()
+
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._delay_locked(now) if self._waiters[0] is ticket else None
+
+                    if delay == 0.0:
+                        self._waiters.popleft()
+                        self._in_flight += 1
+                        if self.rate > 0:
+                            self._tokens -= 1.0
+                        self._cond.notify_all()
+                        return True
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining if delay is None else min(delay, remaining))
+            finally:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._cond.notify_all()
+
+    def on_throttled(self, retry_after: Optional[float]) -> float:
+        """
+        Record a 429/503. Returns the pause applied before the next request.
+        """
+        pause = retry_after if retry_after is not None else DEFAULT_THROTTLE_BACKOFF_SECONDS
+        with self._cond:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + pause)
+            if self.rate > 0:
+                self._refill_locked(now)
+                self.rate = max(MIN_ADAPTIVE_RATE, self.rate / 2)
+                self._tokens = min(self._tokens, 1.0)
+            self._cond.notify_all()
+        return pause
+
+    def on_success(self) -> None:
+        """
+        Record a successful response; recovers the adaptive rate towards the configured one.
+        """
+        if self.rate >= self.configured_rate:
+            return
+        with self._cond:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self.rate = min(self.configured_rate, self.rate + max(MIN_ADAPTIVE_RATE, self.configured_rate / 10))
+
+
+# (agent URL, max in flight, rate) -> limiter; credential sets configured with
+# different limits for one agent each keep their own bucket and adaptive rate
+_limiters: dict[tuple[str, int, float], AgentLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(agent_base_url: str, max_in_flight: Any = 0, rate: Any = 0) -> AgentLimiter:
+    """
+    Return the limiter shared by every caller of an agent with the same configured limits.
+    """
+    max_in_flight = int(parse_limit(max_in_flight))
+    rate = parse_limit(rate)
+    key = (agent_base_url.rstrip("/"), max_in_flight, rate)
+
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AgentLimiter(max_in_flight, rate)
+        return limiter
+
+
+def reset_limiters() -> None:
+    """
+    Drop all limiter state.
+    """
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def _release_on_close(response: "requests.Response", limiter: AgentLimiter) -> None:
+    """
+    Release the limiter slot the first time the response is closed, from any thread.
+    """
+    close = response.close
+    lock = threading.Lock()
+    held = [True]
+
+    def close_and_release() -> None:
+        try:
+            close()
+        finally:
+            with lock:
+                release, held[0] = held[0], False
+            if release:
+                limiter.release()
+
+    response.close = close_and_release
+
+
+def send_with_limits(
+    limiter: AgentLimiter,
+    send: Callable[[], "requests.Response"],
+    queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+    hold_until_close: bool = False
+) -> "requests.Response":
+    """
+    Run send() under the agent's limiter, retrying after Retry-After on 429/503.
+    Raises AgentRateLimitedError if the queue wait times out or throttling persists.
+    With hold_until_close, the in-flight slot of a successful response is kept until
+    the response is closed, so streams count toward max_in_flight while they are read;
+    the caller must close it.
+    """
+    deadline = time.monotonic() + queue_timeout
+    attempt = 0
+
+    while True:
+        if not limiter.acquire(max(0.0, deadline - time.monotonic())):
+            raise AgentRateLimitedError(
+                f"Agent is at its request limit; no slot freed up within {queue_timeout:g}s"
+            )
+        try:
+            response = send()
+        except BaseException:
+            limiter.release()
+            raise
+
+        if response.status_code not in THROTTLE_STATUS_CODES:
+            limiter.on_success()
+            if hold_until_close:
+                _release_on_close(response, limiter)
+            else:
+                limiter.release()
+            return response
+
+        limiter.release()
+        pause = limiter.on_throttled(parse_retry_after(response.headers.get("Retry-After")))
+        response.close()
+        attempt += 1
+        if attempt > MAX_THROTTLE_RETRIES or time.monotonic() + pause > deadline:
+            raise AgentRateLimitedError(
+                f"Agent returned HTTP {response.status_code}; retry after {pause:g}s",
+                retry_after=pause
+            )
@@ -0,0 +1,239 @@
+"""
+Replay server for traffic captured with A2A_TRAFFIC_CAPTURE.
+
+Serves the recorded responses back to the plugin, in recorded order per request
+shape, with the original timing scaled by --time-scale (0 = as fast as possible).
+Point an agent's URL at the replay server to benchmark plugin changes against a
+real recorded workload:
+
+    python -m tools.replay capture.jsonl --port 9999 --time-scale 1.0
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import urlsplit
+import argparse
+import json
+import threading
+import time
+
+# Recorded response headers that no longer describe the replayed body
+_SKIPPED_HEADERS = ("content-length", "transfer-encoding", "connection", "content-encoding", "keep-alive")
+
+
+def load_traces(path: str) -> list[dict[str, Any]]:
+    """
+    Read a capture file, skipping blank or truncated lines.
+    """
+    traces = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                traces.append(json.loads(line))
+            except ValueError:
+                continue
+    return traces
+
+
+def _rpc_method(body: Any) -> Optional[str]:
+    return body.get("method") if isinstance(body, dict) and "jsonrpc" in body else None
+
+
+def trace_key(method: str, url: str, body: Any) -> tuple[str, str, Optional[str]]:
+    """
+    What identifies "the same request" across recording and replay:
+    HTTP verb, path, and JSON-RPC method.
+    """
+    return (method.upper(), urlsplit(url).path or "/", _rpc_method(body))
+
+
+class TraceBook:
+    """
+    Recorded exchanges grouped by trace_key, handed out in recorded order and
+    cycled once exhausted, so a replay is deterministic for a given request order.
+    """
+
+    def __init__(self, traces: list[dict[str, Any]]):
+        self._queues: dict[tuple[str, str, Optional[str]], list[dict[str, Any]]] = {}
+        self._positions: dict[tuple[str, str, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+        for trace in traces:
+            key = trace_key(trace.get("method", "GET"), trace.get("url", "/"), trace.get("request_body"))
+            self._queues.setdefault(key, []).append(trace)
+
+    def next(self, key: tuple[str, str, Optional[str]]) -> Optional[dict[str, Any]]:
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return queue[position % len(queue)]
+
+
+def _with_request_id(data: Any, request_id: Any) -> Any:
+    # The plugin matches JSON-RPC responses to requests by id, which differs per run
+    if request_id is not None and isinstance(data, dict) and "jsonrpc" in data:
+        return {**data, "id": request_id}
+    return data
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    server: "ReplayServer"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._replay(None)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            raw = self.rfile.read(length)
+        elif "chunked" in self.headers.get("Transfer-Encoding", ""):
+            raw = self._read_chunked()
+        else:
+            raw = b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            body = None
+        self._replay(body)
+
+    def _read_chunked(self) -> bytes:
+        data = b""
+        while True:
+            size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                self.rfile.readline()
+                return data
+            data += self.rfile.read(size)
+            self.rfile.readline()
+
+    def _replay(self, body: Any) -> None:
+        started = time.monotonic()
+        trace = self.server.book.next(trace_key(self.command, self.path, body))
+        request_id = body.get("id") if isinstance(body, dict) else None
+
+        if trace is None:
+            payload = json.dumps({"error": f"No recorded trace for {self.command} {self.path}"}).encode()
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.server.wait_until(started, trace.get("elapsed_ms", 0))
+
+        if trace.get("error") or "status" not in trace:
+            # The recorded request failed at the network level: drop the connection
+            self.close_connection = True
+            return
+
+        self.send_response(trace["status"])
+        for name, value in (trace.get("response_headers") or {}).items():
+            if name.lower() not in _SKIPPED_HEADERS:
+                self.send_header(name, value)
+
+        if "events" in trace:
+            # Chunked, so that each event reaches the client at its recorded offset
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.close_connection = True
+            for event in trace["events"]:
+                self.server.wait_until(started, event.get("offset_ms", 0))
+                chunk = self._format_event(event, request_id)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        response_body = trace.get("response_body")
+        if isinstance(response_body, str):
+            payload = response_body.encode()
+        elif response_body is None or set(response_body) <= {"bytes", "streamed"}:
+            # Binary or oversized bodies are recorded by size only
+            payload = b""
+        else:
+            payload = json.dumps(_with_request_id(response_body, request_id)).encode()
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _format_event(self, event: dict[str, Any], request_id: Any) -> bytes:
+        data = event.get("data")
+        if not isinstance(data, str):
+            data = json.dumps(_with_request_id(data, request_id))
+        lines = []
+        if event.get("event") and event["event"] != "message":
+            lines.append(f"event: {event['event']}")
+        if event.get("id"):
+            lines.append(f"id: {event['id']}")
+        lines.extend(f"data: {line}" for line in data.split("\n"))
+        return ("\n".join(lines) + "\n\n").encode()
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+    HTTP server answering requests from a TraceBook.
+    time_scale multiplies every recorded delay: 1.0 replays the original timing,
+    0.5 twice as fast, 0 without any delay.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, traces: list[dict[str, Any]], host: str = "127.0.0.1", port: int = 0, time_scale: float = 1.0):
+        self.book = TraceBook(traces)
+        self.time_scale = max(0.0, time_scale)
+        super().__init__((host, port), ReplayHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def wait_until(self, started: float, offset_ms: float) -> None:
+        delay = started + offset_ms * self.time_scale / 1000 - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        pass  # Clients dropping a stream early (e.g. submit_task after the taskId) is expected
+
+    def start(self) -> threading.Thread:
+        """
+        Serve in a background thread; call shutdown() and server_close() to stop.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay captured A2A traffic")
+    parser.add_argument("capture", help="JSONL file written with A2A_TRAFFIC_CAPTURE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplier for recorded delays (1.0 original, 0 no delay)")
+    args = parser.parse_args(argv)
+
+    traces = load_traces(args.capture)
+    server = ReplayServer(traces, args.host, args.port, args.time_scale)
+    print(f"Replaying {len(traces)} exchanges from {args.capture} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+from collections.abc import Generator
+from typing import Any, Optional
+import json
+import time
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header
+from tools.agent_cards import get_cached_card
+from tools.memory_budget import MemoryBudgetExceededError, get_accountant
+from tools.rate_limit import AgentRateLimitedError, get_limiter, send_with_limits
+from tools.task_views import task_state
+from tools.transports import read_result, select_endpoint, send_request
+from tools.profiling import profiled
+
+# Default per-step timeout in seconds (matches call_agent)
+DEFAULT_STEP_TIMEOUT = 60
+
+# Upper bound on steps so a malformed plan can't run forever
+MAX_PIPELINE_STEPS = 20
+
+
+class PipelineStepError(Exception):
+    """Raised when one step of the pipeline fails."""
+
+
+def _parse_timeout(value: Any) -> Optional[float]:
+    """
+    A positive, finite number of seconds, or None if value is not one.
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if 0 < seconds < float("inf") else None
+
+
+class RunPipelineTool(Tool):
+    def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
+        """
+        Build agents registry from raw credential fields.
+        This is called at runtime by the tool.
+        """
+        registry = {}
+
+        for i in range(1, 6):
+            agent_name = self.runtime.credentials.get(f"agent_{i}_name", "").strip()
+            if not agent_name:
+                continue
+
+            agent_url = self.runtime.credentials.get(f"agent_{i}_url", "").strip()
+            auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
+            api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
+            description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            max_concurrency = self.runtime.credentials.get(f"agent_{i}_max_concurrency", "")
+            rate_limit = self.runtime.credentials.get(f"agent_{i}_rate_limit", "")
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
+
+            registry[agent_name] = {
+                "base_url": agent_url,
+                "auth_type": auth_type,
+                "api_key": api_key,
+                "description": description,
+                "max_concurrency": max_concurrency,
+                "rate_limit": rate_limit,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
+            }
+
+        return registry
+
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
+        """
+        Build the appropriate Authorization header based on auth type.
+        """
+        if auth_type == "none" or not api_key:
+            return {}
+        elif auth_type == "bearer":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "api-key":
+            return {"Authorization": f"Bearer {api_key}"}
+        elif auth_type == "basic":
+            import base64
+            encoded = base64.b64encode(api_key.encode()).decode()
+            return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
+        else:
+            return {"Authorization": f"Bearer {api_key}"}
+
+    def _result_parts(self, result: Any) -> list[dict[str, Any]]:
+        """
+        Collect the output parts of a message/send result (Message or Task).
+        """
+        if result is None:
+            return []
+        if not isinstance(result, dict):
+            return [{"kind": "text", "text": str(result)}]
+
+        if result.get("kind") == "task":
+            parts = [
+                part
+                for artifact in result.get("artifacts", []) or []
+                for part in artifact.get("parts", []) or []
+            ]
+            if parts:
+                return parts
+            status_message = (result.get("status") or {}).get("message") or {}
+            return list(status_message.get("parts", []) or [])
+
+        return list(result.get("parts", []) or [])
+
+    def _parts_text(self, parts: list[dict[str, Any]]) -> str:
+        """
+        Flatten parts into text for prompt templates; data parts become JSON.
+        """
+        chunks = []
+        for part in parts:
+            kind = part.get("kind")
+            if kind == "text":
+                chunks.append(part.get("text", ""))
+            elif kind == "data":
+                chunks.append(json.dumps(part.get("data")))
+            elif kind == "file":
+                file_info = part.get("file") or {}
+                chunks.append(f"[file: {file_info.get('name') or file_info.get('uri') or 'attachment'}]")
+        return "\n".join(chunks)
+
+    def _render_prompt(self, template: str, pipeline_input: str, outputs: list[str]) -> str:
+        """
+        Substitute {input}, {previous} and {step_N} (1-based) in a prompt template.
+        Plain replacement, so literal braces elsewhere in the template are left alone.
+        """
+        rendered = template.replace("{input}", pipeline_input)
+        rendered = rendered.replace("{previous}", outputs[-1] if outputs else pipeline_input)
+        for index, output in enumerate(outputs, start=1):
+            rendered = rendered.replace(f"{{step_{index}}}", output)
+        return rendered
+
+    def _send_step(
+        self,
+        agent_name: str,
+        agent_config: dict[str, Any],
+        parts: list[dict[str, Any]],
+        timeout: float
+    ) -> list[dict[str, Any]]:
+        """
+        Send one message/send to an agent over the pooled session and return its output parts.
+        """
+        import uuid
+        import requests
+
+        message = {
+            "kind": "message",
+            "role": "user",
+            "messageId": str(uuid.uuid4()),
+            "parts": parts
+        }
+        endpoint = select_endpoint(agent_config["base_url"], get_cached_card(agent_config["base_url"]))
+
+        headers = {"Content-Type": "application/json"}
+        try:
+            headers.update(self._build_auth_header(
+                agent_config.get("auth_type", "none"), agent_config.get("api_key", ""), agent_config
+            ))
+        except OAuthError as e:
+            raise PipelineStepError(f"{agent_name}: Auth Error: {str(e)}")
+
+        limiter = get_limiter(
+            agent_config["base_url"],
+            agent_config.get("max_concurrency"),
+            agent_config.get("rate_limit")
+        )
+
+        try:
+            with get_accountant().reserve_response(agent_config["base_url"], timeout=timeout) as reservation:
+                response = send_with_limits(limiter, lambda: send_request(
+                    endpoint, "message/send", {"message": message}, headers, timeout
+                ), queue_timeout=timeout)
+                reservation.charge_response(response)
+                result, error = read_result(endpoint, response)
+        except AgentRateLimitedError as e:
+            raise PipelineStepError(f"{agent_name}: Rate Limited: {str(e)}")
+        except MemoryBudgetExceededError as e:
+            raise PipelineStepError(f"{agent_name}: Memory Budget Exceeded: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            raise PipelineStepError(f"{agent_name}: Network Error: {str(e)}")
+        except json.JSONDecodeError:
+            raise PipelineStepError(f"{agent_name}: Invalid JSON Response: {response.text}")
+
+        if error is not None:
+            raise PipelineStepError(f"{agent_name}: A2A Error: {json.dumps(error)}")
+
+        # Only a completed Task is output; any other state (failed, input-required, still
+        # working...) would hand its status text to the next step as if it were a result
+        if isinstance(result, dict) and result.get("kind") == "task":
+            state = task_state(result)
+            if state != "completed":
+                status_message = (result.get("status") or {}).get("message") or {}
+                detail = self._parts_text(list(status_message.get("parts", []) or []))
+                raise PipelineStepError(
+                    f"{agent_name}: Task {result.get('id')} is '{state}'" + (f": {detail}" if detail else "")
+                )
+
+        parts = self._result_parts(result)
+        if not parts:
+            raise PipelineStepError(f"{agent_name}: Step returned no output")
+        return parts
+
+    def _parse_steps(self, raw_steps: Any, agents_registry: dict[str, dict[str, Any]]) -> list[list[dict[str, Any]]]:
+        """
+        Normalize the steps parameter into a list of stages, each a list of branches.
+        """
+        steps = json.loads(raw_steps) if isinstance(raw_steps, str) else raw_steps
+        if not isinstance(steps, list) or not steps:
+            raise ValueError("steps must be a non-empty JSON array")
+        if len(steps) > MAX_PIPELINE_STEPS:
+            raise ValueError(f"A pipeline may have at most {MAX_PIPELINE_STEPS} steps")
+
+        stages = []
+        for index, step in enumerate(steps, start=1):
+            if not isinstance(step, dict):
+                raise ValueError(f"Step {index} must be an object")
+            branches = step.get("parallel", [step])
+            if not isinstance(branches, list) or not branches:
+                raise ValueError(f"Step {index}: parallel must be a non-empty array")
+            for branch in branches:
+                agent = branch.get("agent") if isinstance(branch, dict) else None
+                if not agent or agent not in agents_registry:
+                    raise ValueError(f"Step {index}: Agent '{agent}' not found in registry.")
+                if not agents_registry[agent].get("base_url"):
+                    raise ValueError(f"Step {index}: Base URL missing for agent '{agent}'.")
+                timeout = branch.get("timeout")
+                if timeout not in (None, "") and _parse_timeout(timeout) is None:
+                    raise ValueError(f"Step {index}: Invalid timeout '{timeout}' for agent '{agent}'.")
+            stages.append(branches)
+        return stages
+
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Invoke the Run Pipeline tool.
+        Chains message/send calls across agents inside the plugin, feeding each step's
+        output parts into the next step without an LLM round trip in between.
+        Steps may fan out to parallel branches whose outputs are combined.
+        """
+        agents_registry = self._build_agents_registry()
+        if not agents_registry:
+            yield self.create_text_message("Agents Registry is not configured.")
+            return
+
+        try:
+            stages = self._parse_steps(tool_parameters.get("steps"), agents_registry)
+        except (ValueError, json.JSONDecodeError) as e:
+            yield self.create_text_message(f"Invalid pipeline steps: {str(e)}")
+            return
+
+        pipeline_input = tool_parameters.get("input") or ""
+        default_timeout = _parse_timeout(tool_parameters.get("step_timeout")) or DEFAULT_STEP_TIMEOUT
+
+        current_parts = [{"kind": "text", "text": pipeline_input}]
+        outputs: list[str] = []
+        trace = []
+        pipeline_start = time.monotonic()
+
+        from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+        executor = ThreadPoolExecutor(
+            max_workers=max(len(branches) for branches in stages),
+            thread_name_prefix="a2a-pipeline"
+        )
+        try:
+            for index, branches in enumerate(stages, start=1):
+                step_start = time.monotonic()
+
+                def run_branch(branch: dict[str, Any], timeout: float) -> list[dict[str, Any]]:
+                    prompt = branch.get("prompt")
+                    # Without a prompt template, the previous parts (text and data) are forwarded as-is
+                    parts = (
+                        [{"kind": "text", "text": self._render_prompt(prompt, pipeline_input, outputs)}]
+                        if prompt else current_parts
+                    )
+                    return self._send_step(branch["agent"], agents_registry[branch["agent"]], parts, timeout)
+
+                # Every branch runs on the executor so its timeout bounds the whole step
+                # (queueing, retries and reading the reply), not just each socket read
+                timeouts = [_parse_timeout(branch.get("timeout")) or default_timeout for branch in branches]
+                futures = [
+                    executor.submit(run_branch, branch, timeout)
+                    for branch, timeout in zip(branches, timeouts)
+                ]
+                branch_parts = []
+                for branch, timeout, future in zip(branches, timeouts, futures):
+                    try:
+                        branch_parts.append(future.result(timeout=max(0.0, step_start + timeout - time.monotonic())))
+                    except FutureTimeoutError:
+                        raise PipelineStepError(f"{branch['agent']}: Timed out after {timeout:g}s")
+
+                if len(branches) == 1:
+                    current_parts = branch_parts[0]
+                    outputs.append(self._parts_text(current_parts))
+                else:
+                    current_parts = [part for parts in branch_parts for part in parts]
+                    outputs.append("\n\n".join(
+                        f"[{branch['agent']}]\n{self._parts_text(parts)}"
+                        for branch, parts in zip(branches, branch_parts)
+                    ))
+
+                trace.append({
+                    "step": index,
+                    "agents": [branch["agent"] for branch in branches],
+                    "elapsed_ms": int((time.monotonic() - step_start) * 1000)
+                })
+
+        except PipelineStepError as e:
+            yield self.create_text_message(f"Pipeline failed at step {len(trace) + 1}: {str(e)}")
+            return
+        except Exception as e:
+            yield self.create_text_message(f"Error: {str(e)}")
+            return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield self.create_text_message(json.dumps({
+            "output": outputs[-1],
+            "steps": trace,
+            "elapsed_ms": int((time.monotonic() - pipeline_start) * 1000)
+        }))
@@ -0,0 +1,184 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from tools.memory_budget import MemoryReservation
+
+_BOM = b"\xef\xbb\xbf"
+_CR = 0x0D
+_LF = 0x0A
+
+
+@dataclass
+class SSEEvent:
+    """A single dispatched Server-Sent Event."""
+    data: str
+    event: str = "message"
+    id: str = ""
+    retry: Optional[int] = None
+
+
+class SSEParser:
+    """
+    Incremental Server-Sent Events parser.
+    Feed it raw bytes as they arrive; it returns every event completed by that chunk.
+    Lines are split on bytes and only decoded once an event is dispatched,
+    so multi-byte UTF-8 characters split across chunks are handled transparently.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._data: list[bytes] = []
+        self._event_type = b""
+        self._started = False
+        self.last_event_id = ""
+        self.retry: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        """
+        Append a chunk of the stream and return the events it completes.
+        """
+        buf = self._buffer
+        buf += chunk
+
+        if not self._started:
+            # Strip a leading BOM once we have enough bytes to tell
+            if len(buf) < len(_BOM) and _BOM.startswith(bytes(buf)):
+                return []
+            if buf.startswith(_BOM):
+                del buf[:len(_BOM)]
+            self._started = True
+
+        return self._drain(final=False)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """
+        Bytes held for a line or event that has not been dispatched yet.
+        """
+        return len(self._buffer) + sum(len(line) for line in self._data)
+
+    def flush(self) -> list[SSEEvent]:
+        """
+        Signal end of stream. A trailing CR is treated as a line ending;
+        an event without its terminating blank line is discarded per the SSE spec.
+        """
+        events = self._drain(final=True)
+        self._buffer.clear()
+        self._data = []
+        self._event_type = b""
+        return events
+
+    def _drain(self, final: bool) -> list[SSEEvent]:
+        buf = self._buffer
+        length = len(buf)
+        events: list[SSEEvent] = []
+        pos = 0
+
+        while pos < length:
+            lf = buf.find(b"\n", pos)
+            cr = buf.find(b"\r", pos, lf if lf != -1 else length)
+
+            if cr != -1:
+                end = cr
+                if cr + 1 < length:
+                    next_pos = cr + 2 if buf[cr + 1] == _LF else cr + 1
+                elif final:
+                    next_pos = cr + 1
+                else:
+                    # Need the next byte to know whether this is CRLF
+                    break
+            elif lf != -1:
+                end = lf
+                next_pos = lf + 1
+            else:
+                break
+
+            if end == pos:
+                event = self._dispatch()
+                if event is not None:
+                    events.append(event)
+            else:
+                self._process_line(bytes(buf[pos:end]))
+            pos = next_pos
+
+        if pos:
+            del buf[:pos]
+        return events
+
+    def _process_line(self, line: bytes) -> None:
+        if line[0] == 0x3A:
+            # Comment line (": keep-alive")
+            return
+
+        colon = line.find(b":")
+        if colon == -1:
+            field = line
+            value = b""
+        else:
+            field = line[:colon]
+            value = line[colon + 1:]
+            if value[:1] == b" ":
+                value = value[1:]
+
+        if field == b"data":
+            self._data.append(value)
+        elif field == b"event":
+            self._event_type = value
+        elif field == b"id":
+            if b"\x00" not in value:
+                self.last_event_id = value.decode("utf-8", errors="replace")
+        elif field == b"retry":
+            if value.isdigit():
+                self.retry = int(value)
+        # Unknown fields are ignored per the SSE spec
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        data = self._data
+        event_type = self._event_type
+        self._data = []
+        self._event_type = b""
+
+        if not data:
+            return None
+
+        payload = data[0] if len(data) == 1 else b"\n".join(data)
+        return SSEEvent(
+            data=payload.decode("utf-8", errors="replace"),
+            event=event_type.decode("utf-8", errors="replace") if event_type else "message",
+            id=self.last_event_id,
+            retry=self.retry
+        )
+
+
+def parse_sse_chunks(
+    chunks: Iterable[bytes],
+    reservation: Optional["MemoryReservation"] = None
+) -> Iterator[SSEEvent]:
+    """
+    Parse an iterable of byte chunks into SSE events.
+    With a memory reservation, it is grown to cover the parser's buffer, so an event that
+    never ends raises MemoryBudgetExceededError instead of growing without bound.
+    """
+    parser = SSEParser()
+    for chunk in chunks:
+        if chunk:
+            events = parser.feed(chunk)
+            if reservation is not None:
+                held = parser.buffered_bytes + len(chunk)
+                if held > reservation.nbytes:
+                    reservation.resize(held)
+            yield from events
+    yield from parser.flush()
+
+
+def iter_sse_events(
+    response: Any,
+    chunk_size: int = 8192,
+    reservation: Optional["MemoryReservation"] = None
+) -> Iterator[SSEEvent]:
+    """
+    Parse a streaming requests.Response (opened with stream=True) into SSE events.
+    """
+    return parse_sse_chunks(response.iter_content(chunk_size=chunk_size), reservation)
@@ -1,12 +1,28 @@
 from collections.abc import Generator
-from typing import Any
+from typing import Any, Optional
 import json
-import uuid
-import base64
-import requests
-from sseclient import SSEClient
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin import Tool
+from tools.oauth import OAUTH2_CLIENT_CREDENTIALS, OAuthError, client_credentials_header, current_headers, scope_credential
+from tools.file_parts import FILE_TRANSFER_MODES, InlineFile, build_file_parts
+from tools.memory_budget import MemoryBudgetExceededError, get_accountant
+from tools.rate_limit import AgentLimiter, AgentRateLimitedError, get_limiter, send_with_limits
+from tools.agent_cards import get_cached_card, supports_non_blocking_send, supports_push_notifications
+from tools.push_notifications import get_push_receiver
+from tools.task_durations import duration_estimator
+from tools.task_reaper import get_reaper
+from tools.job_queue import DISPATCH_MODES, PRIORITIES, QueueFullError, get_scheduler, workers_for
+from tools.sse import iter_sse_events
+from tools.transports import AgentEndpoint, read_event, read_result, select_endpoint, send_request
+from tools.profiling import profiled
+
+# JSON-RPC errors meaning "this agent can't do non-blocking send" rather than "this task failed":
+# method not found, invalid params, unsupported operation
+NON_BLOCKING_FALLBACK_ERROR_CODES = (-32601, -32602, -32004)
+
+
+def _configuration(push_config: Optional[dict[str, Any]]) -> dict[str, Any]:
+    return {"pushNotificationConfig": push_config} if push_config else {}
 
 class SubmitTaskTool(Tool):
     def _build_agents_registry(self) -> dict[str, dict[str, Any]]:
@@ -25,17 +41,30 @@ class SubmitTaskTool(Tool):
             auth_type = self.runtime.credentials.get(f"agent_{i}_auth_type", "none")
             api_key = self.runtime.credentials.get(f"agent_{i}_api_key", "").strip()
             description = self.runtime.credentials.get(f"agent_{i}_description", "").strip()
+            max_concurrency = self.runtime.credentials.get(f"agent_{i}_max_concurrency", "")
+            rate_limit = self.runtime.credentials.get(f"agent_{i}_rate_limit", "")
+            token_url = self.runtime.credentials.get(f"agent_{i}_token_url", "").strip()
+            oauth_scope = self.runtime.credentials.get(f"agent_{i}_oauth_scope", "").strip()
 
             registry[agent_name] = {
                 "base_url": agent_url,
                 "auth_type": auth_type,
                 "api_key": api_key,
-                "description": description
+                "description": description,
+                "max_concurrency": max_concurrency,
+                "rate_limit": rate_limit,
+                "token_url": token_url,
+                "oauth_scope": oauth_scope
             }
 
         return registry
 
-    def _build_auth_header(self, auth_type: str, api_key: str) -> dict[str, str]:
+    def _build_auth_header(
+        self,
+        auth_type: str,
+        api_key: str,
+        agent_config: Optional[dict[str, Any]] = None
+    ) -> dict[str, str]:
         """
         Build the appropriate Authorization header based on auth type.
         """
@@ -48,17 +77,203 @@ class SubmitTaskTool(Tool):
             return {"Authorization": f"Bearer {api_key}"}
         elif auth_type == "basic":
             # For basic auth, api_key should be in format "username:password"
+            import base64
             encoded = base64.b64encode(api_key.encode()).decode()
             return {"Authorization": f"Basic {encoded}"}
+        elif auth_type == OAUTH2_CLIENT_CREDENTIALS:
+            # api_key is "client_id:client_secret"; access tokens come from the shared token cache
+            config = agent_config or {}
+            return client_credentials_header(
+                config.get("base_url", ""), api_key, config.get("token_url", ""), config.get("oauth_scope", "")
+            )
         else:
             # Default to Bearer if unknown type
             return {"Authorization": f"Bearer {api_key}"}
 
+    def _extract_task_id(self, result: Any) -> Optional[str]:
+        """
+        Extract the taskId from a JSON-RPC result (Task, Message or update event).
+        """
+        if not isinstance(result, dict):
+            return None
+
+        # TaskId might be directly in result or nested
+        task_id = result.get("taskId") or result.get("task_id")
+        if not task_id and result.get("kind") == "task":
+            task_id = result.get("id")
+        return task_id
+
+    def _submit_via_send(
+        self,
+        endpoint: AgentEndpoint,
+        message: dict[str, Any],
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        inline_files: Optional[list[InlineFile]] = None,
+        blocking: bool = False,
+        push_config: Optional[dict[str, Any]] = None
+    ) -> tuple[Optional[str], Optional[str]]:
+        """
+        Submit via message/send, with configuration.blocking=false unless blocking is set.
+        Returns (task_id, None) on success, (None, error_text) on a definitive failure,
+        or (None, None) when the agent rejected non-blocking send and the caller should try another way.
+        """
+        params: dict[str, Any] = {"message": message}
+        configuration = _configuration(push_config)
+        if not blocking:
+            configuration["blocking"] = False
+        if configuration:
+            params["configuration"] = configuration
+
+        with get_accountant().reserve_response(endpoint.url) as reservation:
+            response = send_with_limits(limiter, lambda: send_request(
+                endpoint, "message/send", params, headers, 60 if blocking else 30, inline_files
+            ))
+            reservation.charge_response(response)
+
+            try:
+                result, error = read_result(endpoint, response)
+            except json.JSONDecodeError:
+                return None, f"Invalid JSON Response: {response.text}"
+
+        if error is not None:
+            if not blocking and isinstance(error, dict) and error.get("code") in NON_BLOCKING_FALLBACK_ERROR_CODES:
+                return None, None
+            return None, f"A2A Error: {json.dumps(error)}"
+
+        task_id = self._extract_task_id(result)
+        if not task_id:
+            return None, "Error: No taskId received from agent"
+        return task_id, None
+
+    def _submit(
+        self,
+        agent_base_url: str,
+        message: dict[str, Any],
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        inline_files: list[InlineFile]
+    ) -> tuple[Optional[str], Optional[str]]:
+        """
+        Submit the message to the agent and return (task_id, None) or (None, error_text).
+        Uses non-blocking message/send when the cached Agent Card allows it (one round trip),
+        otherwise falls back to message/stream over SSE and stops at the first taskId.
+        Agents whose card disables streaming are never streamed to; if they also reject
+        non-blocking send, a blocking message/send is used instead.
+        When the push receiver is enabled and the agent supports push notifications,
+        every submission carries a pushNotificationConfig so get_task_status need not poll.
+        """
+        import requests
+
+        # Transport and streaming support negotiated from the cached Agent Card
+        card = get_cached_card(agent_base_url)
+        endpoint = select_endpoint(agent_base_url, card)
+
+        # Completion is pushed to the embedded receiver instead of being polled for
+        receiver = get_push_receiver() if supports_push_notifications(card) else None
+        push_config = receiver.register(agent_base_url, scope_credential(headers)) if receiver else None
+        task_id = None
+
+        try:
+            if supports_non_blocking_send(card) or not endpoint.streaming:
+                task_id, error = self._submit_via_send(
+                    endpoint, message, headers, limiter, inline_files, push_config=push_config
+                )
+                if task_id or error:
+                    return task_id, error
+                # Agent does not support non-blocking send - fall through to streaming
+
+            if not endpoint.streaming:
+                # capabilities.streaming is false: a stream would only hang until the timeout
+                task_id, error = self._submit_via_send(
+                    endpoint, message, headers, limiter, inline_files, blocking=True, push_config=push_config
+                )
+                return task_id, error
+
+            # The stream's parse buffer counts against the plugin's memory budget
+            with get_accountant().reserve_response(agent_base_url) as reservation:
+                params = {"message": message}
+                if push_config:
+                    params["configuration"] = _configuration(push_config)
+                # The stream holds its concurrency slot until it is closed
+                response = send_with_limits(limiter, lambda: send_request(
+                    endpoint, "message/stream", params, headers, 60, inline_files, stream=True
+                ), hold_until_close=True)
+
+                try:
+                    response.raise_for_status()
+
+                    # Parse SSE stream and extract taskId from first event
+                    for event in iter_sse_events(response, reservation=reservation):
+                        try:
+                            # Parse the SSE event data (a JSON-RPC response, or the bare object over HTTP+JSON)
+                            result, error = read_event(endpoint, json.loads(event.data))
+
+                            # Check for A2A error
+                            if error is not None:
+                                return None, f"A2A Error: {json.dumps(error)}"
+
+                            task_id = self._extract_task_id(result)
+
+                            if task_id:
+                                # Got the taskId - return immediately and drop the rest of the stream
+                                return task_id, None
+
+                        except json.JSONDecodeError:
+                            # Skip malformed events
+                            continue
+                finally:
+                    response.close()
+
+            # If we get here, no taskId was found in any event
+            return None, "Error: No taskId received from agent"
+
+        except AgentRateLimitedError as e:
+            return None, f"Rate Limited: {str(e)}"
+        except MemoryBudgetExceededError as e:
+            return None, f"Memory Budget Exceeded: {str(e)}"
+        except requests.exceptions.RequestException as e:
+            return None, f"Network Error: {str(e)}"
+        except Exception as e:
+            return None, f"Error: {str(e)}"
+        finally:
+            if push_config:
+                if task_id:
+                    receiver.bind(push_config["token"], task_id)
+                else:
+                    receiver.unregister(push_config["token"])
+            # Timed from here until a poll or push shows it finished, for get_task_status's poll hints
+            if task_id:
+                duration_estimator.started(agent_base_url, scope_credential(headers), task_id)
+            # Cancel the task later if nobody ever polls it (e.g. the Dify run was aborted)
+            reaper = get_reaper()
+            if reaper and task_id:
+                reaper.track(agent_base_url, endpoint, headers, limiter, task_id)
+
+    def _submit_queued(
+        self,
+        agent_base_url: str,
+        message: dict[str, Any],
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        inline_files: list[InlineFile]
+    ) -> tuple[Optional[str], Optional[str]]:
+        """
+        Submit a job taken off the queue; an OAuth2 token may have expired while it waited.
+        """
+        try:
+            headers = current_headers(headers)
+        except OAuthError as e:
+            return None, f"Auth Error: {str(e)}"
+        return self._submit(agent_base_url, message, headers, limiter, inline_files)
+
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
-        Invoke the Submit Task tool (Asynchronous message/stream).
-        Implements A2A Protocol JSON-RPC 2.0 with SSE streaming.
-        Extracts taskId from first event and returns immediately for true async behavior.
+        Invoke the Submit Task tool.
+        Returns the agent's taskId as soon as the task exists, without waiting for completion.
+        With dispatch "queued", returns a local job handle right away instead; the job
+        scheduler submits it when the agent has capacity, in priority and deadline order.
         """
         agents_registry = self._build_agents_registry()
         if not agents_registry:
@@ -81,75 +296,83 @@ class SubmitTaskTool(Tool):
 
         instruction = tool_parameters.get("instruction")
 
-        # Construct JSON-RPC 2.0 Request with proper A2A Message object format
-        rpc_request = {
-            "jsonrpc": "2.0",
-            "method": "message/stream",
-            "params": {
-                "message": {
-                    "kind": "message",
-                    "role": "user",
-                    "messageId": str(uuid.uuid4()),
-                    "parts": [
-                        {
-                            "kind": "text",
-                            "text": instruction
-                        }
-                    ]
-                }
-            },
-            "id": str(uuid.uuid4())
-        }
-
-        # Build headers with appropriate authentication
-        headers = {"Content-Type": "application/json"}
-        headers.update(self._build_auth_header(auth_type, api_key))
+        # Dify files become FileParts, sent by URI or streamed inline as base64
+        file_transfer = tool_parameters.get("file_transfer") or "auto"
+        if file_transfer not in FILE_TRANSFER_MODES:
+            yield self.create_text_message(
+                f"Invalid file_transfer '{file_transfer}'. Use one of: {', '.join(FILE_TRANSFER_MODES)}."
+            )
+            return
+        try:
+            file_parts, inline_files = build_file_parts(tool_parameters.get("files"), file_transfer)
+        except ValueError as e:
+            yield self.create_text_message(f"Error: {str(e)}")
+            return
 
+        dispatch = tool_parameters.get("dispatch") or "immediate"
+        if dispatch not in DISPATCH_MODES:
+            yield self.create_text_message(f"Invalid dispatch '{dispatch}'. Use one of: {', '.join(DISPATCH_MODES)}.")
+            return
+        priority = tool_parameters.get("priority") or "normal"
+        if priority not in PRIORITIES:
+            yield self.create_text_message(f"Invalid priority '{priority}'. Use one of: {', '.join(PRIORITIES)}.")
+            return
+        deadline_seconds = tool_parameters.get("deadline_seconds")
         try:
-            response = requests.post(
-                agent_base_url,
-                json=rpc_request,
-                headers=headers,
-                timeout=60,
-                stream=True
+            deadline_seconds = float(deadline_seconds) if deadline_seconds not in (None, "") else None
+        except (TypeError, ValueError):
+            deadline_seconds = -1
+        if deadline_seconds is not None and not deadline_seconds > 0:
+            yield self.create_text_message(
+                f"Invalid deadline_seconds '{tool_parameters.get('deadline_seconds')}'. Use a positive number of seconds."
             )
-            response.raise_for_status()
-
-            # Parse SSE stream and extract taskId from first event
-            client = SSEClient(response)
-
-            for event in client.events():
-                try:
-                    # Parse the SSE event data (JSON-RPC response)
-                    event_data = json.loads(event.data)
-
-                    # Check for JSON-RPC error
-                    if "error" in event_data:
-                        yield self.create_text_message(f"A2A Error: {json.dumps(event_data['error'])}")
-                        response.close()
-                        return
+            return
 
-                    # Extract taskId from result
-                    result = event_data.get("result", {})
+        import uuid
 
-                    # TaskId might be directly in result or nested
-                    task_id = result.get("taskId") or result.get("task_id")
+        # Proper A2A Message object format
+        message = {
+            "kind": "message",
+            "role": "user",
+            "messageId": str(uuid.uuid4()),
+            "parts": [
+                {
+                    "kind": "text",
+                    "text": instruction
+                }
+            ] + file_parts
+        }
 
-                    if task_id:
-                        # Got the taskId - return immediately and drop the rest of the stream
-                        yield self.create_text_message(task_id)
-                        response.close()
-                        return
+        # Build headers with appropriate authentication
+        headers = {"Content-Type": "application/json"}
+        try:
+            headers.update(self._build_auth_header(auth_type, api_key, agent_config))
+        except OAuthError as e:
+            yield self.create_text_message(f"Auth Error: {str(e)}")
+            return
 
-                except json.JSONDecodeError:
-                    # Skip malformed events
-                    continue
+        # Per-agent concurrency and rate limits (honors 429/503 Retry-After)
+        limiter = get_limiter(
+            agent_base_url,
+            agent_config.get("max_concurrency"),
+            agent_config.get("rate_limit")
+        )
 
-            # If we get here, no taskId was found in any event
-            response.close()
-            yield self.create_text_message("Error: No taskId received from agent")
+        if dispatch == "queued":
+            try:
+                job = get_scheduler().enqueue(
+                    agent_base_url,
+                    scope_credential(headers),
+                    lambda: self._submit_queued(agent_base_url, message, headers, limiter, inline_files),
+                    priority=priority,
+                    deadline_seconds=deadline_seconds,
+                    workers=workers_for(agent_config.get("max_concurrency"))
+                )
+            except QueueFullError as e:
+                yield self.create_text_message(f"Queue Full: {str(e)}")
+                return
+            yield self.create_text_message(job.id)
+            return
 
-        except requests.exceptions.RequestException as e:
-            yield self.create_text_message(f"Network Error: {str(e)}")
-        except Exception as e:
-            yield self.create_text_message(f"Error: {str(e)}")
+        task_id, error = self._submit(agent_base_url, message, headers, limiter, inline_files)
+        yield self.create_text_message(task_id or error)
@@ -0,0 +1,353 @@
+from typing import TYPE_CHECKING, Any, Optional
+import json
+import logging
+import queue
+import threading
+import time
+from tools.oauth import current_headers, scope_credential
+from tools.memory_budget import get_accountant
+from tools.persistent_store import scoped_key
+from tools.push_notifications import merge_task_update
+from tools.rate_limit import AgentLimiter, send_with_limits
+from tools.sse import iter_sse_events
+from tools.task_reaper import get_reaper
+from tools.task_views import TERMINAL_STATES, task_state
+from tools.transports import AgentEndpoint, read_event, send_request
+
+if TYPE_CHECKING:
+    import requests
+
+# Updates buffered per waiter; a waiter that falls behind loses its oldest ones.
+# Every update is the whole merged task, so the newest one is all a waiter needs.
+WAITER_QUEUE_SIZE = 16
+
+# Longest get_task_status may wait for a task to change
+MAX_WAIT_SECONDS = 120
+
+# Read timeout of the upstream stream; a stream silent for this long is reopened
+STREAM_TIMEOUT = 60
+
+# Times a dropped stream is reopened without receiving an event in between
+MAX_RECONNECTS = 3
+RECONNECT_DELAY_SECONDS = 1
+
+# JSON-RPC code for methods the agent does not implement, and for UnsupportedOperationError
+_UNSUPPORTED_ERROR_CODES = (-32601, -32004)
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last update of a subscription that has ended
+_END = object()
+
+
+class Waiter:
+    """
+    One local consumer of a shared task subscription. Use it as a context
+    manager; leaving the last waiter closes the upstream stream.
+    """
+
+    def __init__(self, subscription: "_Subscription"):
+        self._subscription = subscription
+        self._queue: "queue.Queue[Any]" = queue.Queue(WAITER_QUEUE_SIZE)
+        self.ended = False
+        self.dropped = 0
+
+    def _offer(self, item: Any) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[dict[str, Any]]:
+        """
+        Next task state, or None on timeout or once the subscription has ended.
+        """
+        if self.ended:
+            return None
+        try:
+            item = self._queue.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            return None
+        if item is _END:
+            self.ended = True
+            return None
+        return item
+
+    def close(self) -> None:
+        self._subscription.leave(self)
+
+    def __enter__(self) -> "Waiter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class _Subscription:
+    """
+    One upstream tasks/resubscribe stream and the waiters it fans out to.
+    """
+
+    def __init__(
+        self,
+        manager: "SubscriptionManager",
+        key: str,
+        endpoint: AgentEndpoint,
+        base_url: str,
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        task_id: str
+    ):
+        self.manager = manager
+        self.key = key
+        self.endpoint = endpoint
+        self.base_url = base_url
+        self.headers = headers
+        self.limiter = limiter
+        self.task_id = task_id
+        self.latest: Optional[dict[str, Any]] = None
+        self.waiters: set[Waiter] = set()
+        self.events = 0
+        self.connects = 0
+        self.closed = False
+        self._response: Optional["requests.Response"] = None
+        self._wake = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="a2a-subscription", daemon=True).start()
+
+    def leave(self, waiter: Waiter) -> None:
+        with self.manager._lock:
+            self.waiters.discard(waiter)
+            if self.waiters or self.closed:
+                return
+            response = self._close_locked()
+        if response is not None:
+            _abort(response)
+
+    def _close_locked(self) -> Optional["requests.Response"]:
+        """
+        Stop the subscription; returns the open upstream response, to be aborted once the lock is released.
+        """
+        self.closed = True
+        if self.manager._subscriptions.get(self.key) is self:
+            del self.manager._subscriptions[self.key]
+        self._wake.set()
+        return self._response
+
+    def _publish(self, update: dict[str, Any]) -> bool:
+        """
+        Merge one streamed event into the task and hand it to every waiter; True once terminal.
+        """
+        with self.manager._lock:
+            self.latest = merge_task_update(self.latest, update)
+            self.events += 1
+            for waiter in self.waiters:
+                waiter._offer(self.latest)
+            return task_state(self.latest) in TERMINAL_STATES
+
+    def _finish(self) -> None:
+        with self.manager._lock:
+            for waiter in self.waiters:
+                waiter._offer(_END)
+            if not self.closed:
+                self._close_locked()  # Called by the reader, after its response was closed
+
+    def _stream(self) -> Optional[str]:
+        """
+        Read one upstream connection until it ends. Returns None when the subscription
+        is over (terminal task, closed, or unsupported), else why it should be reopened.
+        """
+        with get_accountant().reserve_response(self.base_url) as reservation:
+            response = send_with_limits(self.limiter, lambda: send_request(
+                self.endpoint, "tasks/resubscribe", {"id": self.task_id},
+                current_headers(self.headers), STREAM_TIMEOUT, stream=True
+            ), hold_until_close=True)
+            with self.manager._lock:
+                if self.closed:
+                    response.close()
+                    return None
+                self._response = response
+                self.connects += 1
+            try:
+                if response.status_code in (404, 405, 501):
+                    self.manager._mark_unsupported(self.base_url)
+                    return None
+                response.raise_for_status()
+
+                for event in iter_sse_events(response, reservation=reservation):
+                    if self.closed:
+                        return None
+                    try:
+                        result, error = read_event(self.endpoint, json.loads(event.data))
+                    except json.JSONDecodeError:
+                        continue
+                    if error is not None:
+                        if isinstance(error, dict) and error.get("code") in _UNSUPPORTED_ERROR_CODES:
+                            self.manager._mark_unsupported(self.base_url)
+                        else:
+                            logger.warning("Subscription to task %s ended: %s", self.task_id, json.dumps(error))
+                        return None
+                    if not isinstance(result, dict) or not result:
+                        continue
+                    if self._publish(result):
+                        # Seen finished, so the reaper has nothing left to cancel
+                        reaper = get_reaper()
+                        if reaper:
+                            reaper.finished(self.key)
+                        return None
+                return "stream ended before the task finished"
+            finally:
+                with self.manager._lock:
+                    self._response = None
+                response.close()
+
+    def _run(self) -> None:
+        reconnects = 0
+        try:
+            while not self.closed:
+                events = self.events
+                try:
+                    reason = self._stream()
+                except Exception as e:
+                    reason = str(e)
+                if reason is None or self.closed:
+                    return
+                reconnects = 0 if self.events > events else reconnects + 1
+                if reconnects > MAX_RECONNECTS:
+                    logger.warning("Gave up on subscription to task %s: %s", self.task_id, reason)
+                    return
+                self._wake.wait(RECONNECT_DELAY_SECONDS)
+        finally:
+            self._finish()
+
+
+def _abort(response: "requests.Response") -> None:
+    """
+    Close a stream another thread may be blocked reading. Shutting the socket
+    down wakes that reader now instead of at its next read timeout.
+    """
+    import socket
+
+    connection = getattr(getattr(response, "raw", None), "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+class SubscriptionManager:
+    """
+    Shares one upstream tasks/resubscribe stream per (agent, credential, task)
+    among any number of local waiters. Each waiter gets the latest task state
+    on joining, then every update through its own bounded queue. The stream is
+    opened by the first waiter, reopened if it drops before the task finishes,
+    and closed when the last waiter leaves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, _Subscription] = {}
+        # Agents that rejected tasks/resubscribe; they are polled instead
+        self._unsupported: set[str] = set()
+
+    def _mark_unsupported(self, base_url: str) -> None:
+        with self._lock:
+            self._unsupported.add(base_url.rstrip("/"))
+
+    def supported(self, base_url: str) -> bool:
+        with self._lock:
+            return base_url.rstrip("/") not in self._unsupported
+
+    def join(
+        self,
+        endpoint: AgentEndpoint,
+        base_url: str,
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        task_id: str,
+        task: Optional[dict[str, Any]] = None
+    ) -> Waiter:
+        """
+        Attach a waiter to the task's subscription, opening the stream if there is none.
+        task seeds the state replayed to waiters until the stream sends a full Task.
+        """
+        key = scoped_key(base_url, scope_credential(headers), task_id)
+        with self._lock:
+            subscription = self._subscriptions.get(key)
+            created = subscription is None
+            if created:
+                subscription = self._subscriptions[key] = _Subscription(
+                    self, key, endpoint, base_url, headers, limiter, task_id
+                )
+            if subscription.latest is None and isinstance(task, dict):
+                subscription.latest = task
+            waiter = Waiter(subscription)
+            subscription.waiters.add(waiter)
+            if subscription.latest is not None:
+                waiter._offer(subscription.latest)
+        if created:
+            subscription.start()
+        return waiter
+
+    def latest(self, base_url: str, credential: str, task_id: str) -> Optional[dict[str, Any]]:
+        """
+        The state of a task some waiter is subscribed to, or None when there is no live stream.
+        """
+        with self._lock:
+            subscription = self._subscriptions.get(scoped_key(base_url, credential, task_id))
+            return subscription.latest if subscription and subscription.connects else None
+
+    def wait(
+        self,
+        endpoint: AgentEndpoint,
+        base_url: str,
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        task_id: str,
+        task: dict[str, Any],
+        timeout: float
+    ) -> dict[str, Any]:
+        """
+        Wait up to timeout seconds for the task to leave the state it is in. Returns the
+        latest state seen, which is task itself if nothing changed or no stream could be opened.
+        """
+        state = task_state(task)
+        deadline = time.monotonic() + timeout
+        latest = task
+        with self.join(endpoint, base_url, headers, limiter, task_id, task) as waiter:
+            while True:
+                update = waiter.get(deadline - time.monotonic())
+                if update is None:
+                    return latest
+                latest = update
+                if task_state(latest) != state:
+                    return latest
+
+    def active(self) -> int:
+        """
+        Number of open upstream subscriptions.
+        """
+        with self._lock:
+            return len(self._subscriptions)
+
+    def clear(self) -> None:
+        with self._lock:
+            responses = [s._close_locked() for s in list(self._subscriptions.values())]
+            self._unsupported.clear()
+        for response in responses:
+            if response is not None:
+                _abort(response)
+
+
+# Shared by every GetTaskStatusTool in this process
+subscription_manager = SubscriptionManager()
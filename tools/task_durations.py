@@ -0,0 +1,180 @@
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from typing import Any, Optional
+import threading
+import time
+from tools.persistent_store import scoped_key
+from tools.task_views import TERMINAL_STATES
+
+# Upper bounds of the duration buckets in seconds: 1s, growing by half each step, to about a day
+BUCKET_BOUNDS = tuple(1.5 ** i for i in range(29))
+
+# Finished tasks per agent the histogram is built from; older ones roll out
+DURATION_SAMPLES = 200
+
+# Below this many samples the hint backs off with the task's age instead
+MIN_SAMPLES = 5
+
+# Bounds of the recommended delay before the next get_task_status call
+MIN_POLL_SECONDS = 1
+MAX_POLL_SECONDS = 300
+
+# Never recommend polling sooner than this fraction of the task's age
+MIN_POLL_FRACTION = 0.05
+
+# Submitted tasks remembered until they are seen finishing
+MAX_STARTED_TASKS = 10000
+
+
+class DurationHistogram:
+    """
+    Rolling histogram of the last max_samples task durations, in logarithmic buckets.
+    """
+
+    def __init__(self, max_samples: int = DURATION_SAMPLES):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self._samples: deque[int] = deque(maxlen=max_samples)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        if len(self._samples) == self._samples.maxlen:
+            self.counts[self._samples[0]] -= 1
+        index = bisect_left(BUCKET_BOUNDS, seconds)
+        self._samples.append(index)
+        self.counts[index] += 1
+
+    def quantile_after(self, elapsed: float, q: float) -> Optional[float]:
+        """
+        Duration by which a fraction q of the tasks that ran at least `elapsed`
+        seconds had finished, interpolated within its bucket. None when no task
+        ran that long, or the answer lies beyond the last bucket.
+        """
+        first = bisect_left(BUCKET_BOUNDS, elapsed)
+        total = sum(self.counts[first:])
+        if not total:
+            return None
+        target = q * total
+        seen = 0
+        for index in range(first, len(self.counts)):
+            count = self.counts[index]
+            if not count or seen + count < target:
+                seen += count
+                continue
+            if index == len(BUCKET_BOUNDS):
+                return None
+            lower = max(elapsed, BUCKET_BOUNDS[index - 1] if index else 0.0)
+            upper = BUCKET_BOUNDS[index]
+            return lower + (upper - lower) * (target - seen) / count
+        return None
+
+
+def _clamp_poll(seconds: float, elapsed: float) -> int:
+    floor = max(MIN_POLL_SECONDS, elapsed * MIN_POLL_FRACTION)
+    return int(round(min(MAX_POLL_SECONDS, max(floor, seconds))))
+
+
+class DurationEstimator:
+    """
+    Learns how long each agent's tasks take, from submit_task to a terminal
+    state, and turns that into poll hints: the median remaining time of tasks
+    that have already run as long as this one, and when to check again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[str, DurationHistogram] = {}
+        # scoped (agent, credential, task) key -> (agent key, start time, measured from submission)
+        self._started: "OrderedDict[str, tuple[str, float, bool]]" = OrderedDict()
+
+    def _remember_locked(self, key: str, agent_key: str, started_at: float, measured: bool) -> None:
+        self._started[key] = (agent_key, started_at, measured)
+        while len(self._started) > MAX_STARTED_TASKS:
+            self._started.popitem(last=False)
+
+    def started(self, base_url: str, credential: str, task_id: str) -> None:
+        """
+        Record that submit_task created a task now.
+        """
+        with self._lock:
+            self._remember_locked(
+                scoped_key(base_url, credential, task_id), base_url.rstrip("/"), time.monotonic(), True
+            )
+
+    def finished(self, key: str) -> Optional[float]:
+        """
+        Record that the task under this scoped key reached a terminal state.
+        Returns its duration when submit_task saw it start, else None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._started.pop(key, None)
+            if entry is None or not entry[2]:
+                return None
+            agent_key, started_at, _ = entry
+            duration = now - started_at
+            histogram = self._histograms.get(agent_key)
+            if histogram is None:
+                histogram = self._histograms[agent_key] = DurationHistogram()
+            histogram.add(duration)
+            return duration
+
+    def observe(self, base_url: str, credential: str, task_id: str, state: Optional[str]) -> Optional[dict[str, Any]]:
+        """
+        Account for a status poll. Returns the poll hint for a running task,
+        or None once it is terminal. Tasks submitted before a restart are timed
+        from their first poll and not used as samples.
+        """
+        key = scoped_key(base_url, credential, task_id)
+        if state in TERMINAL_STATES:
+            self.finished(key)
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._started.get(key)
+            if entry is None:
+                entry = (base_url.rstrip("/"), now, False)
+                self._remember_locked(key, *entry)
+            else:
+                self._started.move_to_end(key)
+        return self.hint(base_url, now - entry[1])
+
+    def hint(self, base_url: str, elapsed: float) -> dict[str, Any]:
+        """
+        Estimated completion and recommended next poll for a task running `elapsed` seconds.
+        """
+        import datetime
+
+        with self._lock:
+            histogram = self._histograms.get(base_url.rstrip("/"))
+            samples = len(histogram) if histogram else 0
+            median = histogram.quantile_after(elapsed, 0.5) if samples >= MIN_SAMPLES else None
+
+        hint: dict[str, Any] = {"elapsedSeconds": int(elapsed), "basedOnSamples": samples}
+        if median is None:
+            # Nothing known about tasks this old: back off with the task's age
+            hint["nextPollSeconds"] = _clamp_poll(elapsed / 2, elapsed)
+            return hint
+
+        remaining = max(0.0, median - elapsed)
+        completion = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=remaining)
+        hint["estimatedRemainingSeconds"] = int(round(remaining))
+        hint["estimatedCompletionAt"] = completion.isoformat(timespec="seconds")
+        hint["nextPollSeconds"] = _clamp_poll(remaining, elapsed)
+        return hint
+
+    def samples(self, base_url: str) -> int:
+        with self._lock:
+            histogram = self._histograms.get(base_url.rstrip("/"))
+            return len(histogram) if histogram else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._started.clear()
+
+
+# Shared by SubmitTaskTool, GetTaskStatusTool and the push receiver in this process
+duration_estimator = DurationEstimator()
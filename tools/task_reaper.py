@@ -0,0 +1,244 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import logging
+import os
+import threading
+import time
+from tools.oauth import current_headers, scope_credential
+from tools.memory_budget import get_accountant
+from tools.persistent_store import TASK_RESULT_NAMESPACE, get_store, scoped_key
+from tools.rate_limit import AgentLimiter, send_with_limits
+from tools.task_views import TERMINAL_STATES, task_state
+from tools.transports import AgentEndpoint, read_result, send_request
+
+# Set to a number of seconds to cancel submitted tasks nobody has polled for that long
+REAPER_IDLE_ENV = "A2A_REAPER_IDLE_SECONDS"
+
+# Timeout for a single tasks/cancel call, and for the tasks/get sent before it
+CANCEL_TIMEOUT = 30
+
+# Longest the reaper sleeps between sweeps
+MAX_SWEEP_INTERVAL_SECONDS = 60
+
+# Submitted tasks remembered by the reaper; the oldest are forgotten beyond this
+MAX_REAPER_TASKS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def cancel_task(
+    endpoint: AgentEndpoint,
+    task_id: str,
+    headers: dict[str, str],
+    limiter: AgentLimiter
+) -> tuple[Any, Optional[Any]]:
+    """
+    Send tasks/cancel for one task and return (task, error) like read_result.
+    Raises the same transport, rate-limit and memory-budget errors as the other calls.
+    """
+    with get_accountant().reserve_response(endpoint.url) as reservation:
+        response = send_with_limits(limiter, lambda: send_request(
+            endpoint, "tasks/cancel", {"id": task_id}, headers, CANCEL_TIMEOUT
+        ))
+        reservation.charge_response(response)
+        return read_result(endpoint, response)
+
+
+def _fetch_state(
+    endpoint: AgentEndpoint,
+    task_id: str,
+    headers: dict[str, str],
+    limiter: AgentLimiter
+) -> Optional[str]:
+    """
+    The task's current state from tasks/get (without history), or None if it cannot be read.
+    """
+    try:
+        with get_accountant().reserve_response(endpoint.url) as reservation:
+            response = send_with_limits(limiter, lambda: send_request(
+                endpoint, "tasks/get", {"id": task_id, "historyLength": 0}, headers, CANCEL_TIMEOUT
+            ))
+            reservation.charge_response(response)
+            result, error = read_result(endpoint, response)
+    except Exception:
+        return None
+    return task_state(result) if error is None else None
+
+
+class TaskReaper:
+    """
+    Tracks tasks submitted through submit_task and cancels those not polled
+    with get_task_status within idle_seconds, e.g. because the Dify run that
+    launched them was aborted. Sweeps run on a daemon thread started on first use.
+    """
+
+    def __init__(self, idle_seconds: float):
+        self.idle_seconds = idle_seconds
+        self.reaped = 0
+        self._lock = threading.Lock()
+        # scoped (agent, credential, task) key -> tracked task
+        self._tasks: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+
+    def _key(self, base_url: str, credential: str, task_id: str) -> str:
+        return scoped_key(base_url, credential, task_id)
+
+    def track(
+        self,
+        base_url: str,
+        endpoint: AgentEndpoint,
+        headers: dict[str, str],
+        limiter: AgentLimiter,
+        task_id: str
+    ) -> None:
+        key = self._key(base_url, scope_credential(headers), task_id)
+        with self._lock:
+            self._tasks.pop(key, None)
+            self._tasks[key] = {
+                "base_url": base_url,
+                "endpoint": endpoint,
+                "headers": dict(headers),
+                "limiter": limiter,
+                "task_id": task_id,
+                "last_seen": time.monotonic()
+            }
+            while len(self._tasks) > MAX_REAPER_TASKS:
+                self._tasks.popitem(last=False)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="a2a-task-reaper", daemon=True)
+                self._thread.start()
+
+    def touch(
+        self,
+        base_url: str,
+        credential: str,
+        task_id: str,
+        state: Optional[str] = None,
+        next_poll: Optional[float] = None
+    ) -> None:
+        """
+        Record a poll; tasks that reached a terminal state are no longer tracked.
+        next_poll is the delay get_task_status told the caller to wait; the task
+        is not considered idle before it has passed.
+        """
+        key = self._key(base_url, credential, task_id)
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is None:
+                return
+            if state in TERMINAL_STATES:
+                del self._tasks[key]
+            else:
+                entry["last_seen"] = time.monotonic()
+                entry["next_poll"] = next_poll or 0
+
+    def forget(self, base_url: str, credential: str, task_id: str) -> None:
+        self.finished(self._key(base_url, credential, task_id))
+
+    def finished(self, key: str) -> None:
+        """
+        Stop tracking a task by its scoped key, e.g. once a push or stream showed it terminal.
+        """
+        with self._lock:
+            self._tasks.pop(key, None)
+
+    @staticmethod
+    def _last_known_state(entry: dict[str, Any], credential: str) -> Optional[str]:
+        """
+        A terminal state already known locally: pushed, streamed, or stored on disk by get_task_status.
+        """
+        from tools.push_notifications import get_push_receiver
+        from tools.subscriptions import subscription_manager
+
+        base_url, task_id = entry["base_url"], entry["task_id"]
+        receiver = get_push_receiver()
+        known = [
+            receiver.get_task(base_url, credential, task_id) if receiver else None,
+            subscription_manager.latest(base_url, credential, task_id)
+        ]
+        store = get_store()
+        if store:
+            # get_task_status stores results per historyLength; these are the ones it uses by default
+            known += [store.get(TASK_RESULT_NAMESPACE, scoped_key(base_url, credential, task_id, history))
+                      for history in ("all", 0)]
+        for task in known:
+            if task_state(task) in TERMINAL_STATES:
+                return task_state(task)
+        return None
+
+    def tracked(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+    def reap(self) -> list[str]:
+        """
+        Cancel every tracked task idle for longer than idle_seconds. Tasks already
+        known to be terminal, locally or from a tasks/get, are dropped without a cancel.
+        Returns the ids of the tasks the agents confirmed as canceled.
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                key for key, entry in self._tasks.items()
+                if entry["last_seen"] + max(self.idle_seconds, entry.get("next_poll", 0)) < now
+            ]
+            entries = [self._tasks.pop(key) for key in idle]
+
+        canceled = []
+        for entry in entries:
+            if self._last_known_state(entry, scope_credential(entry["headers"])):
+                # Finished on its own; nothing left to free
+                continue
+            try:
+                # An OAuth2 token saved at submission may have expired by now
+                headers = current_headers(entry["headers"])
+                if _fetch_state(entry["endpoint"], entry["task_id"], headers, entry["limiter"]) in TERMINAL_STATES:
+                    # Finished without anyone polling it
+                    continue
+                result, error = cancel_task(entry["endpoint"], entry["task_id"], headers, entry["limiter"])
+            except Exception as e:
+                logger.warning("Could not cancel idle task %s: %s", entry["task_id"], e)
+                continue
+            if error is not None:
+                logger.info("Agent refused to cancel idle task %s: %s", entry["task_id"], error)
+                continue
+            canceled.append(entry["task_id"])
+            logger.info("Canceled task %s after %.0fs without a status poll", entry["task_id"], self.idle_seconds)
+
+        with self._lock:
+            self.reaped += len(canceled)
+        return canceled
+
+    def _run(self) -> None:
+        interval = min(MAX_SWEEP_INTERVAL_SECONDS, max(1.0, self.idle_seconds / 4))
+        while True:
+            time.sleep(interval)
+            try:
+                self.reap()
+            except Exception as e:
+                logger.warning("Task reaper sweep failed: %s", e)
+
+
+_reaper: Optional[TaskReaper] = None
+_reaper_lock = threading.Lock()
+
+
+def get_reaper() -> Optional[TaskReaper]:
+    """
+    Return the shared reaper, or None when A2A_REAPER_IDLE_SECONDS is unset or not positive.
+    """
+    global _reaper
+    try:
+        idle_seconds = float(os.environ.get(REAPER_IDLE_ENV, "") or 0)
+    except ValueError:
+        idle_seconds = 0
+    if idle_seconds <= 0:
+        return None
+
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = TaskReaper(idle_seconds)
+        else:
+            # A changed setting applies to tasks already tracked
+            _reaper.idle_seconds = idle_seconds
+        return _reaper
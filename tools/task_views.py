@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import json
+import threading
+from tools.memory_budget import get_accountant
+
+OUTPUT_MODES = ("full", "status-only", "final-artifacts", "delta")
+
+# States after which a task never changes again
+TERMINAL_STATES = ("completed", "failed", "canceled", "rejected")
+
+# Number of delta cursors (what one state of a task showed) remembered for delta mode
+MAX_TRACKED_TASKS = 1000
+
+# Rough per-snapshot cost (keys, dicts, sets) and per remembered id or fingerprint
+_SNAPSHOT_BYTES = 512
+_ENTRY_BYTES = 96
+
+
+def _message_text(message: Optional[dict[str, Any]]) -> str:
+    if not isinstance(message, dict):
+        return ""
+    return "\n".join(
+        part.get("text", "") for part in message.get("parts", []) or []
+        if isinstance(part, dict) and part.get("kind") == "text"
+    )
+
+
+def _compact_status(task: dict[str, Any]) -> dict[str, Any]:
+    status = task.get("status") or {}
+    compact = {"state": task_state(task)}
+    if status.get("timestamp"):
+        compact["timestamp"] = status["timestamp"]
+    text = _message_text(status.get("message"))
+    if text:
+        compact["message"] = text
+    return compact
+
+
+def task_state(task: Any) -> Optional[str]:
+    """
+    Read the state of a Task (A2A status.state, or a flat state field).
+    """
+    if not isinstance(task, dict):
+        return None
+    return (task.get("status") or {}).get("state", task.get("state"))
+
+
+def project_task(task: Any, mode: str) -> Any:
+    """
+    Reduce a Task to what the caller asked for.
+    full: unchanged; status-only: id and compact status; final-artifacts: status plus artifacts.
+    """
+    if mode == "full" or not isinstance(task, dict):
+        return task
+
+    view = {"id": task.get("id", task.get("taskId"))}
+    if task.get("contextId"):
+        view["contextId"] = task["contextId"]
+    view["status"] = _compact_status(task)
+
+    if mode == "final-artifacts":
+        view["artifacts"] = task.get("artifacts", [])
+    return view
+
+
+def _fingerprint(value: Any) -> str:
+    import hashlib
+
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class TaskDeltaTracker:
+    """
+    Remembers what a caller has been shown of a task, so repeated polls only return
+    the status change, new history messages and new or changed artifacts. Every
+    delta carries a "since" cursor naming what it showed; the caller passes it back
+    on its next poll. Cursors are scoped by agent and credential, and one cursor
+    is shared by every caller that has seen the same state of a task.
+    """
+
+    def __init__(self, max_tasks: int = MAX_TRACKED_TASKS):
+        self._max_tasks = max_tasks
+        # (scope, task id, cursor) -> what that cursor has shown
+        self._snapshots: OrderedDict[tuple[str, str, str], dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+    @staticmethod
+    def _snapshot_size(snapshot: dict[str, Any]) -> int:
+        return _SNAPSHOT_BYTES + _ENTRY_BYTES * (len(snapshot["message_ids"]) + len(snapshot["artifacts"]))
+
+    def _pop_locked(self, key: Optional[tuple[str, str, str]] = None) -> Optional[dict[str, Any]]:
+        if key is None:
+            _, snapshot = self._snapshots.popitem(last=False)
+        else:
+            snapshot = self._snapshots.pop(key, None)
+        if snapshot is not None:
+            self._bytes -= snapshot["size"]
+        return snapshot
+
+    def delta(self, scope: str, task: Any, since: Optional[str] = None) -> Any:
+        """
+        What changed in the task since the state the `since` cursor names; everything
+        when there is no cursor. An unknown or evicted cursor is answered in full with
+        "resynced": true.
+        """
+        if not isinstance(task, dict):
+            return task
+
+        task_id = str(task.get("id", task.get("taskId", "")))
+        status = _compact_status(task)
+        status_print = _fingerprint(task.get("status", status))
+        history = task.get("history", []) or []
+        artifacts = [
+            (str(a.get("artifactId", index)), a)
+            for index, a in enumerate(task.get("artifacts", []) or [])
+            if isinstance(a, dict)
+        ]
+        artifact_prints = {artifact_id: _fingerprint(a) for artifact_id, a in artifacts}
+
+        with self._lock:
+            previous = self._snapshots.get((scope, task_id, since)) if since else None
+            if previous is not None:
+                self._snapshots.move_to_end((scope, task_id, since))
+            resynced = bool(since) and previous is None
+            previous = previous or {"status": None, "message_ids": frozenset(), "artifacts": {}}
+
+            seen_ids = previous["message_ids"]
+            new_messages = [
+                m for m in history
+                if isinstance(m, dict) and m.get("messageId") not in seen_ids
+            ]
+            changed_artifacts = [
+                a for artifact_id, a in artifacts
+                if previous["artifacts"].get(artifact_id) != artifact_prints[artifact_id]
+            ]
+
+            snapshot = {
+                "status": status_print,
+                "message_ids": seen_ids | {m.get("messageId") for m in new_messages},
+                "artifacts": artifact_prints
+            }
+            cursor = _fingerprint([
+                status_print, sorted(map(str, snapshot["message_ids"])), sorted(artifact_prints.items())
+            ])[:16]
+            key = (scope, task_id, cursor)
+            if key in self._snapshots:
+                self._snapshots.move_to_end(key)
+            else:
+                snapshot["size"] = self._snapshot_size(snapshot)
+                self._snapshots[key] = snapshot
+                self._bytes += snapshot["size"]
+                while len(self._snapshots) > self._max_tasks:
+                    self._pop_locked()
+
+        view = {"id": task_id, "state": status.get("state"), "since": cursor}
+        if resynced:
+            view["resynced"] = True
+        status_changed = previous["status"] != status_print
+        if status_changed:
+            view["status"] = status
+        if new_messages:
+            view["newMessages"] = new_messages
+        if changed_artifacts:
+            view["updatedArtifacts"] = changed_artifacts
+        if not (status_changed or new_messages or changed_artifacts):
+            view["unchanged"] = True
+        return view
+
+    def forget(self, scope: str, task_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._snapshots if k[:2] == (scope, task_id)]:
+                self._pop_locked(key)
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate bytes held by the remembered snapshots.
+        """
+        return self._bytes
+
+    def evict(self, nbytes: int) -> int:
+        """
+        Forget the least recently used cursors until at least nbytes are freed.
+        Polls passing them are answered in full, marked resynced. Returns the bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            while self._snapshots and freed < nbytes:
+                freed += self._pop_locked()["size"]
+        return freed
+
+
+# Shared by every GetTaskStatusTool invocation in this process
+delta_tracker = TaskDeltaTracker()
+get_accountant().register_cache("task_deltas", delta_tracker.memory_bytes, delta_tracker.evict)
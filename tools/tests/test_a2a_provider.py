@@ -0,0 +1,173 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+import requests
+
+# Mock dify_plugin before importing the provider
+class MockToolProviderCredentialValidationError(Exception):
+    pass
+
+mock_dify_plugin = sys.modules.setdefault("dify_plugin", MagicMock())
+mock_dify_plugin.ToolProvider = object
+mock_errors_tool = MagicMock()
+mock_errors_tool.ToolProviderCredentialValidationError = MockToolProviderCredentialValidationError
+sys.modules["dify_plugin.errors"] = MagicMock()
+sys.modules["dify_plugin.errors.tool"] = mock_errors_tool
+
+# Add project root to path to import provider and tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from provider.a2a import A2AProvider
+from tools import agent_cards
+from tools.oauth import token_cache
+
+
+class TestValidateCredentials(unittest.TestCase):
+    """Test cases for provider credential validation and warm-up probing"""
+
+    def setUp(self):
+        """Setup two configured agents and an empty card cache"""
+        agent_cards.clear_card_cache()
+        self.credentials = {
+            "agent_1_name": "alive_agent",
+            "agent_1_url": "https://alive.example.com",
+            "agent_1_auth_type": "bearer",
+            "agent_1_api_key": "alive-key",
+            "agent_2_name": "dead_agent",
+            "agent_2_url": "https://dead.example.com",
+            "agent_2_auth_type": "none",
+            "agent_2_api_key": ""
+        }
+
+    @staticmethod
+    def _fake_get(url, **kwargs):
+        if "dead.example.com" in url:
+            raise requests.exceptions.ConnectionError("Name or service not known")
+        response = MagicMock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"name": "Alive", "protocolVersion": "0.3.0"}
+        return response
+
+    @patch('requests.Session.get')
+    def test_unreachable_agent_reported(self, mock_get):
+        """Test that an unreachable agent is logged by name without failing validation"""
+        mock_get.side_effect = self._fake_get
+
+        with self.assertLogs("provider.a2a", level="WARNING") as logs:
+            A2AProvider()._validate_credentials(self.credentials)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("dead_agent", logs.output[0])
+        self.assertEqual(agent_cards.get_cached_card("https://alive.example.com")["name"], "Alive")
+
+    def test_malformed_configuration_still_fails(self):
+        """Test that configuration errors are rejected without probing any agent"""
+        self.credentials["agent_2_auth_type"] = "bearer"
+        with self.assertRaises(MockToolProviderCredentialValidationError) as ctx:
+            A2AProvider()._validate_credentials(self.credentials)
+        self.assertIn("dead_agent", str(ctx.exception))
+
+    @patch('requests.Session.get')
+    def test_reachable_agents_warm_card_cache(self, mock_get):
+        """Test that successful validation pre-populates the card cache with auth applied"""
+        mock_get.side_effect = self._fake_get
+        del self.credentials["agent_2_name"]
+
+        A2AProvider()._validate_credentials(self.credentials)
+
+        self.assertEqual(agent_cards.get_cached_card("https://alive.example.com")["name"], "Alive")
+        _, kwargs = mock_get.call_args
+        self.assertEqual(kwargs['headers']['Authorization'], "Bearer alive-key")
+
+    @patch('requests.Session.get')
+    def test_agent_without_card_counts_as_reachable(self, mock_get):
+        """Test that an HTTP error response does not fail validation"""
+        response = MagicMock()
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError("404 Not Found")
+        mock_get.return_value = response
+
+        A2AProvider()._validate_credentials(self.credentials)
+
+        self.assertIsNone(agent_cards.get_cached_card("https://alive.example.com"))
+
+
+class TestValidateOAuthCredentials(unittest.TestCase):
+    """Test provider validation of OAuth2 client-credentials agents"""
+
+    def setUp(self):
+        agent_cards.clear_card_cache()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.credentials = {
+            "agent_1_name": "secured_agent",
+            "agent_1_url": "https://secured.example.com",
+            "agent_1_auth_type": "oauth2-client-credentials",
+            "agent_1_api_key": "client:secret"
+        }
+
+    @staticmethod
+    def _fake_get(url, **kwargs):
+        response = MagicMock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"name": "Secured", "securitySchemes": {"oauth": {
+            "type": "oauth2", "flows": {"clientCredentials": {"tokenUrl": "https://auth.example.com/token"}}
+        }}}
+        return response
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_token_minted_from_card_token_url(self, mock_get, mock_post):
+        """Test the card is probed without a token and the first token is fetched from its tokenUrl"""
+        mock_get.side_effect = self._fake_get
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {"access_token": "tok", "expires_in": 3600}
+
+        A2AProvider()._validate_credentials(self.credentials)
+
+        self.assertNotIn("Authorization", mock_get.call_args.kwargs['headers'])
+        self.assertEqual(mock_post.call_args.args[0], "https://auth.example.com/token")
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_rejected_client_fails_validation(self, mock_get, mock_post):
+        """Test a token endpoint refusing the client credentials fails validation"""
+        mock_get.side_effect = self._fake_get
+        mock_post.return_value = MagicMock(status_code=401)
+        mock_post.return_value.json.return_value = {"error": "invalid_client"}
+
+        with self.assertRaises(MockToolProviderCredentialValidationError) as ctx:
+            A2AProvider()._validate_credentials(self.credentials)
+        self.assertIn("invalid_client", str(ctx.exception))
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_unreachable_token_endpoint_only_warns(self, mock_get, mock_post):
+        """Test a token endpoint that cannot be contacted is logged rather than failing validation"""
+        mock_get.side_effect = self._fake_get
+        mock_post.side_effect = requests.exceptions.ConnectionError("connection refused")
+
+        with self.assertLogs("provider.a2a", level="WARNING") as logs:
+            A2AProvider()._validate_credentials(self.credentials)
+        self.assertIn("secured_agent", logs.output[0])
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_unreachable_agent_skips_token_discovery(self, mock_get, mock_post):
+        """Test an unreachable OAuth2 agent without a Token URL is not asked for a token"""
+        mock_get.side_effect = requests.exceptions.ConnectionError("Name or service not known")
+
+        with self.assertLogs("provider.a2a", level="WARNING"):
+            A2AProvider()._validate_credentials(self.credentials)
+        mock_post.assert_not_called()
+
+    def test_client_id_and_secret_required(self):
+        """Test the API Key field must hold client_id:client_secret"""
+        self.credentials["agent_1_api_key"] = "just-a-secret"
+        with self.assertRaises(MockToolProviderCredentialValidationError):
+            A2AProvider()._validate_credentials(self.credentials)
+
+
+if __name__ == '__main__':
+    unittest.main()
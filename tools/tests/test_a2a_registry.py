@@ -4,6 +4,8 @@ from unittest.mock import MagicMock, patch, Mock
 import sys
 import os
 import base64
+import threading
+import time
 
 # Mock dify_plugin before importing tools
 mock_dify_plugin = MagicMock()
@@ -34,6 +36,13 @@ from tools.get_agent_capabilities import GetAgentCapabilitiesTool
 from tools.call_agent import CallAgentTool
 from tools.submit_task import SubmitTaskTool
 from tools.get_task_status import GetTaskStatusTool
+from tools.cancel_task import CancelTaskTool
+from tools.get_artifact import GetArtifactTool
+from tools.run_pipeline import RunPipelineTool
+from tools import agent_cards
+from tools.artifact_store import INLINE_ARTIFACT_BYTES, artifact_store
+from tools.rate_limit import reset_limiters
+from tools.memory_budget import MemoryAccountant
 
 
 class TestListAgents(unittest.TestCase):
@@ -108,8 +117,9 @@ class TestGetAgentCapabilities(unittest.TestCase):
             "agent_1_api_key": "test-key",
             "agent_1_description": "Test agent"
         }
+        agent_cards.clear_card_cache()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_get_capabilities_success(self, mock_get):
         """Test successful capability fetch from agent-card.json"""
         mock_response = MagicMock()
@@ -139,7 +149,7 @@ class TestGetAgentCapabilities(unittest.TestCase):
         call_args = mock_get.call_args[0][0]
         self.assertIn("/.well-known/agent-card.json", call_args)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_get_capabilities_fallback_to_agent_json(self, mock_get):
         """Test fallback to agent.json when agent-card.json fails"""
         import requests
@@ -163,6 +173,22 @@ class TestGetAgentCapabilities(unittest.TestCase):
         card = json.loads(result.text)
         self.assertEqual(card["name"], "Test Agent")
 
+    @patch('requests.Session.get')
+    def test_get_capabilities_populates_card_cache(self, mock_get):
+        """Test that a fetched card is stored in the shared card cache"""
+        agent_cards.clear_card_cache()
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"name": "Test Agent", "protocolVersion": "0.3.0"}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+
+        tool = GetAgentCapabilitiesTool(self.mock_runtime)
+        next(tool._invoke({"agent_name": "test_agent"}))
+
+        cached = agent_cards.get_cached_card("https://test.example.com/")
+        self.assertEqual(cached["protocolVersion"], "0.3.0")
+        self.assertTrue(agent_cards.supports_non_blocking_send(cached))
+
     def test_get_capabilities_agent_not_found(self):
         """Test error when agent doesn't exist"""
         tool = GetAgentCapabilitiesTool(self.mock_runtime)
@@ -209,8 +235,10 @@ class TestCallAgent(unittest.TestCase):
             "agent_4_api_key": "",
             "agent_4_description": "No auth agent"
         }
+        reset_limiters()
+        agent_cards.clear_card_cache()
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_call_agent_bearer_auth(self, mock_post):
         """Test call with bearer token authentication"""
         mock_response = MagicMock()
@@ -241,7 +269,7 @@ class TestCallAgent(unittest.TestCase):
         # Verify result
         self.assertIn("Operation successful", result.text)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_call_agent_api_key_auth(self, mock_post):
         """Test call with API key authentication"""
         mock_response = MagicMock()
@@ -260,7 +288,7 @@ class TestCallAgent(unittest.TestCase):
         _, kwargs = mock_post.call_args
         self.assertEqual(kwargs['headers']['Authorization'], "Bearer apikey-456")
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_call_agent_basic_auth(self, mock_post):
         """Test call with basic authentication"""
         mock_response = MagicMock()
@@ -280,7 +308,7 @@ class TestCallAgent(unittest.TestCase):
         expected_auth = "Basic " + base64.b64encode(b"user:pass").decode()
         self.assertEqual(kwargs['headers']['Authorization'], expected_auth)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_call_agent_no_auth(self, mock_post):
         """Test call with no authentication"""
         mock_response = MagicMock()
@@ -299,7 +327,7 @@ class TestCallAgent(unittest.TestCase):
         _, kwargs = mock_post.call_args
         self.assertNotIn('Authorization', kwargs['headers'])
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_call_agent_a2a_error_response(self, mock_post):
         """Test handling of A2A error response"""
         mock_response = MagicMock()
@@ -321,7 +349,7 @@ class TestCallAgent(unittest.TestCase):
         self.assertIn("A2A Error", result.text)
         self.assertIn("Invalid params", result.text)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_call_agent_network_error(self, mock_post):
         """Test handling of network errors"""
         mock_post.side_effect = Exception("Connection failed")
@@ -335,6 +363,88 @@ class TestCallAgent(unittest.TestCase):
 
         self.assertIn("Error", result.text)
 
+    @patch('requests.Session.post')
+    def test_call_agent_rate_limited(self, mock_post):
+        """Test that a 429 with a long Retry-After is reported as rate limiting"""
+        mock_response = MagicMock()
+        mock_response.status_code = 429
+        mock_response.headers = {"Retry-After": "120"}
+        mock_post.return_value = mock_response
+
+        tool = CallAgentTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "bearer_agent",
+            "instruction": "Test"
+        }))
+
+        self.assertTrue(result.text.startswith("Rate Limited:"))
+        self.assertIn("429", result.text)
+        mock_post.assert_called_once()
+
+    @patch('requests.Session.post')
+    def test_call_agent_memory_budget_exceeded(self, mock_post):
+        """Test a response too large for the memory budget is dropped before parsing"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.content = b"x" * 100000
+        mock_post.return_value = mock_response
+
+        accountant = MemoryAccountant(budget_bytes=200000)
+        with patch('tools.call_agent.get_accountant', return_value=accountant):
+            tool = CallAgentTool(self.mock_runtime)
+            result = next(tool._invoke({
+                "agent_name": "bearer_agent",
+                "instruction": "Test"
+            }))
+
+        self.assertTrue(result.text.startswith("Memory Budget Exceeded:"))
+        mock_response.json.assert_not_called()
+        self.assertEqual(accountant.snapshot()["in_flight_bytes"], 0)
+
+    @patch('requests.Session.get')
+    @patch('requests.Session.post')
+    def test_call_agent_with_files(self, mock_post, mock_get):
+        """Test Dify files are sent as FileParts, inline bytes streamed in the body"""
+        file_response = MagicMock()
+        file_response.iter_content.return_value = iter([b"%PDF-", b"1.7"])
+        mock_get.return_value = file_response
+        bodies = []
+
+        def fake_post(url, **kwargs):
+            bodies.append(json.loads(b"".join(kwargs['data'])))
+            response = MagicMock()
+            response.json.return_value = {"jsonrpc": "2.0", "result": "ok", "id": "1"}
+            return response
+        mock_post.side_effect = fake_post
+
+        internal_file = MagicMock(url="http://api:5001/files/1", filename="spec.pdf", mime_type="application/pdf")
+        public_file = MagicMock(url="https://cdn.example.com/notes.txt", filename="notes.txt", mime_type="text/plain")
+
+        tool = CallAgentTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "bearer_agent",
+            "instruction": "Review these",
+            "files": [internal_file, public_file]
+        }))
+
+        self.assertEqual(result.text, '"ok"')
+        parts = bodies[0]['params']['message']['parts']
+        self.assertEqual(parts[0], {"kind": "text", "text": "Review these"})
+        self.assertEqual(base64.b64decode(parts[1]['file']['bytes']), b"%PDF-1.7")
+        self.assertEqual(parts[1]['file']['name'], "spec.pdf")
+        self.assertEqual(parts[2]['file']['uri'], "https://cdn.example.com/notes.txt")
+
+    def test_call_agent_invalid_file_transfer(self):
+        """Test an unknown file_transfer mode is rejected"""
+        tool = CallAgentTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "bearer_agent",
+            "instruction": "Test",
+            "file_transfer": "carrier-pigeon"
+        }))
+
+        self.assertTrue(result.text.startswith("Invalid file_transfer"))
+
     def test_call_agent_missing_agent(self):
         """Test error when agent not found"""
         tool = CallAgentTool(self.mock_runtime)
@@ -372,42 +482,146 @@ class TestSubmitTask(unittest.TestCase):
             "agent_1_api_key": "async-key-123",
             "agent_1_description": "Async agent"
         }
+        agent_cards.clear_card_cache()
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_submit_task_success(self, mock_post):
         """Test successful task submission with SSE stream"""
-        # Mock SSE response
-        mock_response = MagicMock()
-        mock_response.raise_for_status.return_value = None
-
-        # Mock SSEClient to return taskId
-        with patch('tools.submit_task.SSEClient') as mock_sse_client:
-            mock_event = MagicMock()
-            mock_event.data = json.dumps({
+        # Mock SSE response delivered in arbitrary byte chunks
+        sse_body = (
+            b"event: status-update\n"
+            b"data: " + json.dumps({
                 "jsonrpc": "2.0",
                 "result": {"taskId": "task-abc-123", "state": "submitted"},
                 "id": "1"
-            })
-            mock_sse_client.return_value.events.return_value = [mock_event]
-            mock_post.return_value = mock_response
-
-            tool = SubmitTaskTool(self.mock_runtime)
-            result_generator = tool._invoke({
-                "agent_name": "async_agent",
-                "instruction": "Long running task"
-            })
-            result = next(result_generator)
-
-            # Verify taskId was extracted
-            self.assertEqual(result.text, "task-abc-123")
-
-            # Verify request
-            mock_post.assert_called_once()
-            _, kwargs = mock_post.call_args
-            self.assertEqual(kwargs['json']['method'], "message/stream")
-            self.assertTrue(kwargs['stream'])
-
-    @patch('requests.post')
+            }).encode() + b"\n\n"
+        )
+        mock_response = MagicMock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.iter_content.return_value = [sse_body[:17], sse_body[17:40], sse_body[40:]]
+        mock_post.return_value = mock_response
+
+        tool = SubmitTaskTool(self.mock_runtime)
+        result_generator = tool._invoke({
+            "agent_name": "async_agent",
+            "instruction": "Long running task"
+        })
+        result = next(result_generator)
+
+        # Verify taskId was extracted
+        self.assertEqual(result.text, "task-abc-123")
+
+        # Verify request
+        mock_post.assert_called_once()
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['json']['method'], "message/stream")
+        self.assertTrue(kwargs['stream'])
+
+    @patch('requests.Session.post')
+    def test_submit_task_with_file_uri(self, mock_post):
+        """Test files are sent by URI when file_transfer is uri"""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [
+            b'data: {"jsonrpc": "2.0", "result": {"taskId": "task-f-1"}, "id": "1"}\n\n'
+        ]
+        mock_post.return_value = mock_response
+        dify_file = MagicMock(url="http://api:5001/files/1", filename="data.csv", mime_type="text/csv")
+
+        tool = SubmitTaskTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "async_agent",
+            "instruction": "Analyze",
+            "files": [dify_file],
+            "file_transfer": "uri"
+        }))
+
+        self.assertEqual(result.text, "task-f-1")
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['json']['params']['message']['parts'][1], {"kind": "file", "file": {
+            "name": "data.csv", "mimeType": "text/csv", "uri": "http://api:5001/files/1"
+        }})
+
+    @patch('requests.Session.post')
+    def test_submit_task_skips_stream_when_card_disables_it(self, mock_post):
+        """Test agents without streaming get message/send (blocking as a last resort), never message/stream"""
+        agent_cards.store_card("https://async.example.com", {
+            "protocolVersion": "0.1.0",
+            "capabilities": {"streaming": False}
+        })
+        rejected = MagicMock()
+        rejected.json.return_value = {"jsonrpc": "2.0", "error": {"code": -32602, "message": "bad"}, "id": "1"}
+        accepted = MagicMock()
+        accepted.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": "task-b-1", "status": {"state": "completed"}}, "id": "2"
+        }
+        mock_post.side_effect = [rejected, accepted]
+
+        tool = SubmitTaskTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "async_agent",
+            "instruction": "No streaming here"
+        }))
+
+        self.assertEqual(result.text, "task-b-1")
+        methods = [c.kwargs['json']['method'] for c in mock_post.call_args_list]
+        self.assertEqual(methods, ["message/send", "message/send"])
+        self.assertEqual(mock_post.call_args_list[0].kwargs['json']['params']['configuration'], {"blocking": False})
+        self.assertNotIn('configuration', mock_post.call_args_list[1].kwargs['json']['params'])
+        self.assertFalse(any(c.kwargs.get('stream') for c in mock_post.call_args_list))
+
+    @patch('requests.Session.post')
+    def test_submit_task_non_blocking_send(self, mock_post):
+        """Test one round-trip submission via message/send when the cached card allows it"""
+        agent_cards.store_card("https://async.example.com", {"protocolVersion": "0.3.0"})
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "jsonrpc": "2.0",
+            "result": {"kind": "task", "id": "task-nb-1", "status": {"state": "submitted"}},
+            "id": "1"
+        }
+        mock_response.raise_for_status.return_value = None
+        mock_post.return_value = mock_response
+
+        tool = SubmitTaskTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "async_agent",
+            "instruction": "Long running task"
+        }))
+
+        self.assertEqual(result.text, "task-nb-1")
+        mock_post.assert_called_once()
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['json']['method'], "message/send")
+        self.assertFalse(kwargs['json']['params']['configuration']['blocking'])
+        self.assertNotIn('stream', kwargs)
+
+    @patch('requests.Session.post')
+    def test_submit_task_non_blocking_falls_back_to_stream(self, mock_post):
+        """Test fallback to message/stream when the agent rejects non-blocking send"""
+        agent_cards.store_card("https://async.example.com", {"protocolVersion": "0.3.0"})
+        send_response = MagicMock()
+        send_response.json.return_value = {
+            "jsonrpc": "2.0",
+            "error": {"code": -32601, "message": "Method not found"},
+            "id": "1"
+        }
+        stream_response = MagicMock()
+        stream_response.iter_content.return_value = [
+            b'data: {"jsonrpc": "2.0", "result": {"taskId": "task-s-1"}, "id": "2"}\n\n'
+        ]
+        mock_post.side_effect = [send_response, stream_response]
+
+        tool = SubmitTaskTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "async_agent",
+            "instruction": "Long running task"
+        }))
+
+        self.assertEqual(result.text, "task-s-1")
+        methods = [c.kwargs['json']['method'] for c in mock_post.call_args_list]
+        self.assertEqual(methods, ["message/send", "message/stream"])
+
+    @patch('requests.Session.post')
     def test_submit_task_network_error(self, mock_post):
         """Test handling of network errors"""
         mock_post.side_effect = Exception("Connection timeout")
@@ -446,8 +660,9 @@ class TestGetTaskStatus(unittest.TestCase):
             "agent_1_api_key": "status-key-123",
             "agent_1_description": "Status agent"
         }
+        agent_cards.clear_card_cache()
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_get_task_status_success(self, mock_post):
         """Test successful task status retrieval"""
         mock_response = MagicMock()
@@ -480,6 +695,70 @@ class TestGetTaskStatus(unittest.TestCase):
         self.assertEqual(kwargs['json']['method'], "tasks/get")
         self.assertEqual(kwargs['json']['params']['id'], "task-123")
 
+    @patch('requests.Session.post')
+    def test_get_task_status_status_only(self, mock_post):
+        """Test status-only mode requests no history and returns a compact status"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "jsonrpc": "2.0",
+            "result": {
+                "kind": "task",
+                "id": "task-123",
+                "status": {"state": "working"},
+                "history": [{"kind": "message", "messageId": "m1", "parts": []}]
+            },
+            "id": "1"
+        }
+        mock_response.raise_for_status.return_value = None
+        mock_post.return_value = mock_response
+
+        tool = GetTaskStatusTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "status_agent",
+            "task_id": "task-123",
+            "output_mode": "status-only"
+        }))
+
+        view = json.loads(result.text)
+        # Running tasks carry a poll hint; with no duration history it only backs off
+        self.assertEqual(view.pop("pollHint")["nextPollSeconds"], 1)
+        self.assertEqual(view, {"id": "task-123", "status": {"state": "working"}})
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['json']['params']['historyLength'], 0)
+
+    @patch('requests.Session.post')
+    def test_get_task_status_serves_terminal_result_from_disk(self, mock_post):
+        """Test a completed task is stored on disk and later served without a network call"""
+        import tempfile
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "jsonrpc": "2.0",
+            "result": {"kind": "task", "id": "task-done", "status": {"state": "completed"}},
+            "id": "1"
+        }
+        mock_response.raise_for_status.return_value = None
+        mock_post.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.dict(os.environ, {"A2A_PERSISTENT_CACHE": os.path.join(tmpdir, "a2a.db")}):
+            tool = GetTaskStatusTool(self.mock_runtime)
+            first = next(tool._invoke({"agent_name": "status_agent", "task_id": "task-done"}))
+            second = next(tool._invoke({"agent_name": "status_agent", "task_id": "task-done"}))
+
+        self.assertEqual(first.text, second.text)
+        mock_post.assert_called_once()
+
+    def test_get_task_status_invalid_output_mode(self):
+        """Test error on unknown output mode"""
+        tool = GetTaskStatusTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "status_agent",
+            "task_id": "task-123",
+            "output_mode": "everything"
+        }))
+
+        self.assertIn("Invalid output_mode", result.text)
+
     def test_get_task_status_missing_agent(self):
         """Test error when agent not found"""
         tool = GetTaskStatusTool(self.mock_runtime)
@@ -491,7 +770,35 @@ class TestGetTaskStatus(unittest.TestCase):
 
         self.assertIn("not found in registry", result.text)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_get_task_status_over_http_json(self, mock_get, mock_post):
+        """Test tasks/get becomes GET /v1/tasks/{id} when the card prefers HTTP+JSON"""
+        agent_cards.store_card("https://status.example.com", {
+            "protocolVersion": "0.3.0",
+            "url": "https://status.example.com",
+            "preferredTransport": "HTTP+JSON"
+        })
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"task": {"id": "task/9", "status": {"state": "TASK_STATE_COMPLETED"}}}
+        mock_get.return_value = mock_response
+
+        tool = GetTaskStatusTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "agent_name": "status_agent",
+            "task_id": "task/9",
+            "output_mode": "status-only"
+        }))
+
+        self.assertEqual(json.loads(result.text), {"id": "task/9", "status": {"state": "completed"}})
+        mock_post.assert_not_called()
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], "https://status.example.com/v1/tasks/task%2F9")
+        self.assertEqual(kwargs['params'], {"historyLength": 0})
+        self.assertEqual(kwargs['headers']['Authorization'], "Bearer status-key-123")
+
+    @patch('requests.Session.post')
     def test_get_task_status_network_error(self, mock_post):
         """Test handling of network errors"""
         mock_post.side_effect = Exception("Connection failed")
@@ -506,5 +813,364 @@ class TestGetTaskStatus(unittest.TestCase):
         self.assertIn("Error", result.text)
 
 
+
+class TestGetArtifact(unittest.TestCase):
+    """Test cases for large artifacts: manifests from get_task_status, slices from get_artifact"""
+
+    def setUp(self):
+        """Setup mock runtime"""
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "report_agent",
+            "agent_1_url": "https://report.example.com",
+            "agent_1_auth_type": "bearer",
+            "agent_1_api_key": "report-key-123",
+            "agent_1_description": "Report agent"
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        artifact_store.clear()
+        self.addCleanup(artifact_store.clear)
+        self.report = "\n".join(f"row {i}: " + "x" * 80 for i in range(INLINE_ARTIFACT_BYTES // 40))
+
+    def task_response(self):
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"jsonrpc": "2.0", "id": "1", "result": {
+            "kind": "task", "id": "task-r-1", "status": {"state": "completed"},
+            "artifacts": [
+                {"artifactId": "summary", "parts": [{"kind": "text", "text": "All good"}]},
+                {"artifactId": "report", "parts": [{"kind": "text", "text": self.report}]}
+            ]
+        }}
+        return mock_response
+
+    def read(self, **params):
+        tool = GetArtifactTool(self.mock_runtime)
+        return next(tool._invoke({"agent_name": "report_agent", "task_id": "task-r-1", **params})).text
+
+    @patch('requests.Session.post')
+    def test_status_returns_manifest_and_artifact_serves_slices(self, mock_post):
+        """Test a large artifact becomes a manifest and is then read in pages without the agent"""
+        mock_post.return_value = self.task_response()
+
+        status_tool = GetTaskStatusTool(self.mock_runtime)
+        status = json.loads(next(status_tool._invoke({
+            "agent_name": "report_agent", "task_id": "task-r-1", "output_mode": "final-artifacts"
+        })).text)
+
+        summary, report = status["artifacts"]
+        self.assertEqual(summary["parts"][0]["text"], "All good")
+        self.assertTrue(report["stored"])
+        self.assertEqual(report["parts"][0]["lines"], INLINE_ARTIFACT_BYTES // 40)
+        self.assertLess(len(json.dumps(status)), 1024)
+
+        mock_post.reset_mock()
+        page = json.loads(self.read(artifact_id="report", start=2, length=3))
+        self.assertEqual(page["content"].split("\n"), self.report.split("\n")[2:5])
+        self.assertTrue(page["hasMore"])
+        self.assertEqual(page["end"], 5)
+
+        page = json.loads(self.read(artifact_id="report", unit="bytes", length=10))
+        self.assertEqual(page["content"], self.report[:10])
+        mock_post.assert_not_called()
+
+    @patch('requests.Session.post')
+    def test_missing_artifact_is_fetched_without_history(self, mock_post):
+        """Test an artifact not held locally is read from the agent with historyLength 0"""
+        mock_post.return_value = self.task_response()
+
+        page = json.loads(self.read(artifact_id="summary"))
+
+        self.assertEqual(page["content"], "All good")
+        self.assertFalse(page["hasMore"])
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['json']['method'], "tasks/get")
+        self.assertEqual(kwargs['json']['params'], {"id": "task-r-1", "historyLength": 0})
+
+        self.assertIn("not found in task", self.read(artifact_id="ghost"))
+        self.assertIn("does not exist", self.read(artifact_id="summary", part_index=3))
+
+    def test_invalid_range(self):
+        """Test invalid units, negative positions and empty lengths are rejected"""
+        self.assertIn("Invalid unit", self.read(artifact_id="report", unit="pages"))
+        self.assertIn("Invalid start", self.read(artifact_id="report", start=-1))
+        self.assertIn("Invalid length '0'", self.read(artifact_id="report", unit="bytes", length=0))
+
+
+class TestCancelTask(unittest.TestCase):
+    """Test cases for cancel_task tool"""
+
+    def setUp(self):
+        """Setup mock runtime"""
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "async_agent",
+            "agent_1_url": "https://async.example.com",
+            "agent_1_auth_type": "bearer",
+            "agent_1_api_key": "async-key-123",
+            "agent_1_description": "Async agent"
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+
+    @patch('requests.Session.post')
+    def test_cancel_single_task(self, mock_post):
+        """Test tasks/cancel is sent for one task"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": "task-1", "status": {"state": "canceled"}}, "id": "1"
+        }
+        mock_post.return_value = mock_response
+
+        tool = CancelTaskTool(self.mock_runtime)
+        result = json.loads(next(tool._invoke({"agent_name": "async_agent", "task_ids": "task-1"})).text)
+
+        self.assertEqual(result["canceled"], 1)
+        self.assertEqual(result["results"], [{"taskId": "task-1", "state": "canceled"}])
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['json']['method'], "tasks/cancel")
+        self.assertEqual(kwargs['json']['params'], {"id": "task-1"})
+        self.assertEqual(kwargs['headers']['Authorization'], "Bearer async-key-123")
+
+    @patch('requests.Session.post')
+    def test_cancel_many_tasks_reports_each(self, mock_post):
+        """Test several task IDs are all cancelled and failures are reported per task"""
+        def reply(url, **kwargs):
+            task_id = kwargs['json']['params']['id']
+            response = MagicMock()
+            if task_id == "task-done":
+                response.json.return_value = {
+                    "jsonrpc": "2.0", "error": {"code": -32002, "message": "Task cannot be canceled"}, "id": "1"
+                }
+            else:
+                response.json.return_value = {
+                    "jsonrpc": "2.0", "result": {"kind": "task", "id": task_id, "status": {"state": "canceled"}}, "id": "1"
+                }
+            return response
+        mock_post.side_effect = reply
+
+        tool = CancelTaskTool(self.mock_runtime)
+        result = json.loads(next(tool._invoke({
+            "agent_name": "async_agent",
+            "task_ids": "task-1, task-2\ntask-done task-1"
+        })).text)
+
+        self.assertEqual(result["canceled"], 2)
+        self.assertEqual(result["failed"], 1)
+        self.assertEqual([r["taskId"] for r in result["results"]], ["task-1", "task-2", "task-done"])
+        self.assertIn("A2A Error", result["results"][2]["error"])
+        self.assertEqual(mock_post.call_count, 3)
+
+    @patch('requests.Session.post')
+    def test_cancel_network_error(self, mock_post):
+        """Test a single failed cancel returns the error text"""
+        import requests
+        mock_post.side_effect = requests.exceptions.ConnectionError("Connection refused")
+
+        tool = CancelTaskTool(self.mock_runtime)
+        result = next(tool._invoke({"agent_name": "async_agent", "task_ids": '["task-1"]'}))
+
+        self.assertIn("Network Error", result.text)
+
+    def test_cancel_invalid_task_ids(self):
+        """Test empty, malformed and oversized task ID lists are rejected"""
+        tool = CancelTaskTool(self.mock_runtime)
+        for task_ids in ("", '["task-1", ', " ".join(f"t{i}" for i in range(101))):
+            result = next(tool._invoke({"agent_name": "async_agent", "task_ids": task_ids}))
+            self.assertIn("Invalid task_ids", result.text)
+
+    def test_cancel_missing_agent(self):
+        """Test error when agent not in registry"""
+        tool = CancelTaskTool(self.mock_runtime)
+        result = next(tool._invoke({"agent_name": "ghost", "task_ids": "task-1"}))
+
+        self.assertIn("not found in registry", result.text)
+
+
+class TestRunPipeline(unittest.TestCase):
+    """Test cases for run_pipeline tool"""
+
+    def setUp(self):
+        """Setup mock runtime with three agents"""
+        reset_limiters()
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "research",
+            "agent_1_url": "https://research.example.com",
+            "agent_1_auth_type": "bearer",
+            "agent_1_api_key": "research-key",
+            "agent_2_name": "writer",
+            "agent_2_url": "https://writer.example.com",
+            "agent_2_auth_type": "none",
+            "agent_3_name": "critic",
+            "agent_3_url": "https://critic.example.com",
+            "agent_3_auth_type": "none"
+        }
+
+    @staticmethod
+    def _fake_post(url, **kwargs):
+        """Each agent echoes its name and the text it received"""
+        text = kwargs['json']['params']['message']['parts'][0].get("text", "")
+        agent = url.split("//")[1].split(".")[0]
+        response = MagicMock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "jsonrpc": "2.0",
+            "result": {"kind": "message", "role": "agent", "messageId": "m",
+                       "parts": [{"kind": "text", "text": f"{agent}({text})"}]},
+            "id": kwargs['json']['id']
+        }
+        return response
+
+    @patch('requests.Session.post')
+    def test_pipeline_chains_steps(self, mock_post):
+        """Test outputs flow between steps through prompt templates"""
+        mock_post.side_effect = self._fake_post
+
+        tool = RunPipelineTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "input": "topic",
+            "steps": json.dumps([
+                {"agent": "research", "prompt": "find {input}"},
+                {"agent": "writer", "prompt": "write {previous}"},
+                {"agent": "critic"}
+            ])
+        }))
+
+        output = json.loads(result.text)
+        self.assertEqual(output["output"], "critic(writer(write research(find topic)))")
+        self.assertEqual([step["agents"] for step in output["steps"]], [["research"], ["writer"], ["critic"]])
+        first_headers = mock_post.call_args_list[0].kwargs['headers']
+        self.assertEqual(first_headers['Authorization'], "Bearer research-key")
+
+    @patch('requests.Session.post')
+    def test_pipeline_parallel_branches(self, mock_post):
+        """Test parallel branches run and are combined for the next step"""
+        mock_post.side_effect = self._fake_post
+
+        tool = RunPipelineTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "input": "x",
+            "steps": json.dumps([
+                {"parallel": [{"agent": "research", "prompt": "a {input}"}, {"agent": "writer", "prompt": "b {input}"}]},
+                {"agent": "critic", "prompt": "{step_1}"}
+            ])
+        }))
+
+        output = json.loads(result.text)["output"]
+        self.assertEqual(output, "critic([research]\nresearch(a x)\n\n[writer]\nwriter(b x))")
+
+    @patch('requests.Session.post')
+    def test_pipeline_stops_on_step_error(self, mock_post):
+        """Test the failing step is reported and later steps are not run"""
+        error_response = MagicMock()
+        error_response.raise_for_status.return_value = None
+        error_response.json.return_value = {"jsonrpc": "2.0", "error": {"code": -32603, "message": "boom"}, "id": "1"}
+        mock_post.return_value = error_response
+
+        tool = RunPipelineTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "input": "x",
+            "steps": json.dumps([{"agent": "research"}, {"agent": "writer"}])
+        }))
+
+        self.assertIn("Pipeline failed at step 1", result.text)
+        self.assertIn("boom", result.text)
+        mock_post.assert_called_once()
+
+    @patch('requests.Session.post')
+    def test_pipeline_stops_on_failed_task(self, mock_post):
+        """Test a step whose Task did not complete fails the pipeline instead of feeding its error onward"""
+        failed = MagicMock()
+        failed.json.return_value = {"jsonrpc": "2.0", "id": "1", "result": {
+            "kind": "task", "id": "task-9", "status": {"state": "failed", "message": {
+                "kind": "message", "role": "agent", "messageId": "m",
+                "parts": [{"kind": "text", "text": "quota exhausted"}]
+            }}
+        }}
+        mock_post.return_value = failed
+
+        tool = RunPipelineTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "input": "x",
+            "steps": json.dumps([{"agent": "research"}, {"agent": "writer"}])
+        }))
+
+        self.assertEqual(result.text, "Pipeline failed at step 1: research: Task task-9 is 'failed': quota exhausted")
+        mock_post.assert_called_once()
+
+    @patch('requests.Session.post')
+    def test_pipeline_stops_on_empty_output(self, mock_post):
+        """Test a step that returns no parts fails instead of sending an empty message onward"""
+        def reply(url, **kwargs):
+            if url.startswith("https://research."):
+                response = MagicMock()
+                response.json.return_value = {"jsonrpc": "2.0", "id": "1", "result": {
+                    "kind": "task", "id": "task-7", "status": {"state": "completed"}, "artifacts": []
+                }}
+                return response
+            return self._fake_post(url, **kwargs)
+        mock_post.side_effect = reply
+
+        tool = RunPipelineTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "input": "x",
+            "steps": json.dumps([
+                {"parallel": [{"agent": "writer"}, {"agent": "research"}]},
+                {"agent": "critic"}
+            ])
+        }))
+
+        self.assertEqual(result.text, "Pipeline failed at step 1: research: Step returned no output")
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('requests.Session.post')
+    def test_pipeline_step_timeout_is_wall_clock(self, mock_post):
+        """Test a branch that outlives its timeout fails the step even while the agent keeps streaming"""
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+
+        def slow_post(url, **kwargs):
+            if url.startswith("https://writer."):
+                gate.wait(5)
+            return self._fake_post(url, **kwargs)
+        mock_post.side_effect = slow_post
+
+        tool = RunPipelineTool(self.mock_runtime)
+        started = time.monotonic()
+        result = next(tool._invoke({
+            "input": "x",
+            "steps": json.dumps([
+                {"parallel": [{"agent": "research"}, {"agent": "writer", "timeout": 0.2}]},
+                {"agent": "critic"}
+            ])
+        }))
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIn("Pipeline failed at step 1: writer: Timed out after 0.2s", result.text)
+        self.assertNotIn("critic", [call.args[0].split("//")[1].split(".")[0] for call in mock_post.call_args_list])
+
+    def test_pipeline_invalid_step_timeout(self):
+        """Test a non-numeric or non-positive branch timeout is rejected before anything is sent"""
+        tool = RunPipelineTool(self.mock_runtime)
+        for timeout in ("soon", -1, 0):
+            result = next(tool._invoke({
+                "input": "x",
+                "steps": json.dumps([{"agent": "research", "timeout": timeout}])
+            }))
+            self.assertIn("Invalid pipeline steps: Step 1: Invalid timeout", result.text)
+
+    def test_pipeline_unknown_agent(self):
+        """Test validation of step agents before anything is sent"""
+        tool = RunPipelineTool(self.mock_runtime)
+        result = next(tool._invoke({
+            "input": "x",
+            "steps": json.dumps([{"agent": "research"}, {"agent": "ghost"}])
+        }))
+
+        self.assertIn("Invalid pipeline steps", result.text)
+        self.assertIn("ghost", result.text)
+
+
 if __name__ == '__main__':
     unittest.main()
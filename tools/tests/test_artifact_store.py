@@ -0,0 +1,119 @@
+import unittest
+import json
+import os
+import sys
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.artifact_store import (
+    INLINE_ARTIFACT_BYTES,
+    ArtifactStore,
+    artifact_store,
+    offload_artifacts,
+    slice_content
+)
+
+
+def text_artifact(artifact_id, text):
+    return {"artifactId": artifact_id, "name": "report", "parts": [{"kind": "text", "text": text}]}
+
+
+class TestSliceContent(unittest.TestCase):
+    """Test line and byte ranges over artifact content"""
+
+    def test_line_ranges(self):
+        """Test line pages report where to continue"""
+        content = "\n".join(f"line {i}" for i in range(10))
+        page = slice_content(content, "lines", 0, 4)
+        self.assertEqual(page["content"], "line 0\nline 1\nline 2\nline 3")
+        self.assertEqual((page["end"], page["total"], page["hasMore"]), (4, 10, True))
+
+        last = slice_content(content, "lines", 8, 4)
+        self.assertEqual(last["content"], "line 8\nline 9")
+        self.assertFalse(last["hasMore"])
+
+    def test_byte_ranges_keep_characters_whole(self):
+        """Test byte pages never split a multi-byte UTF-8 character"""
+        content = "aé€😀" * 50
+        pages, start = [], 0
+        while True:
+            page = slice_content(content, "bytes", start, 7)
+            pages.append(page["content"])
+            if not page["hasMore"]:
+                break
+            start = page["end"]
+        self.assertEqual("".join(pages), content)
+
+        # A start inside a character moves to the next character
+        self.assertEqual(slice_content("é", "bytes", 1, 5)["content"], "")
+
+    def test_byte_range_shorter_than_a_character_advances(self):
+        """Test a length smaller than the character at start still returns that character"""
+        page = slice_content("éé", "bytes", 0, 1)
+        self.assertEqual((page["content"], page["end"], page["hasMore"]), ("é", 2, True))
+
+        pages, start = [], 0
+        while True:
+            page = slice_content("a😀é", "bytes", start, 1)
+            self.assertGreater(page["end"], start)
+            pages.append(page["content"])
+            if not page["hasMore"]:
+                break
+            start = page["end"]
+        self.assertEqual(pages, ["a", "😀", "é"])
+
+
+class TestArtifactStore(unittest.TestCase):
+    """Test the size-bounded artifact store"""
+
+    def test_manifest_describes_parts(self):
+        """Test the manifest lists each part's kind and size, not its content"""
+        store = ArtifactStore()
+        manifest = store.put("k", {"artifactId": "a1", "parts": [
+            {"kind": "text", "text": "one\ntwo"},
+            {"kind": "data", "data": {"rows": [1, 2]}},
+            {"kind": "file", "file": {"name": "x.csv", "mimeType": "text/csv", "bytes": "YWJj"}}
+        ]})
+        self.assertTrue(manifest["stored"])
+        self.assertEqual([p["kind"] for p in manifest["parts"]], ["text", "data", "file"])
+        self.assertEqual(manifest["parts"][0]["lines"], 2)
+        self.assertEqual(manifest["parts"][2]["mimeType"], "text/csv")
+        self.assertNotIn("one", json.dumps(manifest))
+        self.assertEqual(json.loads(store.get("k")["parts"][1]["content"]), {"rows": [1, 2]})
+
+    def test_size_bound_evicts_least_recently_read(self):
+        """Test the store stays under its size and drops the least recently read artifact"""
+        store = ArtifactStore(max_bytes=250)
+        store.put("a", text_artifact("a", "x" * 100))
+        store.put("b", text_artifact("b", "y" * 100))
+        store.get("a")
+        store.put("c", text_artifact("c", "z" * 100))
+
+        self.assertIsNotNone(store.get("a"))
+        self.assertIsNone(store.get("b"))
+        self.assertLessEqual(store.memory_bytes(), 250)
+
+        self.assertFalse(store.put("huge", text_artifact("huge", "h" * 300))["stored"])
+        self.assertIsNone(store.get("huge"))
+        self.assertGreater(store.evict(1), 0)
+
+    def test_offload_only_large_artifacts(self):
+        """Test only artifacts above the inline threshold are replaced by manifests"""
+        artifact_store.clear()
+        view = {"id": "t1", "artifacts": [
+            text_artifact("small", "short"),
+            text_artifact("big", "x" * (INLINE_ARTIFACT_BYTES + 1))
+        ]}
+        offloaded = offload_artifacts(view, "https://agent", "Bearer k", "t1")
+
+        self.assertEqual(offloaded["artifacts"][0], view["artifacts"][0])
+        self.assertTrue(offloaded["artifacts"][1]["stored"])
+        self.assertEqual(len(view["artifacts"][1]["parts"][0]["text"]), INLINE_ARTIFACT_BYTES + 1)
+        self.assertIsNotNone(artifact_store.get(ArtifactStore.key("https://agent", "Bearer k", "t1", "big")))
+        self.assertIsNone(artifact_store.get(ArtifactStore.key("https://agent", "Bearer other", "t1", "big")))
+        artifact_store.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,570 @@
+import unittest
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.list_agents import ListAgentsTool
+from tools.get_agent_capabilities import GetAgentCapabilitiesTool
+from tools.call_agent import CallAgentTool
+from tools.submit_task import SubmitTaskTool
+from tools.get_task_status import GetTaskStatusTool
+from tools.cancel_task import CancelTaskTool
+from tools.get_artifact import GetArtifactTool
+from tools.run_pipeline import RunPipelineTool
+from tools import agent_cards, job_queue
+from tools.job_queue import JOB_ID_PREFIX, JobScheduler
+from tools.memory_budget import get_accountant
+from tools.rate_limit import reset_limiters
+from tools.subscriptions import subscription_manager
+
+# Invocations per tool and worker threads for the mixed stress run
+STRESS_INVOCATIONS = 100
+STRESS_THREADS = 32
+
+# Simulated agent processing time, so that concurrency has something to overlap
+AGENT_LATENCY_SECONDS = 0.005
+
+# Concurrency cap configured for the "gamma" agent
+GAMMA_MAX_CONCURRENCY = 2
+
+# Tasks with this ID prefix stay "working" until their resubscribe streams are released
+SUBSCRIBED_TASK_PREFIX = "sub-"
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) resets connections under a burst of concurrent clients
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # submit_task closes SSE streams as soon as it has the task id; resets are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInAgents:
+    """
+    Local A2A agents served from one threaded HTTP server, one per path prefix.
+    Every reply echoes the agent name and the Authorization header it received,
+    so responses can be checked for cross-agent and cross-credential leakage.
+    Tasks belong to the credential that created them: cancelling with another
+    one gets TaskNotFound.
+    """
+
+    def __init__(self, names, failing=(), latency=AGENT_LATENCY_SECONDS):
+        self.names = set(names)
+        self.failing = set(failing)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = {name: 0 for name in self.names}
+        self.max_active = {name: 0 for name in self.names}
+        self.requests = 0
+        # task id -> Authorization header that created it
+        self.owners = {}
+        # (task id, Authorization header) -> tasks/resubscribe streams opened
+        self.subscriptions = {}
+        # Set to let held tasks/resubscribe streams send their final event
+        self.release = threading.Event()
+
+        agents = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, content_type="application/json"):
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                name = self.path.split("/")[2]
+                if name in agents.failing or not self.path.endswith("/.well-known/agent-card.json"):
+                    self._reply(404, "{}")
+                    return
+                self._reply(200, json.dumps({
+                    "name": name,
+                    "protocolVersion": "0.3.0",
+                    "preferredTransport": "JSONRPC",
+                    "capabilities": {"streaming": True}
+                }))
+
+            def do_POST(self):
+                name = self.path.split("/")[2]
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                auth = self.headers.get("Authorization", "")
+                if body["method"] == "tasks/resubscribe":
+                    self._subscribe(name, auth, body)
+                    return
+
+                # Count only the processing window: once the reply is written the client
+                # may release its slot before this thread gets to run again
+                with agents.lock:
+                    agents.requests += 1
+                    agents.active[name] += 1
+                    agents.max_active[name] = max(agents.max_active[name], agents.active[name])
+                try:
+                    time.sleep(agents.latency)
+                    if name in agents.failing:
+                        reply = (500, "{}", "application/json")
+                    else:
+                        reply = agents.handle(name, auth, body)
+                finally:
+                    with agents.lock:
+                        agents.active[name] -= 1
+                self._reply(*reply)
+
+            def _subscribe(self, name, auth, body):
+                """Hold the stream open until released, then send the task's completion"""
+                task_id = body["params"]["id"]
+                with agents.lock:
+                    key = (task_id, auth)
+                    agents.subscriptions[key] = agents.subscriptions.get(key, 0) + 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self.wfile.flush()
+                agents.release.wait(10)
+                event = json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": {
+                    "kind": "status-update", "taskId": task_id, "final": True,
+                    "status": {"state": "completed", "message": {
+                        "kind": "message", "role": "agent", "messageId": f"{task_id}-done",
+                        "parts": [{"kind": "text", "text": f"{name}|{auth}|{task_id}"}]
+                    }}
+                }})
+                payload = f"data: {event}\n\n".encode()
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n0\r\n\r\n")
+                self.wfile.flush()
+
+        self.server = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/agents/{name}"
+
+    def handle(self, name, auth, body):
+        method = body["method"]
+        params = body["params"]
+
+        if method == "tasks/get":
+            task_id = params["id"]
+            if task_id.startswith(SUBSCRIBED_TASK_PREFIX):
+                return 200, json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": {
+                    "kind": "task", "id": task_id, "status": {"state": "working"}
+                }}), "application/json"
+            return 200, json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": {
+                "kind": "task",
+                "id": task_id,
+                "status": {"state": "completed", "message": {
+                    "kind": "message", "role": "agent", "messageId": f"{task_id}-status",
+                    "parts": [{"kind": "text", "text": f"{name}|{auth}|{task_id}"}]
+                }},
+                "artifacts": [{"artifactId": "a1", "parts": [{"kind": "text", "text": f"{name}|{auth}|{task_id}"}]}]
+            }}), "application/json"
+
+        if method == "tasks/cancel":
+            task_id = params["id"]
+            with self.lock:
+                owner = self.owners.get(task_id)
+            if owner != auth:
+                return 200, json.dumps({"jsonrpc": "2.0", "id": body["id"], "error": {
+                    "code": -32001, "message": f"Task not found: {task_id}"
+                }}), "application/json"
+            return 200, json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": {
+                "kind": "task", "id": task_id, "status": {"state": "canceled"}
+            }}), "application/json"
+
+        text = params["message"]["parts"][0].get("text", "")
+        task = {"kind": "task", "id": f"{name}:{text}", "status": {"state": "submitted"}}
+        with self.lock:
+            self.owners[task["id"]] = auth
+
+        if method == "message/stream":
+            event = json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": task})
+            return 200, f"data: {event}\n\n", "text/event-stream"
+
+        if params.get("configuration", {}).get("blocking") is False:
+            return 200, json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": task}), "application/json"
+
+        return 200, json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": {
+            "kind": "message", "role": "agent", "messageId": f"{name}-reply",
+            "parts": [{"kind": "text", "text": f"{name}|{auth}|{text}"}]
+        }}), "application/json"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def credentials_for(agents, keys, order):
+    """
+    Build provider credentials for the given agent order and API keys.
+    """
+    credentials = {}
+    for i, name in enumerate(order, start=1):
+        credentials[f"agent_{i}_name"] = name
+        credentials[f"agent_{i}_url"] = agents.url(name)
+        credentials[f"agent_{i}_auth_type"] = "bearer"
+        credentials[f"agent_{i}_api_key"] = keys[name]
+        credentials[f"agent_{i}_description"] = f"{name} agent"
+        if name == "gamma":
+            credentials[f"agent_{i}_max_concurrency"] = str(GAMMA_MAX_CONCURRENCY)
+    return credentials
+
+
+def invoke(tool_class, credentials, parameters):
+    runtime = MagicMock()
+    runtime.credentials = credentials
+    return [message.text for message in tool_class(runtime)._invoke(parameters)]
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+class TestConcurrencyStress(unittest.TestCase):
+    """Hundreds of concurrent tool invocations against local stand-in agents"""
+
+    AGENTS = ("alpha", "beta", "gamma", "broken")
+
+    @classmethod
+    def setUpClass(cls):
+        # Never route loopback traffic through a proxy configured in the environment
+        cls.env = patch.dict(os.environ, {"NO_PROXY": "127.0.0.1", "A2A_PERSISTENT_CACHE": ""})
+        cls.env.start()
+        cls.agents = StandInAgents(cls.AGENTS, failing=("broken",)).__enter__()
+
+        # Two credential sets: rotated keys and a different slot order
+        cls.credential_sets = [
+            credentials_for(cls.agents, {n: f"{n}-key-1" for n in cls.AGENTS}, cls.AGENTS),
+            credentials_for(cls.agents, {n: f"{n}-key-2" for n in cls.AGENTS}, tuple(reversed(cls.AGENTS)))
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.agents.__exit__(None, None, None)
+        cls.env.stop()
+
+    def setUp(self):
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        subscription_manager.clear()
+        self.addCleanup(subscription_manager.clear)
+
+    def tearDown(self):
+        # Every memory reservation must have been released, whatever the outcome
+        snapshot = get_accountant().snapshot()
+        self.assertEqual(snapshot["in_flight_requests"], 0)
+        self.assertEqual(snapshot["in_flight_bytes"], 0)
+
+    def _run_concurrently(self, jobs, threads=STRESS_THREADS):
+        """
+        Run (callable, check) pairs on a thread pool; returns failure descriptions.
+        """
+        def run(job):
+            call, check = job
+            try:
+                check(call())
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+            return None
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return [failure for failure in executor.map(run, jobs) if failure]
+
+    def _job(self, rng, n):
+        """
+        Build one random invocation of a random tool, paired with a check of its output.
+        """
+        credentials = rng.choice(self.credential_sets)
+        agent = rng.choice(self.AGENTS)
+        auth = f"Bearer {credentials[self._slot(credentials, agent) + '_api_key']}"
+        token = f"req{n}"
+        tool = rng.choice(["list", "capabilities", "call", "submit", "status", "pipeline"])
+
+        def expect_failure(output):
+            self.assertEqual(len(output), 1)
+            self.assertTrue(
+                output[0].startswith(("Network Error:", "Error:", "Pipeline failed")), output[0]
+            )
+
+        if tool == "list":
+            def check(output):
+                listed = {a["name"]: a for a in json.loads(output[0])}
+                self.assertEqual(set(listed), set(self.AGENTS))
+                self.assertEqual(listed[agent]["base_url"], self.agents.url(agent))
+            return (lambda: invoke(ListAgentsTool, credentials, {})), check
+
+        if tool == "capabilities":
+            def check(output):
+                if agent == "broken":
+                    self.assertTrue(output[0].startswith("Failed to fetch Agent Card"), output[0])
+                    return
+                self.assertEqual(json.loads(output[0])["name"], agent)
+            return (lambda: invoke(GetAgentCapabilitiesTool, credentials, {"agent_name": agent})), check
+
+        if tool == "call":
+            def check(output):
+                if agent == "broken":
+                    return expect_failure(output)
+                message = json.loads(output[0])
+                self.assertEqual(message["parts"][0]["text"], f"{agent}|{auth}|{token}")
+            return (lambda: invoke(CallAgentTool, credentials, {"agent_name": agent, "instruction": token})), check
+
+        if tool == "submit":
+            def check(output):
+                if agent == "broken":
+                    return expect_failure(output)
+                self.assertEqual(output, [f"{agent}:{token}"])
+            return (lambda: invoke(SubmitTaskTool, credentials, {"agent_name": agent, "instruction": token})), check
+
+        if tool == "status":
+            task_id = f"{agent}:{token}"
+            mode = rng.choice(["full", "status-only", "delta"])
+
+            def check(output):
+                if agent == "broken":
+                    return expect_failure(output)
+                view = json.loads(output[0])
+                self.assertEqual(view["id"], task_id)
+                if mode != "delta":
+                    status = view["status"]
+                    text = status["message"] if mode == "status-only" else status["message"]["parts"][0]["text"]
+                    self.assertEqual(text, f"{agent}|{auth}|{task_id}")
+            return (lambda: invoke(GetTaskStatusTool, credentials, {
+                "agent_name": agent, "task_id": task_id, "output_mode": mode
+            })), check
+
+        other = rng.choice([a for a in self.AGENTS if a not in (agent, "broken")])
+        other_auth = f"Bearer {credentials[self._slot(credentials, other) + '_api_key']}"
+
+        def check(output):
+            if agent == "broken":
+                return expect_failure(output)
+            result = json.loads(output[0])
+            self.assertEqual(
+                result["output"], f"{other}|{other_auth}|{agent}|{auth}|{token}"
+            )
+        steps = json.dumps([{"agent": agent, "prompt": "{input}"}, {"agent": other}])
+        return (lambda: invoke(RunPipelineTool, credentials, {"steps": steps, "input": token})), check
+
+    @staticmethod
+    def _slot(credentials, agent):
+        for key, value in credentials.items():
+            if key.endswith("_name") and value == agent:
+                return key[:-len("_name")]
+        raise KeyError(agent)
+
+    def _auth(self, credentials, agent):
+        return f"Bearer {credentials[self._slot(credentials, agent) + '_api_key']}"
+
+    def test_mixed_tools_concurrently(self):
+        """Test every tool under concurrent load with rotating credentials and a failing agent"""
+        rng = random.Random(1234)
+        jobs = [self._job(rng, n) for n in range(STRESS_INVOCATIONS * 6)]
+
+        failures = self._run_concurrently(jobs)
+
+        self.assertEqual(failures, [], f"{len(failures)} of {len(jobs)} invocations failed: {failures[:5]}")
+        self.assertLessEqual(self.agents.max_active["gamma"], GAMMA_MAX_CONCURRENCY)
+
+    def test_card_cache_races_with_submit(self):
+        """Test submit_task switching between streaming and non-blocking while cards are fetched and evicted"""
+        credentials = self.credential_sets[0]
+
+        def submit(n):
+            if n % 10 == 0:
+                agent_cards.clear_card_cache()
+            if n % 3 == 0:
+                invoke(GetAgentCapabilitiesTool, credentials, {"agent_name": "alpha"})
+            return invoke(SubmitTaskTool, credentials, {"agent_name": "alpha", "instruction": f"t{n}"})
+
+        jobs = [
+            (lambda n=n: submit(n), lambda output, n=n: self.assertEqual(output, [f"alpha:t{n}"]))
+            for n in range(STRESS_INVOCATIONS)
+        ]
+        self.assertEqual(self._run_concurrently(jobs), [])
+
+    def test_cancel_is_scoped_to_credential(self):
+        """Test concurrent cancels only reach tasks owned by the caller's credential"""
+        owner, other = self.credential_sets
+
+        def run(n):
+            task_id = invoke(SubmitTaskTool, owner, {"agent_name": "alpha", "instruction": f"c{n}"})[0]
+            foreign = invoke(CancelTaskTool, other, {"agent_name": "alpha", "task_ids": task_id})
+            own = invoke(CancelTaskTool, owner, {
+                "agent_name": "alpha", "task_ids": json.dumps([task_id, f"alpha:missing{n}"])
+            })
+            return task_id, foreign, own
+
+        def check(output):
+            task_id, foreign, own = output
+            self.assertTrue(foreign[0].startswith("A2A Error:"), foreign[0])
+            self.assertIn("Task not found", foreign[0])
+            result = json.loads(own[0])
+            self.assertEqual((result["canceled"], result["failed"]), (1, 1))
+            self.assertEqual(result["results"][0], {"taskId": task_id, "state": "canceled"})
+
+        jobs = [(lambda n=n: run(n), check) for n in range(STRESS_INVOCATIONS // 2)]
+        self.assertEqual(self._run_concurrently(jobs), [])
+
+    def test_artifacts_are_scoped_to_credential(self):
+        """Test both credentials reading the same artifacts concurrently each see their own copy"""
+        def read(credentials, n):
+            task_id = f"alpha:shared{n % 5}"
+            return invoke(GetArtifactTool, credentials, {
+                "agent_name": "alpha", "task_id": task_id, "artifact_id": "a1"
+            })
+
+        def check(credentials, n):
+            def check_output(output):
+                self.assertEqual(
+                    json.loads(output[0])["content"], f"alpha|{self._auth(credentials, 'alpha')}|alpha:shared{n % 5}"
+                )
+            return check_output
+
+        jobs = [
+            (lambda c=credentials, n=n: read(c, n), check(credentials, n))
+            for n in range(STRESS_INVOCATIONS)
+            for credentials in self.credential_sets
+        ]
+        self.assertEqual(self._run_concurrently(jobs), [])
+
+    def test_job_handles_are_scoped_to_credential(self):
+        """Test queued job handles only resolve, and can only be cancelled, with the credential that queued them"""
+        patcher = patch.object(job_queue, "_scheduler", JobScheduler())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        owner, other = self.credential_sets
+        owner_auth, other_auth = self._auth(owner, "alpha"), self._auth(other, "alpha")
+
+        def run(n):
+            job_id = invoke(SubmitTaskTool, owner, {
+                "agent_name": "alpha", "instruction": f"j{n}", "dispatch": "queued"
+            })[0]
+            foreign_status = json.loads(invoke(GetTaskStatusTool, other, {"agent_name": "alpha", "task_id": job_id})[0])
+            foreign_cancel = invoke(CancelTaskTool, other, {"agent_name": "alpha", "task_ids": job_id})[0]
+            job = job_queue.get_scheduler().find(job_id, self.agents.url("alpha"), owner_auth)
+            wait_for(lambda: job.state not in ("queued", "dispatching"))
+            own_status = json.loads(invoke(GetTaskStatusTool, owner, {"agent_name": "alpha", "task_id": job_id})[0])
+            return n, job_id, foreign_status, foreign_cancel, own_status
+
+        def check(output):
+            n, job_id, foreign_status, foreign_cancel, own_status = output
+            self.assertTrue(job_id.startswith(JOB_ID_PREFIX), job_id)
+            # To another credential the handle is just an agent task ID
+            self.assertEqual(foreign_status["status"]["message"]["parts"][0]["text"], f"alpha|{other_auth}|{job_id}")
+            self.assertTrue(foreign_cancel.startswith("A2A Error:"), foreign_cancel)
+            self.assertEqual(own_status["id"], f"alpha:j{n}")
+            self.assertEqual(own_status["status"]["message"]["parts"][0]["text"], f"alpha|{owner_auth}|alpha:j{n}")
+
+        jobs = [(lambda n=n: run(n), check) for n in range(STRESS_INVOCATIONS // 2)]
+        self.assertEqual(self._run_concurrently(jobs), [])
+
+    def test_shared_subscriptions_across_credentials(self):
+        """Test concurrent waiters share one stream per credential and only see their own credential's updates"""
+        self.agents.release.clear()
+        self.addCleanup(self.agents.release.set)
+        for credentials in self.credential_sets:
+            invoke(GetAgentCapabilitiesTool, credentials, {"agent_name": "alpha"})
+        task_id = f"{SUBSCRIBED_TASK_PREFIX}shared"
+        waiters_per_credential = 24
+
+        def joined():
+            with subscription_manager._lock:
+                return sum(len(s.waiters) for s in subscription_manager._subscriptions.values())
+
+        with ThreadPoolExecutor(max_workers=waiters_per_credential * 2) as executor:
+            futures = [
+                (self._auth(credentials, "alpha"), executor.submit(invoke, GetTaskStatusTool, credentials, {
+                    "agent_name": "alpha", "task_id": task_id, "wait_seconds": "10"
+                }))
+                for _ in range(waiters_per_credential)
+                for credentials in self.credential_sets
+            ]
+            wait_for(lambda: joined() == len(futures))
+            self.assertEqual(subscription_manager.active(), 2)
+            self.agents.release.set()
+
+            for auth, future in futures:
+                status = json.loads(future.result(timeout=10)[0])["status"]
+                self.assertEqual(status["state"], "completed")
+                self.assertEqual(status["message"]["parts"][0]["text"], f"alpha|{auth}|{task_id}")
+
+        self.assertEqual(self.agents.subscriptions, {
+            (task_id, self._auth(credentials, "alpha")): 1 for credentials in self.credential_sets
+        })
+        wait_for(lambda: subscription_manager.active() == 0)
+        # The streams' memory reservations are released by their reader threads
+        wait_for(lambda: get_accountant().snapshot()["in_flight_requests"] == 0)
+
+    def test_throughput_scales_with_threads(self):
+        """Test concurrent call_agent invocations overlap instead of serializing on shared state"""
+        credentials = self.credential_sets[0]
+        calls = 48
+        throughput = {}
+        # Slower agent so that network wait, not the test's own CPU use, dominates
+        self.agents.latency = 0.02
+        self.addCleanup(setattr, self.agents, "latency", AGENT_LATENCY_SECONDS)
+
+        for threads in (1, 4, 16):
+            jobs = [
+                (lambda n=n: invoke(CallAgentTool, credentials, {"agent_name": "beta", "instruction": f"x{n}"}),
+                 lambda output: self.assertIn("beta|", output[0]))
+                for n in range(calls)
+            ]
+            start = time.perf_counter()
+            self.assertEqual(self._run_concurrently(jobs, threads=threads), [])
+            throughput[threads] = calls / (time.perf_counter() - start)
+
+        self.assertGreater(throughput[4], throughput[1] * 2, throughput)
+        self.assertGreater(throughput[16], throughput[4], throughput)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import base64
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.file_parts import (
+    UPLOAD_CHUNK_BYTES,
+    agent_can_fetch,
+    build_file_parts,
+    request_payload
+)
+
+
+class DifyFile:
+    """Stand-in for dify_plugin.file.file.File"""
+
+    def __init__(self, url, filename="report.pdf", mime_type="application/pdf", blob=b""):
+        self.url = url
+        self.filename = filename
+        self.mime_type = mime_type
+        self.blob = blob
+
+
+def streamed_response(content, sizes):
+    """A streaming response whose iter_content yields content in the given chunk sizes"""
+    response = MagicMock()
+    response.raise_for_status.return_value = None
+    chunks, start = [], 0
+    for size in sizes:
+        chunks.append(content[start:start + size])
+        start += size
+    chunks.append(content[start:])
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+class TestFileParts(unittest.TestCase):
+    """Test cases for turning Dify files into A2A FileParts"""
+
+    def test_agent_can_fetch(self):
+        """Test only publicly reachable URLs are sent by URI in auto mode"""
+        self.assertTrue(agent_can_fetch("https://files.example.com/f/1?sign=x"))
+        self.assertTrue(agent_can_fetch("https://8.8.8.8/f/1"))
+        self.assertFalse(agent_can_fetch("http://api:5001/files/1"))
+        self.assertFalse(agent_can_fetch("http://localhost/files/1"))
+        self.assertFalse(agent_can_fetch("http://10.0.0.5/files/1"))
+        self.assertFalse(agent_can_fetch("http://127.0.0.1:5001/files/1"))
+        self.assertFalse(agent_can_fetch("/files/1"))
+        self.assertFalse(agent_can_fetch(None))
+
+    def test_build_parts_by_mode(self):
+        """Test auto picks URI for public files and inline bytes for internal ones"""
+        public = DifyFile("https://files.example.com/a.pdf", filename="a.pdf")
+        internal = DifyFile("http://api:5001/files/b.txt", filename="b.txt", mime_type="text/plain")
+
+        parts, inline = build_file_parts([public, internal], "auto")
+        self.assertEqual(parts[0], {"kind": "file", "file": {
+            "name": "a.pdf", "mimeType": "application/pdf", "uri": "https://files.example.com/a.pdf"
+        }})
+        self.assertEqual(parts[1]["file"]["bytes"], inline[0].placeholder)
+        self.assertEqual(len(inline), 1)
+
+        parts, inline = build_file_parts(internal, "uri")
+        self.assertEqual(parts[0]["file"]["uri"], "http://api:5001/files/b.txt")
+        self.assertEqual(inline, [])
+
+        parts, inline = build_file_parts([public], "bytes")
+        self.assertEqual(len(inline), 1)
+        self.assertEqual(build_file_parts(None, "auto"), ([], []))
+
+    def test_text_only_request_stays_json(self):
+        """Test requests without inline files are still sent with json="""
+        rpc_request = {"jsonrpc": "2.0", "method": "message/send", "params": {}, "id": "1"}
+        self.assertEqual(request_payload(rpc_request, []), {"json": rpc_request})
+
+    @patch('requests.Session.get')
+    def test_streamed_body_is_valid_json(self, mock_get):
+        """Test inline files are streamed chunk by chunk into a valid JSON-RPC body"""
+        content = os.urandom(3 * UPLOAD_CHUNK_BYTES + 1001)
+        mock_get.return_value = streamed_response(content, [1, 5000, UPLOAD_CHUNK_BYTES, UPLOAD_CHUNK_BYTES, 7])
+        files = [
+            DifyFile("http://api:5001/files/big.bin", filename="big.bin"),
+            DifyFile("", filename="small.txt", mime_type="text/plain", blob=b"hello")
+        ]
+
+        parts, inline = build_file_parts(files, "auto")
+        rpc_request = {"jsonrpc": "2.0", "method": "message/send", "id": "1", "params": {
+            "message": {"kind": "message", "role": "user", "messageId": "m",
+                        "parts": [{"kind": "text", "text": "Summarize"}] + parts}
+        }}
+        pieces = list(request_payload(rpc_request, inline)["data"])
+
+        body = json.loads(b"".join(pieces))
+        sent = body["params"]["message"]["parts"]
+        self.assertEqual(sent[0]["text"], "Summarize")
+        self.assertEqual(base64.b64decode(sent[1]["file"]["bytes"]), content)
+        self.assertEqual(sent[1]["file"]["name"], "big.bin")
+        self.assertEqual(base64.b64decode(sent[2]["file"]["bytes"]), b"hello")
+
+        # No piece holds much more than one encoded chunk of the file
+        self.assertLess(max(len(piece) for piece in pieces), UPLOAD_CHUNK_BYTES * 2)
+        self.assertEqual(mock_get.call_args.kwargs['stream'], True)
+
+    @patch('requests.Session.get')
+    def test_streamed_body_can_be_rebuilt(self, mock_get):
+        """Test each call to request_payload reads the file again (needed for retries)"""
+        mock_get.side_effect = lambda *args, **kwargs: streamed_response(b"abc" * 10, [4])
+        parts, inline = build_file_parts([DifyFile("http://api:5001/f")], "bytes")
+        rpc_request = {"params": {"parts": parts}}
+
+        first = b"".join(request_payload(rpc_request, inline)["data"])
+        second = b"".join(request_payload(rpc_request, inline)["data"])
+        self.assertEqual(first, second)
+        self.assertEqual(mock_get.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
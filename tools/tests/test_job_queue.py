@@ -0,0 +1,328 @@
+import unittest
+import json
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import agent_cards, job_queue
+from tools.cancel_task import CancelTaskTool
+from tools.get_task_status import GetTaskStatusTool
+from tools.job_queue import JOB_ID_PREFIX, JobScheduler, QueueFullError, workers_for
+from tools.rate_limit import reset_limiters
+from tools.submit_task import SubmitTaskTool
+
+AGENT_URL = "https://queue.example.com"
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+class TestJobScheduler(unittest.TestCase):
+    """Test the priority job queue in front of submit_task"""
+
+    def setUp(self):
+        self.scheduler = JobScheduler()
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+        self.order = []
+
+    def blocker(self):
+        """A job that holds its worker until the gate opens"""
+        def submit():
+            self.gate.wait(5)
+            return "task-blocker", None
+        return self.scheduler.enqueue(AGENT_URL, "Bearer k", submit, workers=1)
+
+    def recorder(self, name, priority="normal", deadline_seconds=None):
+        def submit():
+            self.order.append(name)
+            return f"task-{name}", None
+        return self.scheduler.enqueue(
+            AGENT_URL, "Bearer k", submit, priority=priority, deadline_seconds=deadline_seconds, workers=1
+        )
+
+    def test_priority_then_deadline_then_arrival(self):
+        """Test interactive jobs overtake queued batch jobs"""
+        blocker = self.blocker()
+        wait_for(lambda: blocker.state == "dispatching")
+        jobs = [
+            self.recorder("batch", "batch"),
+            self.recorder("normal-late", "normal", 300),
+            self.recorder("normal-first"),
+            self.recorder("normal-soon", "normal", 60),
+            self.recorder("interactive", "interactive")
+        ]
+        self.assertEqual(self.scheduler.snapshot()["agents"][AGENT_URL]["queued"], {
+            "interactive": 1, "normal": 3, "batch": 1
+        })
+
+        self.gate.set()
+        wait_for(lambda: all(job.state == "submitted" for job in jobs))
+        self.assertEqual(self.order, ["interactive", "normal-soon", "normal-late", "normal-first", "batch"])
+        self.assertEqual(jobs[0].task_id, "task-batch")
+
+    def test_expired_jobs_are_never_sent(self):
+        """Test a job still queued past its deadline expires"""
+        blocker = self.blocker()
+        wait_for(lambda: blocker.state == "dispatching")
+        job = self.recorder("late", deadline_seconds=0.05)
+        time.sleep(0.1)
+        self.gate.set()
+
+        wait_for(lambda: job.state == "expired")
+        self.assertEqual(self.order, [])
+        self.assertEqual(job.view()["status"]["state"], "expired")
+        self.assertEqual(self.scheduler.snapshot()["expired"], 1)
+
+    def test_workers_are_bounded(self):
+        """Test no more than the agent's workers submit at once"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def submit():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+            return "task", None
+
+        jobs = [self.scheduler.enqueue(AGENT_URL, "Bearer k", submit, workers=3) for _ in range(12)]
+        wait_for(lambda: all(job.state == "submitted" for job in jobs))
+        self.assertLessEqual(max(peak), 3)
+        self.assertGreater(max(peak), 1)
+
+        snapshot = self.scheduler.snapshot()
+        self.assertEqual(snapshot["submitted"], 12)
+        self.assertEqual(snapshot["agents"][AGENT_URL]["workers"], 3)
+        self.assertGreaterEqual(snapshot["waitMs"]["max"], snapshot["waitMs"]["p50"])
+
+    def test_failures_and_cancel(self):
+        """Test failed submissions keep their error and only queued jobs can be cancelled"""
+        failed = self.scheduler.enqueue(AGENT_URL, "Bearer k", lambda: (None, "Network Error: down"), workers=1)
+        wait_for(lambda: failed.state == "failed")
+        self.assertEqual(failed.view()["status"]["message"], "Network Error: down")
+        self.assertFalse(self.scheduler.cancel(failed))
+
+        blocker = self.blocker()
+        wait_for(lambda: blocker.state == "dispatching")
+        queued = self.recorder("queued")
+        self.assertTrue(self.scheduler.cancel(queued))
+        self.gate.set()
+        wait_for(lambda: blocker.state == "submitted")
+        self.assertEqual(queued.state, "canceled")
+        self.assertEqual(self.order, [])
+
+    def test_queue_full(self):
+        """Test submissions beyond MAX_QUEUED_JOBS are refused"""
+        blocker = self.blocker()
+        wait_for(lambda: blocker.state == "dispatching")
+        with patch.object(job_queue, "MAX_QUEUED_JOBS", 2):
+            self.recorder("a")
+            self.recorder("b")
+            with self.assertRaises(QueueFullError):
+                self.recorder("c")
+        self.assertEqual(self.scheduler.snapshot()["rejected"], 1)
+
+    def test_canceled_jobs_free_queue_space(self):
+        """Test a canceled job no longer counts toward MAX_QUEUED_JOBS"""
+        blocker = self.blocker()
+        wait_for(lambda: blocker.state == "dispatching")
+        with patch.object(job_queue, "MAX_QUEUED_JOBS", 2):
+            first = self.recorder("a")
+            self.recorder("b")
+            self.assertTrue(self.scheduler.cancel(first))
+            self.recorder("c")
+        self.assertEqual(self.scheduler.snapshot()["rejected"], 0)
+
+    def test_expired_jobs_leave_the_queue_before_dispatch(self):
+        """Test an overdue job reports expired on lookup and stops counting toward MAX_QUEUED_JOBS"""
+        blocker = self.blocker()
+        wait_for(lambda: blocker.state == "dispatching")
+        with patch.object(job_queue, "MAX_QUEUED_JOBS", 2):
+            late = self.recorder("late", deadline_seconds=0.05)
+            other = self.recorder("other", deadline_seconds=0.05)
+            time.sleep(0.1)
+            self.assertEqual(self.scheduler.find(late.id, AGENT_URL, "Bearer k").state, "expired")
+            self.recorder("a")
+            self.recorder("b")
+        self.assertEqual(other.state, "expired")
+        self.assertEqual(self.scheduler.snapshot()["rejected"], 0)
+        self.assertEqual(self.scheduler.snapshot()["expired"], 2)
+
+    def test_worker_limits_are_kept_per_configuration(self):
+        """Test two worker limits for one agent do not overwrite each other"""
+        running = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0}
+        lock = threading.Lock()
+
+        def submit(name):
+            with lock:
+                running[name] += 1
+                peak[name] = max(peak[name], running[name])
+            time.sleep(0.02)
+            with lock:
+                running[name] -= 1
+            return "task", None
+
+        jobs = []
+        for _ in range(8):
+            jobs.append(self.scheduler.enqueue(AGENT_URL, "Bearer a", lambda: submit("a"), workers=1))
+            jobs.append(self.scheduler.enqueue(AGENT_URL, "Bearer b", lambda: submit("b"), workers=4))
+        wait_for(lambda: all(job.state == "submitted" for job in jobs))
+
+        self.assertEqual(peak["a"], 1)
+        self.assertGreater(peak["b"], 1)
+        self.assertEqual(self.scheduler.snapshot()["agents"][AGENT_URL]["workers"], 5)
+
+    def test_jobs_are_scoped(self):
+        """Test a job handle only resolves for the agent and credential that queued it"""
+        job = self.recorder("scoped")
+        self.assertTrue(job.id.startswith(JOB_ID_PREFIX))
+        self.assertIs(self.scheduler.find(job.id, AGENT_URL, "Bearer k"), job)
+        self.assertIsNone(self.scheduler.find(job.id, AGENT_URL, "Bearer other"))
+        self.assertIsNone(self.scheduler.find(job.id, "https://other.example.com", "Bearer k"))
+
+    def test_workers_for(self):
+        """Test one concurrency slot is left for interactive calls"""
+        self.assertEqual(workers_for(""), job_queue.DEFAULT_AGENT_WORKERS)
+        self.assertEqual(workers_for("1"), 1)
+        self.assertEqual(workers_for("5"), 4)
+
+
+class TestQueuedSubmitTask(unittest.TestCase):
+    """Test submit_task's queued dispatch and job handles in the other tools"""
+
+    def setUp(self):
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "queue_agent",
+            "agent_1_url": AGENT_URL,
+            "agent_1_auth_type": "bearer",
+            "agent_1_api_key": "queue-key",
+            "agent_1_max_concurrency": "2"
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        agent_cards.store_card(AGENT_URL, {"protocolVersion": "0.3.0", "capabilities": {}})
+        self.addCleanup(agent_cards.clear_card_cache)
+        patcher = patch.object(job_queue, "_scheduler", JobScheduler())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def invoke(self, tool_class, parameters):
+        return [m.text for m in tool_class(self.mock_runtime)._invoke({"agent_name": "queue_agent", **parameters})]
+
+    @patch('requests.Session.post')
+    def test_queued_job_resolves_to_agent_task(self, mock_post):
+        """Test a queued submission returns a handle that get_task_status follows to the task"""
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+
+        def reply(url, **kwargs):
+            response = MagicMock()
+            if kwargs['json']['method'] == "message/send":
+                gate.wait(5)
+                response.json.return_value = {
+                    "jsonrpc": "2.0", "result": {"kind": "task", "id": "task-q-1", "status": {"state": "submitted"}}, "id": "1"
+                }
+            else:
+                response.json.return_value = {
+                    "jsonrpc": "2.0", "result": {"kind": "task", "id": "task-q-1", "status": {"state": "working"}}, "id": "2"
+                }
+            return response
+        mock_post.side_effect = reply
+
+        job_id = self.invoke(SubmitTaskTool, {
+            "instruction": "Bulk job", "dispatch": "queued", "priority": "batch"
+        })[0]
+        self.assertTrue(job_id.startswith(JOB_ID_PREFIX))
+
+        status = json.loads(self.invoke(GetTaskStatusTool, {"task_id": job_id})[0])
+        self.assertEqual(status["kind"], "job")
+        self.assertEqual(status["priority"], "batch")
+        self.assertIn(status["status"]["state"], ("queued", "dispatching"))
+
+        gate.set()
+        job = job_queue.get_scheduler().find(job_id, AGENT_URL, "Bearer queue-key")
+        wait_for(lambda: job.state == "submitted")
+
+        status = json.loads(self.invoke(GetTaskStatusTool, {"task_id": job_id})[0])
+        self.assertEqual(status["status"]["state"], "working")
+        self.assertEqual(mock_post.call_args.kwargs['json']['params']['id'], "task-q-1")
+
+    @patch('requests.Session.post')
+    def test_cancel_queued_job_without_agent_call(self, mock_post):
+        """Test cancelling a job still in the queue never reaches the agent"""
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        scheduler = job_queue.get_scheduler()
+        blocker = scheduler.enqueue(AGENT_URL, "Bearer queue-key", lambda: (gate.wait(5), (None, "Error: blocked"))[1], workers=1)
+        wait_for(lambda: blocker.state == "dispatching")
+
+        job_id = self.invoke(SubmitTaskTool, {"instruction": "Later", "dispatch": "queued"})[0]
+        result = json.loads(self.invoke(CancelTaskTool, {"task_ids": job_id})[0])
+
+        self.assertEqual(result["results"], [{"taskId": job_id, "state": "canceled"}])
+        mock_post.assert_not_called()
+
+    @patch('requests.Session.post')
+    def test_agent_task_ids_that_look_like_jobs(self, mock_post):
+        """Test an agent task ID starting with the job prefix still reaches the agent"""
+        response = MagicMock()
+        response.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": "job-7", "status": {"state": "working"}}, "id": "1"
+        }
+        mock_post.return_value = response
+
+        status = json.loads(self.invoke(GetTaskStatusTool, {"task_id": "job-7", "output_mode": "status-only"})[0])
+        self.assertEqual(status["status"]["state"], "working")
+        self.assertEqual(mock_post.call_args.kwargs['json']['params']['id'], "job-7")
+
+    def test_invalid_queue_parameters(self):
+        """Test unknown dispatch modes, priorities and deadlines are rejected"""
+        for parameters, message in (
+            ({"dispatch": "later"}, "Invalid dispatch"),
+            ({"priority": "urgent"}, "Invalid priority"),
+            ({"deadline_seconds": "-5"}, "Invalid deadline_seconds"),
+            ({"deadline_seconds": "soon"}, "Invalid deadline_seconds")
+        ):
+            result = self.invoke(SubmitTaskTool, {"instruction": "x", **parameters})[0]
+            self.assertIn(message, result)
+
+
+if __name__ == "__main__":
+    unittest.main()
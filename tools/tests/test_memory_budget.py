@@ -0,0 +1,174 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import agent_cards
+from tools.memory_budget import (
+    LARGE_RESERVATION_BYTES,
+    RESPONSE_MEMORY_FACTOR,
+    RESPONSE_RESERVATION_BYTES,
+    MemoryAccountant,
+    MemoryBudgetExceededError
+)
+from tools.sse import parse_sse_chunks
+from tools.task_views import TaskDeltaTracker
+
+MIB = 1024 * 1024
+
+
+class FakeCache:
+    """In-memory cache stand-in reporting a fixed size until evicted"""
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def usage(self):
+        return self.nbytes
+
+    def evict(self, nbytes):
+        freed = min(self.nbytes, nbytes)
+        self.nbytes -= freed
+        return freed
+
+
+class FakeResponse:
+    def __init__(self, size):
+        self.content = b"x" * size
+
+
+class TestMemoryAccountant(unittest.TestCase):
+    """Test cases for memory accounting and admission control"""
+
+    def test_reservations_tracked_and_released(self):
+        """Test in-flight bytes and peak usage are reported through snapshot()"""
+        accountant = MemoryAccountant(budget_bytes=8 * MIB)
+
+        with accountant.reserve(MIB) as reservation:
+            reservation.resize(2 * MIB)
+            snapshot = accountant.snapshot()
+            self.assertEqual(snapshot["in_flight_bytes"], 2 * MIB)
+            self.assertEqual(snapshot["in_flight_requests"], 1)
+
+        snapshot = accountant.snapshot()
+        self.assertEqual(snapshot["in_flight_bytes"], 0)
+        self.assertEqual(snapshot["in_flight_requests"], 0)
+        self.assertEqual(snapshot["peak_bytes"], 2 * MIB)
+
+    def test_caches_evicted_above_soft_watermark(self):
+        """Test caches are evicted before a request is held back"""
+        accountant = MemoryAccountant(budget_bytes=8 * MIB)
+        cache = FakeCache(5 * MIB)
+        accountant.register_cache("fake", cache.usage, cache.evict)
+
+        with accountant.reserve(2 * MIB):
+            self.assertLessEqual(accountant.snapshot()["used_bytes"], accountant.soft_watermark_bytes)
+
+        self.assertEqual(cache.nbytes, 4 * MIB)
+        self.assertEqual(accountant.snapshot()["evicted_bytes"], MIB)
+
+    def test_large_request_queues_until_memory_frees(self):
+        """Test a large request waits above the soft watermark and proceeds after a release"""
+        accountant = MemoryAccountant(budget_bytes=8 * MIB)
+        held = accountant.reserve(5 * MIB)
+        admitted = threading.Event()
+
+        def large_request():
+            with accountant.reserve(2 * MIB, timeout=5):
+                admitted.set()
+
+        thread = threading.Thread(target=large_request)
+        thread.start()
+        time.sleep(0.1)
+        self.assertFalse(admitted.is_set())
+        self.assertEqual(accountant.snapshot()["queued_requests"], 1)
+
+        held.release()
+        thread.join(timeout=5)
+        self.assertTrue(admitted.is_set())
+
+    def test_large_request_rejected_small_admitted(self):
+        """Test large requests are rejected after the timeout while small ones still fit"""
+        accountant = MemoryAccountant(budget_bytes=8 * MIB)
+        with accountant.reserve(5 * MIB + MIB // 2):
+            with self.assertRaises(MemoryBudgetExceededError):
+                accountant.reserve(LARGE_RESERVATION_BYTES, timeout=0.05)
+            with accountant.reserve(RESPONSE_RESERVATION_BYTES, timeout=0.05):
+                pass
+
+        self.assertEqual(accountant.snapshot()["rejected_requests"], 1)
+        with self.assertRaises(MemoryBudgetExceededError):
+            accountant.reserve(9 * MIB)
+
+    def test_resize_beyond_budget_keeps_reservation(self):
+        """Test a response that outgrows the budget raises and leaves accounting intact"""
+        accountant = MemoryAccountant(budget_bytes=8 * MIB)
+        with accountant.reserve(MIB) as reservation:
+            with self.assertRaises(MemoryBudgetExceededError):
+                reservation.resize(9 * MIB)
+            self.assertEqual(reservation.nbytes, MIB)
+            self.assertEqual(accountant.snapshot()["in_flight_bytes"], MIB)
+
+        reservation.release()  # second release is a no-op
+        self.assertEqual(accountant.snapshot()["in_flight_bytes"], 0)
+
+    def test_response_size_sets_next_reservation(self):
+        """Test an agent's last response size sizes the next reservation for it"""
+        accountant = MemoryAccountant(budget_bytes=64 * MIB)
+        key = "https://big.example.com"
+        self.assertEqual(accountant.expected_response_bytes(key), RESPONSE_RESERVATION_BYTES)
+
+        with accountant.reserve_response(key) as reservation:
+            reservation.charge_response(FakeResponse(MIB))
+            self.assertEqual(reservation.nbytes, MIB * RESPONSE_MEMORY_FACTOR)
+
+        self.assertEqual(accountant.expected_response_bytes(key), MIB * RESPONSE_MEMORY_FACTOR)
+        self.assertEqual(accountant.expected_response_bytes("https://other.example.com"), RESPONSE_RESERVATION_BYTES)
+
+        accountant.observe_response(key, 1024 * MIB)
+        self.assertEqual(accountant.expected_response_bytes(key), accountant.soft_watermark_bytes)
+
+    def test_unterminated_sse_event_bounded(self):
+        """Test an SSE event that never ends is cut off by its reservation"""
+        accountant = MemoryAccountant(budget_bytes=MIB)
+        chunks = [b"data: " + b"x" * 65536 for _ in range(64)]
+
+        with accountant.reserve(8192) as reservation:
+            with self.assertRaises(MemoryBudgetExceededError):
+                list(parse_sse_chunks(chunks, reservation))
+
+        events = list(parse_sse_chunks([b"data: ok\n\n"], accountant.reserve(8192)))
+        self.assertEqual(events[0].data, "ok")
+
+    def test_plugin_caches_report_and_evict(self):
+        """Test the Agent Card and delta caches report their size and shrink on eviction"""
+        agent_cards.clear_card_cache()
+        agent_cards.store_card("https://a.example.com", {"name": "A", "skills": ["s"] * 100})
+        agent_cards.store_card("https://b.example.com", {"name": "B"})
+        self.assertGreater(agent_cards.card_cache_bytes(), 0)
+
+        agent_cards.evict_cards(1)
+        self.assertIsNone(agent_cards.get_cached_card("https://a.example.com"))
+        self.assertIsNotNone(agent_cards.get_cached_card("https://b.example.com"))
+        agent_cards.clear_card_cache()
+        self.assertEqual(agent_cards.card_cache_bytes(), 0)
+
+        tracker = TaskDeltaTracker()
+        cursors = [tracker.delta("agent", {"id": str(i), "status": {"state": "working"}})["since"] for i in range(10)]
+        size = tracker.memory_bytes()
+        self.assertGreater(size, 0)
+
+        freed = tracker.evict(size // 2)
+        self.assertGreaterEqual(freed, size // 2)
+        self.assertEqual(tracker.memory_bytes(), size - freed)
+        # Evicted tasks start over; recent ones still report unchanged
+        self.assertIn("status", tracker.delta("agent", {"id": "0", "status": {"state": "working"}}, cursors[0]))
+        self.assertTrue(tracker.delta("agent", {"id": "9", "status": {"state": "working"}}, cursors[9])["unchanged"])
+
+
+if __name__ == '__main__':
+    unittest.main()
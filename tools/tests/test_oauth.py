@@ -0,0 +1,265 @@
+import unittest
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import agent_cards
+from tools.call_agent import CallAgentTool
+from tools.oauth import (
+    OAuthError, TokenCache, _Token, client_credentials_header, current_headers, parse_client_credentials,
+    scope_credential, token_cache, token_url_from_card
+)
+from tools.rate_limit import reset_limiters
+
+AGENT_URL = "https://oauth-agent.example.com"
+TOKEN_URL = "https://auth.example.com/oauth/token"
+
+CARD = {
+    "name": "Secured",
+    "protocolVersion": "0.3.0",
+    "securitySchemes": {
+        "apiKey": {"type": "apiKey", "in": "header", "name": "X-Key"},
+        "oauth": {"type": "oauth2", "flows": {"clientCredentials": {"tokenUrl": TOKEN_URL, "scopes": {}}}}
+    }
+}
+
+
+def token_response(access_token, expires_in=3600, status=200):
+    response = MagicMock()
+    response.status_code = status
+    if status >= 400:
+        response.json.return_value = {"error": "invalid_client"}
+    else:
+        response.json.return_value = {"access_token": access_token, "token_type": "bearer", "expires_in": expires_in}
+    return response
+
+
+class TestTokenCache(unittest.TestCase):
+    """Test the OAuth2 client-credentials token cache"""
+
+    def setUp(self):
+        self.cache = TokenCache()
+        self.fetches = 0
+        self.lock = threading.Lock()
+
+    def fake_fetch(self, expires_in=3600, delay=0.0):
+        def fetch(token_url, client_id, client_secret, scope=""):
+            time.sleep(delay)
+            with self.lock:
+                self.fetches += 1
+                count = self.fetches
+            return _Token(f"token-{count}", "Bearer", expires_in)
+        return patch("tools.oauth.fetch_token", side_effect=fetch)
+
+    def test_token_is_cached(self):
+        """Test repeated calls reuse one token"""
+        with self.fake_fetch():
+            for _ in range(5):
+                header = self.cache.header(TOKEN_URL, "client", "secret")
+        self.assertEqual(header, {"Authorization": "Bearer token-1"})
+        self.assertEqual(self.fetches, 1)
+
+    def test_concurrent_callers_share_one_fetch(self):
+        """Test a burst of callers without a token triggers a single token request"""
+        headers = []
+        with self.fake_fetch(delay=0.2):
+            threads = [
+                threading.Thread(target=lambda: headers.append(self.cache.header(TOKEN_URL, "client", "secret")))
+                for _ in range(16)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual({h["Authorization"] for h in headers}, {"Bearer token-1"})
+
+    def test_refreshed_in_background_before_expiry(self):
+        """Test the token is replaced before it expires, without callers waiting"""
+        with self.fake_fetch(expires_in=1):
+            self.assertEqual(self.cache.header(TOKEN_URL, "client", "secret")["Authorization"], "Bearer token-1")
+            deadline = time.monotonic() + 5
+            while self.fetches < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertGreaterEqual(self.fetches, 2)
+            self.assertNotEqual(self.cache.header(TOKEN_URL, "client", "secret")["Authorization"], "Bearer token-1")
+
+    def test_clients_are_separate(self):
+        """Test different clients and scopes get their own tokens"""
+        with self.fake_fetch():
+            self.cache.header(TOKEN_URL, "client", "secret")
+            self.cache.header(TOKEN_URL, "client", "secret", "read")
+            self.cache.header(TOKEN_URL, "other", "secret")
+        self.assertEqual(self.fetches, 3)
+
+    def test_rotated_tokens_keep_their_scope(self):
+        """Test results scoped by an old token stay reachable, and old headers are renewed"""
+        with self.fake_fetch(), patch("tools.oauth.token_cache", self.cache):
+            old = self.cache.header(TOKEN_URL, "client", "secret")
+            for client in self.cache._clients.values():
+                client.token.expires_at = client.token.refresh_at = time.monotonic() - 1
+            new = self.cache.header(TOKEN_URL, "client", "secret")
+
+            self.assertNotEqual(old, new)
+            self.assertEqual(scope_credential(old), scope_credential(new))
+            self.assertTrue(scope_credential(new).startswith("oauth2:"))
+            self.assertEqual(current_headers({**old, "Content-Type": "application/json"})["Authorization"], new["Authorization"])
+            self.assertEqual(scope_credential({"Authorization": "Bearer static"}), "Bearer static")
+            self.assertEqual(current_headers({"Authorization": "Bearer static"}), {"Authorization": "Bearer static"})
+
+    def test_short_lived_tokens_do_not_spin(self):
+        """Test very short lifetimes still leave the token usable and refresh later"""
+        token = _Token("t", "Bearer", 1)
+        now = time.monotonic()
+        self.assertGreater(token.expires_at, now + 0.8)
+        self.assertGreater(token.refresh_at, now + 0.4)
+
+
+class TestClientCredentials(unittest.TestCase):
+    """Test token endpoint requests and token URL discovery"""
+
+    def setUp(self):
+        agent_cards.clear_card_cache()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.addCleanup(agent_cards.clear_card_cache)
+
+    def test_parse_client_credentials(self):
+        self.assertEqual(parse_client_credentials("id:se:cret"), ("id", "se:cret"))
+        with self.assertRaises(OAuthError):
+            parse_client_credentials("no-separator")
+
+    def test_token_url_from_card(self):
+        self.assertEqual(token_url_from_card(CARD), TOKEN_URL)
+        self.assertIsNone(token_url_from_card({"securitySchemes": {"k": {"type": "apiKey"}}}))
+        self.assertIsNone(token_url_from_card(None))
+
+    @patch('requests.Session.post')
+    def test_token_request(self, mock_post):
+        """Test the client_credentials grant is sent with HTTP Basic client authentication"""
+        mock_post.return_value = token_response("abc")
+        agent_cards.store_card(AGENT_URL, CARD)
+
+        header = client_credentials_header(AGENT_URL, "client:secret", scope="a2a.invoke")
+
+        self.assertEqual(header, {"Authorization": "Bearer abc"})
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args[0], TOKEN_URL)
+        self.assertEqual(kwargs['data'], {"grant_type": "client_credentials", "scope": "a2a.invoke"})
+        self.assertEqual(kwargs['auth'], ("client", "secret"))
+
+    @patch('requests.Session.post')
+    def test_rejected_credentials(self, mock_post):
+        mock_post.return_value = token_response(None, status=401)
+        with self.assertRaises(OAuthError) as ctx:
+            client_credentials_header(AGENT_URL, "client:wrong", token_url=TOKEN_URL)
+        self.assertIn("401: invalid_client", str(ctx.exception))
+
+    @patch('requests.Session.get')
+    def test_no_token_url(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=404)
+        mock_get.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError("404")
+        with self.assertRaises(OAuthError):
+            client_credentials_header(AGENT_URL, "client:secret")
+
+    @patch('requests.Session.get')
+    @patch('requests.Session.post')
+    def test_token_url_discovered_without_cached_card(self, mock_post, mock_get):
+        """Test the card is fetched when none is cached, and its token URL outlives the card cache"""
+        mock_get.return_value = MagicMock(status_code=200)
+        mock_get.return_value.json.return_value = CARD
+        mock_post.return_value = token_response("abc")
+
+        self.assertEqual(client_credentials_header(AGENT_URL, "client:secret"), {"Authorization": "Bearer abc"})
+        self.assertEqual(mock_post.call_args.args[0], TOKEN_URL)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertNotIn("Authorization", mock_get.call_args.kwargs["headers"])
+
+        agent_cards.clear_card_cache()
+        client_credentials_header(AGENT_URL, "client:other")
+        self.assertEqual(mock_get.call_count, 1)
+
+
+class TestOAuthTools(unittest.TestCase):
+    """Test tools send cached OAuth2 tokens to agents"""
+
+    def setUp(self):
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "secured_agent",
+            "agent_1_url": AGENT_URL,
+            "agent_1_auth_type": "oauth2-client-credentials",
+            "agent_1_api_key": "client:secret",
+            "agent_1_token_url": TOKEN_URL
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+
+    def call(self):
+        return next(CallAgentTool(self.mock_runtime)._invoke({
+            "agent_name": "secured_agent", "instruction": "Hello"
+        })).text
+
+    @patch('requests.Session.post')
+    def test_agent_calls_carry_cached_token(self, mock_post):
+        """Test the token endpoint is hit once for several agent calls"""
+        def reply(url, **kwargs):
+            if url == TOKEN_URL:
+                return token_response("tok-1")
+            response = MagicMock()
+            response.json.return_value = {
+                "jsonrpc": "2.0", "result": {"kind": "message", "parts": [{"kind": "text", "text": "Hi"}]}, "id": "1"
+            }
+            return response
+        mock_post.side_effect = reply
+
+        self.call()
+        self.call()
+
+        token_calls = [c for c in mock_post.call_args_list if c.args[0] == TOKEN_URL]
+        agent_calls = [c for c in mock_post.call_args_list if c.args[0] != TOKEN_URL]
+        self.assertEqual(len(token_calls), 1)
+        self.assertEqual(len(agent_calls), 2)
+        self.assertEqual(agent_calls[-1].kwargs['headers']['Authorization'], "Bearer tok-1")
+
+    @patch('requests.Session.post')
+    def test_token_failure_is_reported(self, mock_post):
+        """Test a failing token endpoint surfaces as an Auth Error without calling the agent"""
+        mock_post.return_value = token_response(None, status=401)
+        result = self.call()
+        self.assertTrue(result.startswith("Auth Error:"))
+        self.assertEqual(mock_post.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
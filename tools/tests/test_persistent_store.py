@@ -0,0 +1,137 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import agent_cards
+from tools.persistent_store import PersistentStore, get_store, scoped_key
+
+
+class TestPersistentStore(unittest.TestCase):
+    """Test cases for the SQLite-backed cache"""
+
+    def setUp(self):
+        """Create a fresh database in a temporary directory"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache", "a2a.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_roundtrip_and_ttl(self):
+        """Test values survive a new store instance and expire after their TTL"""
+        PersistentStore(self.path).put("ns", "k", {"a": [1, 2]}, ttl=60)
+        PersistentStore(self.path).put("ns", "short", "x", ttl=0.01)
+        time.sleep(0.02)
+
+        reopened = PersistentStore(self.path)
+        self.assertEqual(reopened.get("ns", "k"), {"a": [1, 2]})
+        self.assertIsNone(reopened.get("ns", "short"))
+        self.assertIsNone(reopened.get("other", "k"))
+
+    def test_size_cap_evicts_oldest(self):
+        """Test the oldest entries are evicted once the byte cap is exceeded"""
+        store = PersistentStore(self.path, max_bytes=250)
+        for i in range(5):
+            store.put("ns", f"k{i}", "x" * 100, ttl=60)
+
+        self.assertLessEqual(store.total_bytes(), 250)
+        self.assertIsNone(store.get("ns", "k0"))
+        self.assertEqual(store.get("ns", "k4"), "x" * 100)
+
+    def test_concurrent_writers(self):
+        """Test many threads writing through WAL-mode connections"""
+        store = PersistentStore(self.path)
+        errors = []
+
+        def writer(n):
+            try:
+                for i in range(20):
+                    store.put("ns", f"{n}-{i}", {"n": n, "i": i}, ttl=60)
+                    self.assertEqual(store.get("ns", f"{n}-{i}"), {"n": n, "i": i})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(store.get("ns", "7-19"), {"n": 7, "i": 19})
+
+    def test_scoped_key_depends_on_credential(self):
+        """Test cached results are not shared across credentials"""
+        self.assertNotEqual(
+            scoped_key("https://a.example.com", "Bearer one", "task-1"),
+            scoped_key("https://a.example.com", "Bearer two", "task-1")
+        )
+
+    def test_agent_card_survives_restart(self):
+        """Test a card cached on disk is served after the in-memory cache is lost"""
+        with patch.dict(os.environ, {"A2A_PERSISTENT_CACHE": self.path}):
+            self.assertIsNotNone(get_store())
+            agent_cards.store_card("https://a.example.com", {"name": "A"})
+            agent_cards.clear_card_cache()
+
+            self.assertEqual(agent_cards.get_cached_card("https://a.example.com/"), {"name": "A"})
+
+        with patch.dict(os.environ, {"A2A_PERSISTENT_CACHE": ""}):
+            self.assertIsNone(get_store())
+
+
+    @patch('requests.Session.get')
+    def test_stale_agent_card_is_revalidated(self, mock_get):
+        """Test a stored card past the in-memory TTL is served and renewed by a conditional GET"""
+        not_modified = MagicMock(status_code=304)
+        mock_get.return_value = not_modified
+        with patch.dict(os.environ, {"A2A_PERSISTENT_CACHE": self.path}):
+            store = get_store()
+            stale_at = time.time() - agent_cards.CARD_TTL_SECONDS - 60
+            store.put(agent_cards.CARD_NAMESPACE, "https://a.example.com", {
+                "fetched_at": stale_at,
+                "card": {"name": "A"},
+                "validators": {"url": "https://a.example.com/.well-known/agent-card.json", "etag": '"v1"'}
+            }, ttl=agent_cards.PERSISTED_CARD_TTL_SECONDS)
+            agent_cards.clear_card_cache()
+            self.addCleanup(agent_cards.clear_card_cache)
+
+            self.assertEqual(agent_cards.get_cached_card("https://a.example.com"), {"name": "A"})
+            deadline = time.monotonic() + 5
+            while store.get(agent_cards.CARD_NAMESPACE, "https://a.example.com")["fetched_at"] == stale_at:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+
+
+    @patch('requests.Session.get')
+    def test_stale_authenticated_card_is_not_revalidated(self, mock_get):
+        """Test a card fetched with auth headers is not refreshed without them and expires with the memory TTL"""
+        card_response = MagicMock(status_code=200, headers={})
+        card_response.json.return_value = {"name": "Private"}
+        mock_get.return_value = card_response
+        with patch.dict(os.environ, {"A2A_PERSISTENT_CACHE": self.path}):
+            agent_cards.fetch_agent_card("https://p.example.com", {"Authorization": "Bearer k"})
+            agent_cards.clear_card_cache()
+            self.addCleanup(agent_cards.clear_card_cache)
+            self.assertEqual(agent_cards.get_cached_card("https://p.example.com"), {"name": "Private"})
+            agent_cards.clear_card_cache()
+
+            later = time.time() + agent_cards.CARD_TTL_SECONDS + 60
+            with patch("tools.agent_cards.time.time", return_value=later):
+                self.assertIsNone(agent_cards.get_cached_card("https://p.example.com"))
+
+        mock_get.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
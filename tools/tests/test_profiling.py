@@ -0,0 +1,143 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import profiling
+from tools.list_agents import ListAgentsTool
+from tools.profiling import InvocationProfiler, get_profiler, profiled
+
+
+class FakeTool:
+    @profiled
+    def _invoke(self, tool_parameters):
+        total = 0
+        for i in range(2000):
+            total += i
+        yield f"{tool_parameters.get('agent_name')}:{total}"
+        yield "done"
+
+
+class TestInvocationProfiler(unittest.TestCase):
+    """Test sampled profiling of tool invocations"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        patcher = patch.dict(os.environ, {
+            "A2A_PROFILE_DIR": self.directory,
+            "A2A_PROFILE_SAMPLE_RATE": "0",
+            "A2A_PROFILE_AGENTS": "hot_agent",
+            "A2A_PROFILE_MAX_SHARE": "1"
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, profiling, "_profiler", None)
+        profiling._profiler = None
+
+    def reports(self, suffix):
+        return sorted(n for n in os.listdir(self.directory) if n.endswith(suffix))
+
+    def test_disabled_without_directory(self):
+        """Test invocations pass straight through when no report directory is set"""
+        with patch.dict(os.environ, {"A2A_PROFILE_DIR": ""}):
+            self.assertIsNone(get_profiler())
+            self.assertEqual(list(FakeTool()._invoke({"agent_name": "hot_agent"})), ["hot_agent:1999000", "done"])
+
+    def test_listed_agent_is_profiled(self):
+        """Test invocations for a listed agent end up in a hot-function report"""
+        for _ in range(3):
+            self.assertEqual(list(FakeTool()._invoke({"agent_name": "hot_agent"}))[-1], "done")
+        get_profiler().flush()
+
+        self.assertEqual(len(self.reports(".prof")), 1)
+        [report] = self.reports(".txt")
+        self.assertIn("FakeTool-hot_agent", report)
+        with open(os.path.join(self.directory, report)) as f:
+            text = f.read()
+        self.assertIn("invocations=3", text)
+        self.assertIn("_invoke", text)
+
+    def test_unlisted_agent_not_sampled_at_zero_rate(self):
+        list(FakeTool()._invoke({"agent_name": "cold_agent"}))
+        get_profiler().flush()
+        self.assertEqual(self.reports(".txt"), [])
+
+    def test_overhead_cap(self):
+        """Test profiling pauses while profiled time exceeds the allowed share"""
+        with patch.dict(os.environ, {"A2A_PROFILE_MAX_SHARE": "0"}):
+            profiler = get_profiler()
+            self.assertTrue(profiler.should_profile("hot_agent"))
+            list(FakeTool()._invoke({"agent_name": "hot_agent"}))
+            self.assertFalse(profiler.should_profile("hot_agent"))
+
+    def test_reports_are_rotated(self):
+        """Test only the newest reports are kept"""
+        with patch.object(profiling, "MAX_REPORTS", 2), patch.object(profiling, "REPORT_EVERY_INVOCATIONS", 1):
+            for _ in range(4):
+                list(FakeTool()._invoke({"agent_name": "hot_agent"}))
+        self.assertEqual(get_profiler().reports, 4)
+        self.assertEqual(len(self.reports(".txt")), 2)
+        self.assertEqual(len(self.reports(".prof")), 2)
+
+    def test_abandoned_invocation_is_recorded(self):
+        """Test an invocation its consumer stops reading still counts"""
+        invocation = FakeTool()._invoke({"agent_name": "hot_agent"})
+        next(invocation)
+        invocation.close()
+        get_profiler().flush()
+        self.assertEqual(len(self.reports(".txt")), 1)
+
+    def test_one_session_at_a_time(self):
+        """Test an invocation overlapping a profiled one runs unprofiled"""
+        first = FakeTool()._invoke({"agent_name": "hot_agent"})
+        next(first)
+        self.assertEqual(list(FakeTool()._invoke({"agent_name": "hot_agent"}))[-1], "done")
+        list(first)
+        get_profiler().flush()
+
+        [report] = self.reports(".txt")
+        with open(os.path.join(self.directory, report)) as f:
+            self.assertIn("invocations=1", f.read())
+        self.assertFalse(profiling._session_lock.locked())
+
+    def test_unwritable_directory(self):
+        """Test a report that cannot be written is logged, not raised"""
+        blocker = os.path.join(self.directory, "file")
+        open(blocker, "w").close()
+        profiler = InvocationProfiler(os.path.join(blocker, "sub"), 0, frozenset({"hot_agent"}), 1)
+        list(profiler.run("FakeTool", "hot_agent", FakeTool._invoke.__wrapped__(FakeTool(), {})))
+        with self.assertLogs("tools.profiling", level="WARNING"):
+            profiler.flush()
+
+    def test_tools_are_wrapped(self):
+        """Test real tools run through the profiler"""
+        self.assertTrue(hasattr(ListAgentsTool._invoke, "__wrapped__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
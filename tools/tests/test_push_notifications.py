@@ -0,0 +1,248 @@
+import unittest
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import requests
+from tools import agent_cards, push_notifications
+from tools.get_task_status import GetTaskStatusTool
+from tools.push_notifications import PUSH_TRUST_SECONDS, TOKEN_HEADER, PushReceiver, trim_history
+from tools.rate_limit import reset_limiters
+from tools.submit_task import SubmitTaskTool
+
+AGENT_URL = "https://push.example.com"
+
+
+def start_receiver():
+    receiver = PushReceiver("http://127.0.0.1/a2a/push", "127.0.0.1", 0)
+    receiver.public_url = f"http://127.0.0.1:{receiver.server.server_address[1]}/a2a/push"
+    receiver.start()
+    return receiver
+
+
+def notify(receiver, token, body):
+    return requests.post(receiver.public_url, json=body, headers={TOKEN_HEADER: token}).status_code
+
+
+class TestPushReceiver(unittest.TestCase):
+    """Test the embedded push-notification webhook receiver"""
+
+    def setUp(self):
+        self.receiver = start_receiver()
+
+    def tearDown(self):
+        self.receiver.close()
+
+    def test_token_is_verified(self):
+        """Test notifications need a registered token and must stay on their task"""
+        config = self.receiver.register(AGENT_URL, "Bearer a")
+        task = {"kind": "task", "id": "t1", "status": {"state": "working"}}
+
+        self.assertEqual(notify(self.receiver, "forged", task), 401)
+        self.assertEqual(notify(self.receiver, config["token"], task), 200)
+        self.assertEqual(notify(self.receiver, config["token"], {**task, "id": "t2"}), 403)
+        self.assertIsNone(self.receiver.get_task(AGENT_URL, "Bearer a", "t2"))
+
+        self.receiver.unregister(config["token"])
+        self.assertEqual(notify(self.receiver, config["token"], task), 401)
+
+    def test_updates_are_merged_and_scoped(self):
+        """Test status and artifact updates build the task, visible only to the submitting credential"""
+        config = self.receiver.register(AGENT_URL, "Bearer a")
+        self.receiver.bind(config["token"], "t1")
+        token = config["token"]
+
+        notify(self.receiver, token, {"kind": "task", "id": "t1", "status": {"state": "working"}, "history": [
+            {"kind": "message", "messageId": "m1"}, {"kind": "message", "messageId": "m2"}
+        ]})
+        notify(self.receiver, token, {"kind": "artifact-update", "taskId": "t1", "artifact": {
+            "artifactId": "a1", "parts": [{"kind": "text", "text": "one "}]
+        }})
+        notify(self.receiver, token, {"kind": "artifact-update", "taskId": "t1", "append": True, "artifact": {
+            "artifactId": "a1", "parts": [{"kind": "text", "text": "two"}]
+        }})
+        notify(self.receiver, token, {"kind": "status-update", "taskId": "t1", "status": {"state": "completed"}})
+
+        task = self.receiver.get_task(AGENT_URL, "Bearer a", "t1")
+        self.assertEqual(task["status"]["state"], "completed")
+        self.assertEqual([p["text"] for p in task["artifacts"][0]["parts"]], ["one ", "two"])
+        self.assertEqual(len(trim_history(task, 1)["history"]), 1)
+        self.assertIsNone(self.receiver.get_task(AGENT_URL, "Bearer b", "t1"))
+
+    def test_rest_wrapped_notification(self):
+        """Test HTTP+JSON agents' wrapped payloads and TASK_STATE_* names are understood"""
+        config = self.receiver.register(AGENT_URL, "")
+        self.assertEqual(notify(self.receiver, config["token"], {
+            "task": {"id": "t1", "status": {"state": "TASK_STATE_FAILED"}}
+        }), 200)
+        self.assertEqual(self.receiver.get_task(AGENT_URL, "", "t1")["status"]["state"], "failed")
+
+    def test_quiet_running_task_is_polled_again(self):
+        """Test a running task not heard from recently is not trusted"""
+        config = self.receiver.register(AGENT_URL, "")
+        notify(self.receiver, config["token"], {"kind": "task", "id": "t1", "status": {"state": "working"}})
+        self.assertIsNotNone(self.receiver.get_task(AGENT_URL, "", "t1"))
+
+        later = time.monotonic() + PUSH_TRUST_SECONDS + 1
+        with patch("tools.push_notifications.time.monotonic", return_value=later):
+            self.assertIsNone(self.receiver.get_task(AGENT_URL, "", "t1"))
+
+    def test_validation_and_eviction(self):
+        """Test the validation echo and memory-budget eviction"""
+        response = requests.get(self.receiver.public_url, params={"validationToken": "abc"})
+        self.assertEqual(response.text, "abc")
+
+        config = self.receiver.register(AGENT_URL, "")
+        notify(self.receiver, config["token"], {"kind": "task", "id": "t1", "status": {"state": "completed"}})
+        self.assertGreater(self.receiver.memory_bytes(), 0)
+        self.assertGreater(self.receiver.evict(1), 0)
+        self.assertEqual(self.receiver.memory_bytes(), 0)
+        self.assertIsNone(self.receiver.get_task(AGENT_URL, "", "t1"))
+
+
+class TestReceiverStartup(unittest.TestCase):
+    """Test get_push_receiver when the receiver cannot listen"""
+
+    def setUp(self):
+        for name in ("_receiver", "_receiver_url", "_bind_failure"):
+            patcher = patch.object(push_notifications, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.dict(os.environ, {
+            push_notifications.PUSH_RECEIVER_URL_ENV: "http://plugin:8765/a2a/push",
+            push_notifications.PUSH_RECEIVER_BIND_ENV: "127.0.0.1:8765"
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("tools.push_notifications.PushReceiver", side_effect=OSError("Address already in use"))
+    def test_bind_failure_is_cached_and_logged_once(self, mock_receiver):
+        """Test a failed bind is not retried on every poll and is only warned about once"""
+        with self.assertLogs("tools.push_notifications", level="DEBUG") as logs:
+            self.assertIsNone(push_notifications.get_push_receiver())
+            self.assertIsNone(push_notifications.get_push_receiver())
+            self.assertEqual(mock_receiver.call_count, 1)
+
+            later = time.monotonic() + push_notifications.BIND_RETRY_SECONDS + 1
+            with patch("tools.push_notifications.time.monotonic", return_value=later):
+                self.assertIsNone(push_notifications.get_push_receiver())
+            self.assertEqual(mock_receiver.call_count, 2)
+            self.assertEqual(push_notifications._bind_failure[2], push_notifications.BIND_RETRY_SECONDS * 2)
+
+        warnings = [record for record in logs.records if record.levelname == "WARNING"]
+        self.assertEqual(len(warnings), 1)
+
+        with patch.dict(os.environ, {push_notifications.PUSH_RECEIVER_BIND_ENV: "127.0.0.1:8766"}):
+            self.assertIsNone(push_notifications.get_push_receiver())
+        self.assertEqual(mock_receiver.call_count, 3)
+
+
+class TestPushWorkflow(unittest.TestCase):
+    """Test submit_task registering push configs and get_task_status reading pushed tasks"""
+
+    def setUp(self):
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "push_agent",
+            "agent_1_url": AGENT_URL,
+            "agent_1_auth_type": "bearer",
+            "agent_1_api_key": "push-key"
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        self.receiver = start_receiver()
+        patcher = patch.object(push_notifications, "_receiver", self.receiver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.receiver.close)
+        self.addCleanup(agent_cards.clear_card_cache)
+
+    def submit(self, mock_post):
+        submitted = MagicMock()
+        submitted.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": "task-p-1", "status": {"state": "submitted"}}, "id": "1"
+        }
+        mock_post.return_value = submitted
+        with patch.dict(os.environ, {push_notifications.PUSH_RECEIVER_URL_ENV: self.receiver.public_url}), \
+                patch.object(push_notifications, "_receiver_url", self.receiver.public_url):
+            results = [m.text for m in SubmitTaskTool(self.mock_runtime)._invoke({
+                "agent_name": "push_agent", "instruction": "Background job"
+            })]
+            _, kwargs = mock_post.call_args
+            return results, kwargs['json']['params'].get('configuration', {})
+
+    def get_status(self):
+        with patch.dict(os.environ, {push_notifications.PUSH_RECEIVER_URL_ENV: self.receiver.public_url}), \
+                patch.object(push_notifications, "_receiver_url", self.receiver.public_url):
+            return [m.text for m in GetTaskStatusTool(self.mock_runtime)._invoke({
+                "agent_name": "push_agent", "task_id": "task-p-1"
+            })]
+
+    @patch('requests.Session.post')
+    def test_pushed_completion_answers_status_without_polling(self, mock_post):
+        """Test a pushed completion is served by get_task_status with no tasks/get call"""
+        agent_cards.store_card(AGENT_URL, {"protocolVersion": "0.3.0", "capabilities": {"pushNotifications": True}})
+
+        results, configuration = self.submit(mock_post)
+        self.assertEqual(results, ["task-p-1"])
+        push_config = configuration["pushNotificationConfig"]
+        self.assertFalse(configuration["blocking"])
+        self.assertEqual(push_config["url"], self.receiver.public_url)
+
+        self.assertEqual(notify(self.receiver, push_config["token"], {
+            "kind": "task", "id": "task-p-1", "status": {"state": "completed"},
+            "artifacts": [{"artifactId": "a1", "parts": [{"kind": "text", "text": "done"}]}]
+        }), 200)
+
+        mock_post.reset_mock()
+        status = json.loads(self.get_status()[0])
+        self.assertEqual(status["status"]["state"], "completed")
+        self.assertEqual(status["artifacts"][0]["parts"][0]["text"], "done")
+        mock_post.assert_not_called()
+
+    @patch('requests.Session.post')
+    def test_no_push_config_without_agent_support(self, mock_post):
+        """Test agents whose card lacks pushNotifications are polled as before"""
+        agent_cards.store_card(AGENT_URL, {"protocolVersion": "0.3.0", "capabilities": {}})
+
+        results, configuration = self.submit(mock_post)
+        self.assertEqual(results, ["task-p-1"])
+        self.assertNotIn("pushNotificationConfig", configuration)
+
+        polled = MagicMock()
+        polled.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": "task-p-1", "status": {"state": "working"}}, "id": "2"
+        }
+        mock_post.return_value = polled
+        self.assertEqual(json.loads(self.get_status()[0])["status"]["state"], "working")
+        self.assertEqual(mock_post.call_args.kwargs['json']['method'], "tasks/get")
+
+
+if __name__ == "__main__":
+    unittest.main()
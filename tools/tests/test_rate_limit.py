@@ -0,0 +1,156 @@
+import unittest
+import threading
+import time
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.rate_limit import (
+    AgentLimiter,
+    AgentRateLimitedError,
+    get_limiter,
+    parse_retry_after,
+    reset_limiters,
+    send_with_limits
+)
+
+
+def make_response(status_code, retry_after=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return response
+
+
+class TestAgentLimiter(unittest.TestCase):
+    """Test cases for per-agent concurrency and rate limiting"""
+
+    def test_max_in_flight_enforced(self):
+        """Test that no more than max_in_flight callers hold a slot at once"""
+        limiter = AgentLimiter(max_in_flight=2)
+        peak = 0
+        lock = threading.Lock()
+
+        def worker():
+            nonlocal peak
+            self.assertTrue(limiter.acquire(timeout=5))
+            with lock:
+                peak = max(peak, limiter.in_flight)
+            time.sleep(0.02)
+            limiter.release()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.queued, 0)
+
+    def test_token_bucket_spaces_requests(self):
+        """Test that the rate limit spaces requests after the initial burst"""
+        limiter = AgentLimiter(rate=20)
+        start = time.monotonic()
+        for _ in range(25):
+            self.assertTrue(limiter.acquire(timeout=5))
+            limiter.release()
+        elapsed = time.monotonic() - start
+
+        # Burst of 20, then 5 more at 20/s
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_acquire_times_out(self):
+        """Test bounded wait when the agent is saturated"""
+        limiter = AgentLimiter(max_in_flight=1)
+        self.assertTrue(limiter.acquire(timeout=1))
+        self.assertFalse(limiter.acquire(timeout=0.05))
+        self.assertEqual(limiter.queued, 0)
+
+    def test_throttle_halves_rate_and_recovers(self):
+        """Test adaptive rate decrease on 429 and additive recovery on success"""
+        limiter = AgentLimiter(rate=10)
+        limiter.on_throttled(0)
+        self.assertEqual(limiter.rate, 5)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 10)
+
+    def test_get_limiter_shared_per_configuration(self):
+        """Test limiters are shared per agent and limits, and other limits get their own"""
+        reset_limiters()
+        first = get_limiter("https://a.example.com/", "2", "")
+        self.assertIs(get_limiter("https://a.example.com", "2", "0"), first)
+
+        other = get_limiter("https://a.example.com", "3", "5")
+        self.assertIsNot(other, first)
+        self.assertEqual(first.max_in_flight, 2)
+        self.assertEqual(first.configured_rate, 0)
+        self.assertEqual(other.max_in_flight, 3)
+        self.assertEqual(other.configured_rate, 5)
+
+    def test_stream_holds_slot_until_closed(self):
+        """Test a held response keeps its in-flight slot until it is closed, once"""
+        limiter = AgentLimiter(max_in_flight=1)
+        response = MagicMock()
+        response.status_code = 200
+
+        held = send_with_limits(limiter, lambda: response, hold_until_close=True)
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertFalse(limiter.acquire(timeout=0.05))
+
+        held.close()
+        held.close()
+        self.assertEqual(limiter.in_flight, 0)
+        send_with_limits(limiter, lambda: response)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_parse_retry_after(self):
+        """Test delta-seconds, HTTP-date and invalid Retry-After values"""
+        self.assertEqual(parse_retry_after("2"), 2.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class TestSendWithLimits(unittest.TestCase):
+    """Test cases for throttling-aware sends"""
+
+    def test_retries_after_retry_after(self):
+        """Test that a 429 is retried once Retry-After has elapsed"""
+        limiter = AgentLimiter()
+        send = MagicMock(side_effect=[make_response(429, "0.05"), make_response(200)])
+
+        start = time.monotonic()
+        response = send_with_limits(limiter, send)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_count, 2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_persistent_throttling_raises(self):
+        """Test that repeated 503s surface as a rate-limit error, not a network error"""
+        limiter = AgentLimiter()
+        send = MagicMock(return_value=make_response(503, "0"))
+
+        with self.assertRaises(AgentRateLimitedError):
+            send_with_limits(limiter, send)
+        self.assertEqual(send.call_count, 3)
+
+    def test_retry_after_beyond_queue_timeout_fails_fast(self):
+        """Test that a Retry-After longer than the bounded wait is reported immediately"""
+        limiter = AgentLimiter()
+        send = MagicMock(return_value=make_response(429, "120"))
+
+        with self.assertRaises(AgentRateLimitedError) as ctx:
+            send_with_limits(limiter, send, queue_timeout=1)
+        self.assertEqual(ctx.exception.retry_after, 120)
+        self.assertEqual(send.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import json
+import time
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.sse import SSEParser, parse_sse_chunks, iter_sse_events
+
+# The parser sustains well over 10k events/sec on a developer machine. The test only
+# fails below this floor, which catches pathological regressions (e.g. quadratic
+# buffering) without depending on how busy the machine running it is.
+THROUGHPUT_FLOOR_EVENTS_PER_SECOND = 500
+
+
+def measure_throughput(event_count: int = 20000) -> tuple[int, float]:
+    """
+    Parse event_count status-update events delivered in 4 KiB chunks; returns (parsed, events/sec).
+    """
+    payload = json.dumps({
+        "jsonrpc": "2.0",
+        "result": {"taskId": "task-abc-123", "kind": "status-update", "status": {"state": "working"}},
+        "id": "1"
+    }).encode()
+    stream = (b"event: status-update\ndata: " + payload + b"\n\n") * event_count
+    chunks = [stream[i:i + 4096] for i in range(0, len(stream), 4096)]
+
+    start = time.perf_counter()
+    parsed = sum(1 for _ in parse_sse_chunks(chunks))
+    return parsed, parsed / (time.perf_counter() - start)
+
+
+class TestSSEParser(unittest.TestCase):
+    """Test cases for the incremental SSE parser"""
+
+    def test_single_event(self):
+        """Test a simple data-only event"""
+        events = list(parse_sse_chunks([b"data: hello\n\n"]))
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, "hello")
+        self.assertEqual(events[0].event, "message")
+
+    def test_multiline_data_and_fields(self):
+        """Test multi-line data joined with newlines plus event/id/retry fields"""
+        stream = (
+            b"event: status-update\n"
+            b"id: 42\n"
+            b"retry: 1500\n"
+            b"data: line one\n"
+            b"data: line two\n"
+            b"\n"
+        )
+        events = list(parse_sse_chunks([stream]))
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, "line one\nline two")
+        self.assertEqual(events[0].event, "status-update")
+        self.assertEqual(events[0].id, "42")
+        self.assertEqual(events[0].retry, 1500)
+
+    def test_byte_at_a_time_with_split_utf8(self):
+        """Test chunks that split lines, CRLF pairs and multi-byte UTF-8 characters"""
+        stream = "data: héllo wörld ✓\r\n: keep-alive\r\n\r\ndata: two\r\rdata: three\n\n".encode("utf-8")
+        events = list(parse_sse_chunks(stream[i:i + 1] for i in range(len(stream))))
+
+        self.assertEqual([e.data for e in events], ["héllo wörld ✓", "two", "three"])
+
+    def test_bom_stripped_and_id_persists(self):
+        """Test leading BOM removal and last event id carried to later events"""
+        parser = SSEParser()
+        events = parser.feed(b"\xef\xbb")
+        events += parser.feed(b"\xbfid: a\ndata: 1\n\ndata: 2\n\n")
+
+        self.assertEqual([e.data for e in events], ["1", "2"])
+        self.assertEqual([e.id for e in events], ["a", "a"])
+
+    def test_incomplete_event_discarded_at_eof(self):
+        """Test that an unterminated event is dropped when the stream ends"""
+        events = list(parse_sse_chunks([b"data: done\n\ndata: partial\n"]))
+
+        self.assertEqual([e.data for e in events], ["done"])
+
+    def test_iter_sse_events_uses_iter_content(self):
+        """Test parsing directly from a streaming response"""
+        response = MagicMock()
+        response.iter_content.return_value = [b"data: {\"a\": 1}\n", b"\n"]
+
+        events = list(iter_sse_events(response))
+
+        self.assertEqual(json.loads(events[0].data), {"a": 1})
+        response.iter_content.assert_called_once_with(chunk_size=8192)
+
+    def test_throughput_benchmark(self):
+        """Benchmark: every event of a long stream is parsed, far above a loose throughput floor"""
+        parsed, rate = measure_throughput()
+
+        self.assertEqual(parsed, 20000)
+        self.assertGreater(rate, THROUGHPUT_FLOOR_EVENTS_PER_SECOND)
+
+
+if __name__ == '__main__':
+    # python tools/tests/test_sse.py --report prints the measured throughput instead of testing
+    if "--report" in sys.argv:
+        parsed, rate = measure_throughput()
+        print(f"{parsed} events parsed at {rate:,.0f} events/sec")
+    else:
+        unittest.main()
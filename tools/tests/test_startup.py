@@ -0,0 +1,122 @@
+import unittest
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+# Per-module budgets for the cost a tool module adds on top of the Dify SDK;
+# --report flags modules over them
+IMPORT_TIME_BUDGET_SECONDS = 0.15
+IMPORT_RSS_BUDGET_KB = 8 * 1024
+
+# Entry point budget (SDK included); only checked when dify_plugin is installed
+ENTRY_POINT_TIME_BUDGET_SECONDS = 5.0
+
+# Tests only fail past this multiple of a time or memory budget, so a loaded CI
+# runner does not fail them; the deferred-import check is always exact
+BUDGET_HEADROOM = 5
+
+# Modules a tool must not pull in just by being imported
+DEFERRED_MODULES = ("requests", "urllib3", "sqlite3", "uuid", "email.utils", "concurrent.futures",
+                    "cProfile", "pstats")
+
+# Runs in a fresh interpreter: pre-loads the SDK (or a minimal stand-in when it is
+# not installed), then measures only the import of the module under test.
+_PROBE = r"""
+import importlib, importlib.util, json, resource, sys, time, types
+sys.path.insert(0, ROOT)
+
+if MODULE != "main":
+    if importlib.util.find_spec("dify_plugin") is None:
+        sdk = types.ModuleType("dify_plugin")
+        sdk.Tool = type("Tool", (), {})
+        sdk.ToolProvider = type("ToolProvider", (), {})
+        for name in ("entities", "entities.tool", "errors", "errors.tool"):
+            sys.modules["dify_plugin." + name] = types.ModuleType("dify_plugin." + name)
+        sys.modules["dify_plugin.entities.tool"].ToolInvokeMessage = type("ToolInvokeMessage", (), {})
+        sys.modules["dify_plugin.errors.tool"].ToolProviderCredentialValidationError = type(
+            "ToolProviderCredentialValidationError", (Exception,), {}
+        )
+        sys.modules["dify_plugin"] = sdk
+    else:
+        import dify_plugin, dify_plugin.entities.tool
+
+before = set(sys.modules)
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+importlib.import_module(MODULE)
+seconds = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+print(json.dumps({"seconds": seconds, "rss_kb": rss_kb, "modules": sorted(set(sys.modules) - before)}))
+"""
+
+
+def tool_modules() -> list[str]:
+    """
+    Every tool module referenced by a tool YAML, plus the provider.
+    """
+    modules = ["provider.a2a"]
+    for path in sorted(glob.glob(os.path.join(ROOT, "tools", "*.yaml"))):
+        with open(path) as f:
+            match = re.search(r"source:\s*(\S+)\.py", f.read())
+        if match:
+            modules.append(match.group(1).replace("/", "."))
+    return modules
+
+
+def measure_import(module: str) -> dict:
+    """
+    Import a module in a fresh interpreter and report time, RSS growth and new modules.
+    """
+    code = _PROBE.replace("ROOT", repr(ROOT)).replace("MODULE", repr(module))
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestStartupBudget(unittest.TestCase):
+    """Cold-start benchmark: import time and memory of the entry point and each tool module"""
+
+    def test_tool_modules_within_budget(self):
+        """Test each tool module imports quickly, cheaply and without heavy dependencies"""
+        for module in tool_modules():
+            with self.subTest(module=module):
+                result = measure_import(module)
+                loaded = [m for m in DEFERRED_MODULES if m in result["modules"]]
+
+                self.assertEqual(loaded, [], f"{module} imports {loaded} at load time")
+                self.assertLess(result["seconds"], IMPORT_TIME_BUDGET_SECONDS * BUDGET_HEADROOM)
+                self.assertLess(result["rss_kb"], IMPORT_RSS_BUDGET_KB * BUDGET_HEADROOM)
+
+    def test_entry_point_within_budget(self):
+        """Test the plugin entry point (SDK included) starts within budget"""
+        # Checked in a fresh interpreter: other test modules replace dify_plugin with mocks
+        probe = subprocess.run([sys.executable, "-c", "import dify_plugin"], capture_output=True)
+        if probe.returncode != 0:
+            self.skipTest("dify_plugin is not installed")
+
+        result = measure_import("main")
+        self.assertLess(result["seconds"], ENTRY_POINT_TIME_BUDGET_SECONDS * BUDGET_HEADROOM)
+
+
+if __name__ == '__main__':
+    # python tools/tests/test_startup.py --report prints the measurements instead of testing
+    if "--report" in sys.argv:
+        for name in ["main"] + tool_modules():
+            try:
+                result = measure_import(name)
+            except subprocess.CalledProcessError:
+                print(f"{name:32s} (not importable here)")
+                continue
+            over = name != "main" and (
+                result["seconds"] > IMPORT_TIME_BUDGET_SECONDS or result["rss_kb"] > IMPORT_RSS_BUDGET_KB
+            )
+            print(f"{name:32s} {result['seconds'] * 1000:8.1f} ms {result['rss_kb'] / 1024:8.1f} MiB"
+                  + ("  over budget" if over else ""))
+    else:
+        unittest.main()
@@ -0,0 +1,268 @@
+import unittest
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import agent_cards
+from tools.get_task_status import GetTaskStatusTool
+from tools.rate_limit import get_limiter, reset_limiters
+from tools.subscriptions import WAITER_QUEUE_SIZE, SubscriptionManager, subscription_manager
+from tools.task_durations import duration_estimator
+from tools.transports import AgentEndpoint, JSONRPC
+
+AGENT_URL = "https://subscribe.example.com"
+ENDPOINT = AgentEndpoint(JSONRPC, AGENT_URL)
+HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer k"}
+
+
+class FakeStream:
+    """A streaming response whose SSE events are pushed by the test"""
+
+    def __init__(self):
+        self.status_code = 200
+        self.headers = {}
+        self.closed = False
+        self._chunks: "queue.Queue" = queue.Queue()
+
+    def raise_for_status(self):
+        pass
+
+    def send(self, result=None, error=None):
+        body = {"jsonrpc": "2.0", "id": "1"}
+        body.update({"error": error} if error is not None else {"result": result})
+        self._chunks.put(f"data: {json.dumps(body)}\n\n".encode())
+
+    def end(self):
+        self._chunks.put(None)
+
+    def iter_content(self, chunk_size=None):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def close(self):
+        self.closed = True
+        self._chunks.put(None)
+
+
+def status(state, task_id="t1"):
+    return {"kind": "status-update", "taskId": task_id, "status": {"state": state}, "final": state == "completed"}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestSubscriptionManager(unittest.TestCase):
+    """Test fan-out of one upstream task stream to local waiters"""
+
+    def setUp(self):
+        self.manager = SubscriptionManager()
+        self.addCleanup(self.manager.clear)
+        self.limiter = get_limiter(AGENT_URL)
+        self.streams = []
+
+        def post(url, **kwargs):
+            self.assertEqual(kwargs["json"]["method"], "tasks/resubscribe")
+            stream = FakeStream()
+            self.streams.append(stream)
+            return stream
+        patcher = patch('requests.Session.post', side_effect=post)
+        self.mock_post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def join(self, task=None):
+        return self.manager.join(ENDPOINT, AGENT_URL, HEADERS, self.limiter, "t1", task)
+
+    def test_one_upstream_for_many_waiters(self):
+        """Test every waiter gets each update from a single stream"""
+        waiters = [self.join() for _ in range(5)]
+        self.assertTrue(wait_until(lambda: self.streams))
+        self.streams[0].send(status("working"))
+
+        for waiter in waiters:
+            self.assertEqual(waiter.get(5)["status"]["state"], "working")
+        self.assertEqual(self.mock_post.call_count, 1)
+        self.assertEqual(self.manager.active(), 1)
+
+    def test_late_joiner_gets_latest_state(self):
+        first = self.join({"kind": "task", "id": "t1", "status": {"state": "submitted"}, "artifacts": []})
+        self.assertEqual(first.get(1)["status"]["state"], "submitted")
+        self.assertTrue(wait_until(lambda: self.streams))
+        self.streams[0].send(status("working"))
+        self.assertEqual(first.get(5)["status"]["state"], "working")
+
+        late = self.join()
+        replayed = late.get(0)
+        self.assertEqual(replayed["status"]["state"], "working")
+        # Status updates are merged into the seeded task
+        self.assertEqual(replayed["artifacts"], [])
+        self.assertEqual(self.manager.latest(AGENT_URL, "Bearer k", "t1"), replayed)
+
+    def test_last_waiter_closes_upstream(self):
+        """Test the stream stays open while anyone waits and closes after the last one leaves"""
+        first, second = self.join(), self.join()
+        self.assertTrue(wait_until(lambda: self.streams))
+        first.close()
+        self.assertFalse(self.streams[0].closed)
+        second.close()
+        self.assertTrue(wait_until(lambda: self.streams[0].closed))
+        self.assertEqual(self.manager.active(), 0)
+        self.assertIsNone(self.manager.latest(AGENT_URL, "Bearer k", "t1"))
+
+    def test_slow_waiter_keeps_newest(self):
+        """Test a waiter that does not read drops its oldest updates, not the latest"""
+        slow, fast = self.join(), self.join()
+        self.assertTrue(wait_until(lambda: self.streams))
+        for index in range(WAITER_QUEUE_SIZE * 2):
+            self.streams[0].send({**status("working"), "status": {"state": "working", "step": index}})
+            self.assertEqual(fast.get(5)["status"]["step"], index)
+
+        self.assertEqual(slow.dropped, WAITER_QUEUE_SIZE)
+        updates = [slow.get(0) for _ in range(WAITER_QUEUE_SIZE)]
+        self.assertEqual(updates[-1]["status"]["step"], WAITER_QUEUE_SIZE * 2 - 1)
+
+    def test_terminal_state_ends_subscription(self):
+        waiter = self.join()
+        self.assertTrue(wait_until(lambda: self.streams))
+        self.streams[0].send(status("completed"))
+        self.assertEqual(waiter.get(5)["status"]["state"], "completed")
+        self.assertIsNone(waiter.get(5))
+        self.assertTrue(waiter.ended)
+        self.assertTrue(self.streams[0].closed)
+        self.assertEqual(self.manager.active(), 0)
+
+    def test_dropped_stream_is_reopened(self):
+        """Test the stream is resubscribed when it ends before the task does"""
+        waiter = self.join()
+        self.assertTrue(wait_until(lambda: self.streams))
+        with patch("tools.subscriptions.RECONNECT_DELAY_SECONDS", 0):
+            self.streams[0].end()
+            self.assertTrue(wait_until(lambda: len(self.streams) == 2))
+        self.streams[1].send(status("working"))
+        self.assertEqual(waiter.get(5)["status"]["state"], "working")
+
+    def test_unsupported_agent(self):
+        """Test an agent rejecting tasks/resubscribe is remembered and waiters are released"""
+        waiter = self.join()
+        self.assertTrue(wait_until(lambda: self.streams))
+        self.streams[0].send(error={"code": -32004, "message": "Unsupported operation"})
+        self.assertIsNone(waiter.get(5))
+        self.assertTrue(waiter.ended)
+        self.assertFalse(self.manager.supported(AGENT_URL))
+
+
+class TestWaitingStatus(unittest.TestCase):
+    """Test get_task_status waits on a stream shared by concurrent callers"""
+
+    def setUp(self):
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "subscribe_agent",
+            "agent_1_url": AGENT_URL,
+            "agent_1_auth_type": "none"
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        subscription_manager.clear()
+        duration_estimator.clear()
+        self.addCleanup(subscription_manager.clear)
+        self.addCleanup(duration_estimator.clear)
+
+    def status(self, results, **parameters):
+        results.append(json.loads(next(GetTaskStatusTool(self.mock_runtime)._invoke({
+            "agent_name": "subscribe_agent", "task_id": "t1", "output_mode": "status-only", **parameters
+        })).text))
+
+    @patch('requests.Session.post')
+    def test_concurrent_waiters_share_stream(self, mock_post):
+        stream = FakeStream()
+
+        def post(url, **kwargs):
+            if kwargs["json"]["method"] == "tasks/resubscribe":
+                return stream
+            response = MagicMock()
+            response.json.return_value = {
+                "jsonrpc": "2.0", "result": {"kind": "task", "id": "t1", "status": {"state": "working"}}, "id": "1"
+            }
+            return response
+        mock_post.side_effect = post
+
+        results = []
+        threads = [threading.Thread(target=self.status, args=(results,), kwargs={"wait_seconds": 10}) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(wait_until(lambda: sum(
+            len(s.waiters) for s in subscription_manager._subscriptions.values()
+        ) == 3))
+        stream.send(status("completed"))
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual([r["status"]["state"] for r in results], ["completed"] * 3)
+        methods = [c.kwargs["json"]["method"] for c in mock_post.call_args_list]
+        self.assertEqual(methods.count("tasks/resubscribe"), 1)
+        self.assertTrue(stream.closed)
+
+    @patch('requests.Session.post')
+    def test_wait_times_out_with_current_state(self, mock_post):
+        stream = FakeStream()
+
+        def post(url, **kwargs):
+            if kwargs["json"]["method"] == "tasks/resubscribe":
+                return stream
+            response = MagicMock()
+            response.json.return_value = {
+                "jsonrpc": "2.0", "result": {"kind": "task", "id": "t1", "status": {"state": "working"}}, "id": "1"
+            }
+            return response
+        mock_post.side_effect = post
+
+        results = []
+        self.status(results, wait_seconds=0.2)
+        self.assertEqual(results[0]["status"]["state"], "working")
+        self.assertIn("pollHint", results[0])
+        self.assertTrue(wait_until(lambda: stream.closed))
+
+    def test_invalid_wait_seconds(self):
+        text = next(GetTaskStatusTool(self.mock_runtime)._invoke({
+            "agent_name": "subscribe_agent", "task_id": "t1", "wait_seconds": "soon"
+        })).text
+        self.assertEqual(text, "Invalid wait_seconds 'soon'.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+# Mock dify_plugin before importing tools
+mock_dify_plugin = MagicMock()
+sys.modules["dify_plugin"] = mock_dify_plugin
+sys.modules["dify_plugin.entities.tool"] = MagicMock()
+
+# Mock ToolInvokeMessage
+class MockToolInvokeMessage:
+    def __init__(self, text):
+        self.text = text
+
+# Mock Tool class
+class MockTool:
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def create_text_message(self, text):
+        return MockToolInvokeMessage(text)
+
+mock_dify_plugin.Tool = MockTool
+mock_dify_plugin.entities.tool.ToolInvokeMessage = MockToolInvokeMessage
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import agent_cards
+from tools.get_task_status import GetTaskStatusTool
+from tools.persistent_store import scoped_key
+from tools.rate_limit import reset_limiters
+from tools.task_durations import (
+    MAX_POLL_SECONDS, MIN_SAMPLES, DurationEstimator, DurationHistogram, duration_estimator
+)
+
+AGENT_URL = "https://durations.example.com"
+
+
+class Clock:
+    """Drives time.monotonic inside tools.task_durations"""
+
+    def __init__(self):
+        self.now = 1000.0
+        patcher = patch("tools.task_durations.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.stop = patcher.stop
+
+
+class TestDurationHistogram(unittest.TestCase):
+    """Test the rolling duration histogram"""
+
+    def test_quantile_is_conditional_on_elapsed(self):
+        """Test quantiles only consider tasks that ran at least as long as this one"""
+        histogram = DurationHistogram()
+        for seconds in [10] * 10 + [100] * 10:
+            histogram.add(seconds)
+
+        self.assertLess(histogram.quantile_after(0, 0.5), 20)
+        # Once past the short tasks, only the long ones remain
+        self.assertGreater(histogram.quantile_after(30, 0.5), 60)
+        self.assertLess(histogram.quantile_after(30, 0.5), 160)
+        self.assertIsNone(histogram.quantile_after(1000, 0.5))
+
+    def test_old_samples_roll_out(self):
+        """Test only the last max_samples durations count"""
+        histogram = DurationHistogram(max_samples=5)
+        for seconds in [1000] * 5 + [5] * 5:
+            histogram.add(seconds)
+        self.assertEqual(len(histogram), 5)
+        self.assertEqual(sum(histogram.counts), 5)
+        self.assertLess(histogram.quantile_after(0, 0.99), 10)
+
+
+class TestDurationEstimator(unittest.TestCase):
+    """Test poll hints learned from observed task durations"""
+
+    def setUp(self):
+        self.estimator = DurationEstimator()
+        self.clock = Clock()
+        self.addCleanup(self.clock.stop)
+
+    def run_task(self, task_id, seconds):
+        self.estimator.started(AGENT_URL, "Bearer k", task_id)
+        self.clock.now += seconds
+        self.assertIsNone(self.estimator.observe(AGENT_URL, "Bearer k", task_id, "completed"))
+
+    def test_hint_follows_history(self):
+        """Test the estimate and next poll come from the agent's past durations"""
+        for index in range(MIN_SAMPLES * 2):
+            self.run_task(f"done-{index}", 60)
+
+        self.estimator.started(AGENT_URL, "Bearer k", "t1")
+        self.clock.now += 10
+        hint = self.estimator.observe(AGENT_URL, "Bearer k", "t1", "working")
+
+        self.assertEqual(hint["elapsedSeconds"], 10)
+        self.assertEqual(hint["basedOnSamples"], MIN_SAMPLES * 2)
+        self.assertGreater(hint["estimatedRemainingSeconds"], 30)
+        self.assertLess(hint["estimatedRemainingSeconds"], 80)
+        self.assertEqual(hint["nextPollSeconds"], hint["estimatedRemainingSeconds"])
+        self.assertIn("estimatedCompletionAt", hint)
+
+    def test_backoff_without_history(self):
+        """Test tasks with no comparable history back off with their age, within bounds"""
+        self.estimator.started(AGENT_URL, "Bearer k", "t1")
+        self.clock.now += 40
+        hint = self.estimator.observe(AGENT_URL, "Bearer k", "t1", "working")
+        self.assertEqual(hint["nextPollSeconds"], 20)
+        self.assertNotIn("estimatedRemainingSeconds", hint)
+
+        self.clock.now += 10000
+        self.assertEqual(self.estimator.observe(AGENT_URL, "Bearer k", "t1", "working")["nextPollSeconds"], MAX_POLL_SECONDS)
+
+    def test_tasks_not_seen_submitted_are_not_samples(self):
+        """Test tasks first seen by a poll are timed for hints but never recorded"""
+        self.assertEqual(self.estimator.observe(AGENT_URL, "Bearer k", "t1", "working")["elapsedSeconds"], 0)
+        self.clock.now += 30
+        self.assertEqual(self.estimator.observe(AGENT_URL, "Bearer k", "t1", "working")["elapsedSeconds"], 30)
+        self.estimator.observe(AGENT_URL, "Bearer k", "t1", "completed")
+        self.assertEqual(self.estimator.samples(AGENT_URL), 0)
+
+    def test_finished_by_push_key(self):
+        """Test a completion reported under the push receiver's key is recorded once"""
+        self.estimator.started(AGENT_URL, "Bearer k", "t1")
+        self.clock.now += 12
+        self.assertAlmostEqual(self.estimator.finished(scoped_key(AGENT_URL, "Bearer k", "t1")), 12)
+        self.assertIsNone(self.estimator.observe(AGENT_URL, "Bearer k", "t1", "completed"))
+        self.assertEqual(self.estimator.samples(AGENT_URL + "/"), 1)
+
+
+class TestPollHintOutput(unittest.TestCase):
+    """Test get_task_status returns poll hints for running tasks only"""
+
+    def setUp(self):
+        self.mock_runtime = MagicMock()
+        self.mock_runtime.credentials = {
+            "agent_1_name": "durations_agent",
+            "agent_1_url": AGENT_URL,
+            "agent_1_auth_type": "none"
+        }
+        agent_cards.clear_card_cache()
+        reset_limiters()
+        duration_estimator.clear()
+        self.addCleanup(duration_estimator.clear)
+
+    @patch('requests.Session.post')
+    def test_hint_only_while_running(self, mock_post):
+        def poll(state):
+            response = MagicMock()
+            response.json.return_value = {
+                "jsonrpc": "2.0", "result": {"kind": "task", "id": "t1", "status": {"state": state}}, "id": "1"
+            }
+            mock_post.return_value = response
+            return json.loads(next(GetTaskStatusTool(self.mock_runtime)._invoke({
+                "agent_name": "durations_agent", "task_id": "t1", "output_mode": "status-only"
+            })).text)
+
+        duration_estimator.started(AGENT_URL, "", "t1")
+        self.assertIn("nextPollSeconds", poll("working")["pollHint"])
+        self.assertNotIn("pollHint", poll("completed"))
+        self.assertEqual(duration_estimator.samples(AGENT_URL), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
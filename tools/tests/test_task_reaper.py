@@ -0,0 +1,164 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools import task_reaper
+from tools.rate_limit import AgentLimiter
+from tools.task_reaper import REAPER_IDLE_ENV, TaskReaper, get_reaper
+from tools.transports import JSONRPC, AgentEndpoint
+
+AGENT_URL = "https://agent.example.com"
+HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer k"}
+
+
+def cancel_reply(task_id, error=None):
+    response = MagicMock()
+    if error:
+        response.json.return_value = {"jsonrpc": "2.0", "error": error, "id": "1"}
+    else:
+        response.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": task_id, "status": {"state": "canceled"}}, "id": "1"
+        }
+    return response
+
+
+def agent_reply(url, **kwargs):
+    """tasks/get finds the task still working; tasks/cancel cancels it"""
+    task_id = kwargs['json']['params']['id']
+    if kwargs['json']['method'] == "tasks/get":
+        response = MagicMock()
+        response.json.return_value = {
+            "jsonrpc": "2.0", "result": {"kind": "task", "id": task_id, "status": {"state": "working"}}, "id": "1"
+        }
+        return response
+    return cancel_reply(task_id)
+
+
+class TestTaskReaper(unittest.TestCase):
+    """Test the orphaned-task reaper"""
+
+    def setUp(self):
+        self.reaper = TaskReaper(idle_seconds=60)
+        # Sweeps are driven by the tests, not the background thread
+        self.reaper._thread = MagicMock()
+        self.endpoint = AgentEndpoint(JSONRPC, AGENT_URL)
+
+    def track(self, task_id):
+        self.reaper.track(AGENT_URL, self.endpoint, HEADERS, AgentLimiter(), task_id)
+
+    def later(self, seconds):
+        return patch("tools.task_reaper.time.monotonic", return_value=time.monotonic() + seconds)
+
+    @patch('requests.Session.post')
+    def test_idle_tasks_are_canceled(self, mock_post):
+        """Test only tasks nobody polled within the idle window are cancelled"""
+        mock_post.side_effect = agent_reply
+        self.track("orphan")
+        self.track("watched")
+        self.track("finished")
+
+        with self.later(50):
+            self.reaper.touch(AGENT_URL, "Bearer k", "watched", "working")
+        self.reaper.touch(AGENT_URL, "Bearer k", "finished", "completed")
+
+        with self.later(61):
+            self.assertEqual(self.reaper.reap(), ["orphan"])
+        self.assertEqual(mock_post.call_args.kwargs['json']['method'], "tasks/cancel")
+        self.assertEqual(mock_post.call_args.kwargs['headers']['Authorization'], "Bearer k")
+        self.assertEqual(self.reaper.tracked(), 1)
+        self.assertEqual(self.reaper.reaped, 1)
+
+        with self.later(111):
+            self.assertEqual(self.reaper.reap(), ["watched"])
+        self.assertEqual(self.reaper.tracked(), 0)
+
+    @patch('requests.Session.post')
+    def test_hinted_poll_delay_is_not_idle(self, mock_post):
+        """Test a caller told to wait longer than the idle window is not reaped meanwhile"""
+        mock_post.side_effect = agent_reply
+        self.track("t1")
+        self.reaper.touch(AGENT_URL, "Bearer k", "t1", "working", next_poll=300)
+        with self.later(200):
+            self.assertEqual(self.reaper.reap(), [])
+        with self.later(301):
+            self.assertEqual(self.reaper.reap(), ["t1"])
+
+    @patch('requests.Session.post')
+    def test_polls_are_scoped_by_credential(self, mock_post):
+        """Test a poll with another credential does not keep a task alive"""
+        mock_post.side_effect = agent_reply
+        self.track("t1")
+        with self.later(50):
+            self.reaper.touch(AGENT_URL, "Bearer other", "t1", "working")
+        with self.later(61):
+            self.assertEqual(self.reaper.reap(), ["t1"])
+
+    @patch('requests.Session.post')
+    def test_refused_and_failed_cancels_are_dropped(self, mock_post):
+        """Test tasks the agent will not cancel are not retried forever"""
+        import requests
+
+        mock_post.side_effect = [
+            agent_reply(AGENT_URL, json={"method": "tasks/get", "params": {"id": "t1"}}),
+            cancel_reply("t1", error={"code": -32002, "message": "Task cannot be canceled"}),
+            requests.exceptions.ConnectionError("down"),
+            requests.exceptions.ConnectionError("down")
+        ]
+        self.track("t1")
+        self.track("t2")
+        with self.later(61):
+            self.assertEqual(self.reaper.reap(), [])
+        self.assertEqual(self.reaper.tracked(), 0)
+
+    @patch('requests.Session.post')
+    def test_finished_tasks_are_not_canceled(self, mock_post):
+        """Test tasks known to be terminal, locally or from tasks/get, are dropped without a cancel"""
+        from tools.persistent_store import scoped_key
+        from tools.subscriptions import subscription_manager
+
+        def reply(url, **kwargs):
+            task_id = kwargs['json']['params']['id']
+            response = MagicMock()
+            response.json.return_value = {
+                "jsonrpc": "2.0", "result": {"kind": "task", "id": task_id, "status": {"state": "completed"}}, "id": "1"
+            }
+            return response
+        mock_post.side_effect = reply
+        self.track("streamed")
+        self.track("unpolled")
+
+        streamed = {"kind": "task", "id": "streamed", "status": {"state": "completed"}}
+        with patch.object(subscription_manager, "latest",
+                          side_effect=lambda base_url, credential, task_id: streamed if task_id == "streamed" else None):
+            with self.later(61):
+                self.assertEqual(self.reaper.reap(), [])
+
+        self.assertEqual([c.kwargs['json']['method'] for c in mock_post.call_args_list], ["tasks/get"])
+        self.assertEqual(self.reaper.tracked(), 0)
+
+        self.track("pushed")
+        self.reaper.finished(scoped_key(AGENT_URL, "Bearer k", "pushed"))
+        self.assertEqual(self.reaper.tracked(), 0)
+
+    def test_forget(self):
+        """Test tasks cancelled by hand are no longer tracked"""
+        self.track("t1")
+        self.reaper.forget(AGENT_URL, "Bearer k", "t1")
+        self.assertEqual(self.reaper.tracked(), 0)
+
+    def test_disabled_by_default(self):
+        """Test the reaper only exists when an idle window is configured"""
+        with patch.object(task_reaper, "_reaper", None):
+            with patch.dict(os.environ, {REAPER_IDLE_ENV: ""}):
+                self.assertIsNone(get_reaper())
+            with patch.dict(os.environ, {REAPER_IDLE_ENV: "900"}):
+                self.assertEqual(get_reaper().idle_seconds, 900)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import json
+import sys
+import os
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.task_views import TaskDeltaTracker, project_task
+
+
+def make_task(state="working", history_size=50, artifacts=None):
+    return {
+        "kind": "task",
+        "id": "task-1",
+        "contextId": "ctx-1",
+        "status": {
+            "state": state,
+            "timestamp": "2025-01-01T00:00:00Z",
+            "message": {"kind": "message", "role": "agent", "messageId": "s1",
+                        "parts": [{"kind": "text", "text": "Crunching numbers"}]}
+        },
+        "history": [
+            {"kind": "message", "role": "agent", "messageId": f"m{i}",
+             "parts": [{"kind": "text", "text": "progress " * 40}]}
+            for i in range(history_size)
+        ],
+        "artifacts": artifacts or []
+    }
+
+
+class TestProjectTask(unittest.TestCase):
+    """Test cases for get_task_status output projections"""
+
+    def test_full_is_unchanged(self):
+        """Test full mode returns the task as-is"""
+        task = make_task()
+        self.assertIs(project_task(task, "full"), task)
+
+    def test_status_only_is_an_order_of_magnitude_smaller(self):
+        """Test status-only drops history and artifacts"""
+        task = make_task()
+        view = project_task(task, "status-only")
+
+        self.assertEqual(view, {
+            "id": "task-1",
+            "contextId": "ctx-1",
+            "status": {"state": "working", "timestamp": "2025-01-01T00:00:00Z", "message": "Crunching numbers"}
+        })
+        self.assertLess(len(json.dumps(view)) * 10, len(json.dumps(task)))
+
+    def test_final_artifacts_keeps_artifacts(self):
+        """Test final-artifacts keeps artifacts but not history"""
+        artifact = {"artifactId": "a1", "parts": [{"kind": "text", "text": "report"}]}
+        view = project_task(make_task("completed", artifacts=[artifact]), "final-artifacts")
+
+        self.assertEqual(view["artifacts"], [artifact])
+        self.assertEqual(view["status"]["state"], "completed")
+        self.assertNotIn("history", view)
+
+
+class TestTaskDeltaTracker(unittest.TestCase):
+    """Test cases for delta mode"""
+
+    def test_only_changes_are_returned(self):
+        """Test first poll returns everything, later polls only what changed since their cursor"""
+        tracker = TaskDeltaTracker()
+
+        first = tracker.delta("agent", make_task(history_size=2))
+        self.assertEqual(len(first["newMessages"]), 2)
+        self.assertIn("status", first)
+
+        second = tracker.delta("agent", make_task(history_size=2), first["since"])
+        self.assertEqual(second, {"id": "task-1", "state": "working", "since": first["since"], "unchanged": True})
+
+        artifact = {"artifactId": "a1", "parts": [{"kind": "text", "text": "done"}]}
+        third = tracker.delta("agent", make_task("completed", history_size=3, artifacts=[artifact]), second["since"])
+        self.assertEqual([m["messageId"] for m in third["newMessages"]], ["m2"])
+        self.assertEqual(third["updatedArtifacts"], [artifact])
+        self.assertEqual(third["status"]["state"], "completed")
+
+    def test_callers_keep_their_own_cursor(self):
+        """Test two runs polling the same task both see every change"""
+        tracker = TaskDeltaTracker()
+        run_a = tracker.delta("agent", make_task(history_size=1))["since"]
+        run_b = tracker.delta("agent", make_task(history_size=1))["since"]
+
+        a = tracker.delta("agent", make_task(history_size=2), run_a)
+        b = tracker.delta("agent", make_task(history_size=2), run_b)
+        self.assertEqual([m["messageId"] for m in a["newMessages"]], ["m1"])
+        self.assertEqual(b["newMessages"], a["newMessages"])
+        self.assertEqual(a["since"], b["since"])
+
+    def test_cursors_scoped_by_credential(self):
+        """Test a cursor from one scope is not found under another"""
+        tracker = TaskDeltaTracker()
+        cursor = tracker.delta("agent:cred-a", make_task(history_size=1))["since"]
+        other = tracker.delta("agent:cred-b", make_task(history_size=1), cursor)
+        self.assertTrue(other["resynced"])
+        self.assertEqual(len(other["newMessages"]), 1)
+
+    def test_agents_tracked_separately_and_bounded(self):
+        """Test snapshots are per agent and capped"""
+        tracker = TaskDeltaTracker(max_tasks=1)
+        cursor = tracker.delta("agent-a", make_task(history_size=1))["since"]
+        tracker.delta("agent-b", make_task(history_size=1))
+
+        again = tracker.delta("agent-a", make_task(history_size=1), cursor)
+        self.assertNotIn("unchanged", again)
+        self.assertTrue(again["resynced"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to import tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tools.transports import (
+    HTTP_JSON,
+    JSONRPC,
+    AgentEndpoint,
+    read_event,
+    read_result,
+    select_endpoint,
+    send_request
+)
+
+BASE = "https://agent.example.com/a2a"
+
+
+def json_response(status, body):
+    response = MagicMock()
+    response.status_code = status
+    response.json.return_value = body
+    return response
+
+
+class TestSelectEndpoint(unittest.TestCase):
+    """Test cases for transport negotiation from the Agent Card"""
+
+    def test_no_card_defaults_to_jsonrpc(self):
+        """Test agents without a cached card keep using JSON-RPC at the configured URL"""
+        self.assertEqual(select_endpoint(BASE, None), AgentEndpoint(JSONRPC, BASE))
+
+    def test_preferred_transport_used_at_configured_url(self):
+        """Test a supported preferredTransport is used at the configured URL, not the card's"""
+        card = {"url": "http://localhost:9999/a2a", "preferredTransport": "HTTP+JSON"}
+        self.assertEqual(select_endpoint(BASE, card), AgentEndpoint(HTTP_JSON, BASE))
+
+    def test_unsupported_preference_falls_back_to_interfaces(self):
+        """Test a gRPC-preferring agent is reached through a supported additional interface"""
+        card = {
+            "url": "http://localhost:9999/a2a",
+            "preferredTransport": "GRPC",
+            "additionalInterfaces": [
+                {"transport": "GRPC", "url": "localhost:50051"},
+                {"transport": "HTTP+JSON", "url": "http://localhost:9999/a2a/rest"},
+                {"transport": "JSONRPC", "url": "https://rpc.example.com/jsonrpc"}
+            ],
+            "capabilities": {"streaming": False}
+        }
+        endpoint = select_endpoint(BASE, card)
+        self.assertEqual(endpoint.transport, JSONRPC)
+        self.assertEqual(endpoint.url, "https://rpc.example.com/jsonrpc")
+        self.assertFalse(endpoint.streaming)
+
+        card["additionalInterfaces"].pop()
+        self.assertEqual(select_endpoint(BASE, card), AgentEndpoint(HTTP_JSON, BASE + "/rest", False))
+
+        card["additionalInterfaces"] = []
+        self.assertEqual(select_endpoint(BASE, card).transport, JSONRPC)
+
+
+class TestHttpJsonBinding(unittest.TestCase):
+    """Test cases for the HTTP+JSON (REST) binding"""
+
+    endpoint = AgentEndpoint(HTTP_JSON, BASE)
+
+    @patch('requests.Session.get')
+    def test_tasks_get_route(self, mock_get):
+        """Test tasks/get is a GET with the task id in the path"""
+        send_request(self.endpoint, "tasks/get", {"id": "t 1", "historyLength": 2}, {}, 30)
+
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], BASE + "/v1/tasks/t%201")
+        self.assertEqual(kwargs['params'], {"historyLength": 2})
+
+    @patch('requests.Session.post')
+    def test_message_routes(self, mock_post):
+        """Test message/send and message/stream post their params without a JSON-RPC envelope"""
+        params = {"message": {"kind": "message"}, "configuration": {"blocking": False}}
+        send_request(self.endpoint, "message/send", params, {}, 30)
+        send_request(self.endpoint, "message/stream", {"message": {}}, {}, 60, stream=True)
+
+        first, second = mock_post.call_args_list
+        self.assertEqual(first.args[0], BASE + "/v1/message:send")
+        self.assertEqual(first.kwargs['json'], params)
+        self.assertEqual(second.args[0], BASE + "/v1/message:stream")
+        self.assertTrue(second.kwargs['stream'])
+
+    def test_results_are_normalized(self):
+        """Test oneof wrappers and TASK_STATE_* enums are mapped to the JSON-RPC shapes"""
+        result, error = read_result(self.endpoint, json_response(200, {
+            "task": {"id": "t1", "status": {"state": "TASK_STATE_INPUT_REQUIRED"}}
+        }))
+        self.assertIsNone(error)
+        self.assertEqual(result, {"id": "t1", "kind": "task", "status": {"state": "input-required"}})
+
+        result, _ = read_event(self.endpoint, {"statusUpdate": {"taskId": "t1", "final": True}})
+        self.assertEqual(result["kind"], "status-update")
+
+        plain = {"kind": "task", "id": "t2", "status": {"state": "working"}}
+        self.assertEqual(read_result(self.endpoint, json_response(200, plain)), (plain, None))
+
+    def test_client_errors_become_a2a_errors(self):
+        """Test 4xx problem responses are reported as A2A errors rather than network errors"""
+        result, error = read_result(self.endpoint, json_response(404, {"message": "Task not found"}))
+        self.assertIsNone(result)
+        self.assertEqual(error, {"code": 404, "message": "Task not found"})
+
+
+class TestJsonRpcBinding(unittest.TestCase):
+    """Test cases for the JSON-RPC binding"""
+
+    @patch('requests.Session.post')
+    def test_envelope(self, mock_post):
+        """Test calls are wrapped in a JSON-RPC 2.0 request posted to the endpoint URL"""
+        send_request(AgentEndpoint(JSONRPC, BASE), "tasks/get", {"id": "t1"}, {"X": "1"}, 30)
+
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args[0], BASE)
+        self.assertEqual(kwargs['json']['jsonrpc'], "2.0")
+        self.assertEqual(kwargs['json']['method'], "tasks/get")
+        self.assertEqual(kwargs['json']['params'], {"id": "t1"})
+        self.assertEqual(kwargs['headers'], {"X": "1"})
+
+    def test_read_result(self):
+        """Test result and error members are split out of the response"""
+        endpoint = AgentEndpoint(JSONRPC, BASE)
+        self.assertEqual(read_result(endpoint, json_response(200, {"result": {"id": "t"}})), ({"id": "t"}, None))
+        self.assertEqual(
+            read_result(endpoint, json_response(200, {"error": {"code": -32001}})), (None, {"code": -32001})
+        )
+        self.assertEqual(read_event(endpoint, json.loads('{"result": {"taskId": "t"}}')), ({"taskId": "t"}, None))
+
+    def test_non_object_response_is_a_protocol_error(self):
+        """Test a JSON-RPC body that is not an object raises JSONDecodeError like an unparseable one"""
+        endpoint = AgentEndpoint(JSONRPC, BASE)
+        for body in (["result"], "ok", None, 3):
+            with self.assertRaises(json.JSONDecodeError):
+                read_result(endpoint, json_response(200, body))
+
+
+if __name__ == '__main__':
+    unittest.main()
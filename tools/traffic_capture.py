@@ -0,0 +1,211 @@
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import json
+import os
+import re
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from tools.sse import SSEParser
+
+# Set to a file path to append every request/response the plugin makes to it as JSONL
+TRAFFIC_CAPTURE_ENV = "A2A_TRAFFIC_CAPTURE"
+
+# Response bodies larger than this (or not JSON/text) are recorded by size only
+MAX_CAPTURED_BODY_BYTES = 1024 * 1024
+
+REDACTED = "[REDACTED]"
+
+# Words that mark a header, query parameter or JSON field name as secret. Names are
+# split into words (X-Api-Key, access_token, clientSecret), and only whole words
+# match, so fields such as "design" or "assigned" are kept.
+_SECRET_WORDS = frozenset(("authorization", "cookie", "apikey", "token", "secret", "password",
+                           "signature", "sign", "credential", "credentials"))
+
+# Adjacent words that are secret together, e.g. api-key
+_SECRET_WORD_PAIRS = frozenset((("api", "key"),))
+
+_CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+_WORD_SEPARATOR = re.compile(r"[^a-z0-9]+")
+
+
+def _is_secret(name: str) -> bool:
+    words = [w for w in _WORD_SEPARATOR.split(_CAMEL_BOUNDARY.sub(r"\1 \2", name).lower()) if w]
+    return any(word in _SECRET_WORDS for word in words) or any(pair in _SECRET_WORD_PAIRS for pair in zip(words, words[1:]))
+
+
+def redact_headers(headers: Any) -> dict[str, str]:
+    return {name: REDACTED if _is_secret(name) else str(value) for name, value in dict(headers or {}).items()}
+
+
+def redact_url(url: str) -> str:
+    """
+    Drop user:pass@ userinfo and redact secret query parameters.
+    """
+    parts = urlsplit(url)
+    if "@" in parts.netloc:
+        parts = parts._replace(netloc=parts.netloc.rpartition("@")[2])
+    elif not parts.query:
+        return url
+    query = [(name, REDACTED if _is_secret(name) else value) for name, value in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def redact_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: REDACTED if _is_secret(str(k)) else redact_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact_json(item) for item in value]
+    return value
+
+
+def _decode_body(body: Any, content_type: str) -> Any:
+    """
+    Decode a captured body: parsed JSON (redacted), text, or just its size.
+    """
+    if body is None:
+        return None
+    if not isinstance(body, (bytes, str)):
+        return {"streamed": True}
+    if len(body) > MAX_CAPTURED_BODY_BYTES:
+        return {"bytes": len(body)}
+    if "json" in content_type or content_type == "":
+        try:
+            return redact_json(json.loads(body))
+        except ValueError:
+            pass
+    if content_type.startswith("text/") or "json" in content_type:
+        return body.decode("utf-8", errors="replace") if isinstance(body, bytes) else body
+    return {"bytes": len(body)}
+
+
+class TrafficRecorder:
+    """
+    Appends one JSON line per HTTP exchange to a capture file: request, response status,
+    headers and body, timings, and for SSE responses every event with its offset.
+    Secrets in headers, query strings and JSON bodies are redacted before writing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError:
+                pass  # Capture is best-effort and must never break a tool call
+
+
+class CapturingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that records every exchange through a TrafficRecorder.
+    Streamed SSE responses are recorded event by event as the caller reads them,
+    and written once the stream ends or is closed.
+    """
+
+    def __init__(self, recorder: TrafficRecorder, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def send(self, request: Any, stream: bool = False, **kwargs: Any) -> Any:
+        started = time.monotonic()
+        request_headers = dict(request.headers or {})
+        record: dict[str, Any] = {
+            "timestamp": time.time(),
+            "method": request.method,
+            "url": redact_url(request.url),
+            "request_headers": redact_headers(request_headers),
+            "request_body": _decode_body(request.body, request_headers.get("Content-Type", "")),
+        }
+
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            record["elapsed_ms"] = round((time.monotonic() - started) * 1000, 3)
+            self.recorder.write(record)
+            raise
+
+        content_type = response.headers.get("Content-Type", "")
+        record["status"] = response.status_code
+        record["response_headers"] = redact_headers(response.headers)
+        record["elapsed_ms"] = round((time.monotonic() - started) * 1000, 3)
+
+        if not stream:
+            record["response_body"] = _decode_body(response.content, content_type)
+            record["duration_ms"] = record["elapsed_ms"]
+            self.recorder.write(record)
+        elif content_type.startswith("text/event-stream"):
+            self._capture_events(response, record, started)
+        else:
+            # Streamed downloads (e.g. Dify files) are recorded without their content
+            record["response_body"] = {"streamed": True}
+            record["duration_ms"] = record["elapsed_ms"]
+            self.recorder.write(record)
+        return response
+
+    def _capture_events(self, response: Any, record: dict[str, Any], started: float) -> None:
+        record["events"] = []
+        parser = SSEParser()
+        finished = threading.Event()
+        read_content = response.iter_content
+        close = response.close
+
+        def finish() -> None:
+            if not finished.is_set():
+                finished.set()
+                record["duration_ms"] = round((time.monotonic() - started) * 1000, 3)
+                self.recorder.write(record)
+
+        def iter_content(chunk_size: int = 1, decode_unicode: bool = False):
+            try:
+                for chunk in read_content(chunk_size, decode_unicode):
+                    offset = round((time.monotonic() - started) * 1000, 3)
+                    for event in parser.feed(chunk):
+                        try:
+                            data = redact_json(json.loads(event.data))
+                        except ValueError:
+                            data = event.data
+                        record["events"].append({
+                            "offset_ms": offset, "event": event.event, "id": event.id, "data": data
+                        })
+                    yield chunk
+            finally:
+                finish()
+
+        def close_and_finish() -> None:
+            close()
+            finish()
+
+        response.iter_content = iter_content
+        response.close = close_and_finish
+
+
+_recorder: Optional[TrafficRecorder] = None
+_recorder_path: Optional[str] = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> Optional[TrafficRecorder]:
+    """
+    Return the process-wide recorder, or None when capture is disabled.
+    """
+    global _recorder, _recorder_path
+    path = os.environ.get(TRAFFIC_CAPTURE_ENV, "").strip()
+    if not path:
+        return None
+
+    with _recorder_lock:
+        if _recorder is None or _recorder_path != path:
+            try:
+                _recorder = TrafficRecorder(path)
+                _recorder_path = path
+            except OSError:
+                return None
+        return _recorder
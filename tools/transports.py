@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+import json
+from tools.file_parts import InlineFile, request_payload
+from tools.http_pool import get_session
+
+if TYPE_CHECKING:
+    import requests
+
+JSONRPC = "JSONRPC"
+HTTP_JSON = "HTTP+JSON"
+GRPC = "GRPC"
+
+# Transports this plugin speaks, in order of preference when the card leaves a choice.
+# gRPC needs grpcio and the generated A2A stubs, which the plugin does not ship.
+SUPPORTED_TRANSPORTS = (JSONRPC, HTTP_JSON)
+
+_TRANSPORT_ALIASES = {
+    "JSONRPC": JSONRPC, "JSON-RPC": JSONRPC, "JSON_RPC": JSONRPC,
+    "HTTP+JSON": HTTP_JSON, "HTTP_JSON": HTTP_JSON, "REST": HTTP_JSON, "HTTP": HTTP_JSON,
+    "GRPC": GRPC
+}
+
+# JSON-RPC method -> (HTTP verb, path) in the A2A HTTP+JSON binding
+_REST_ROUTES = {
+    "message/send": ("POST", "/v1/message:send"),
+    "message/stream": ("POST", "/v1/message:stream"),
+    "tasks/get": ("GET", "/v1/tasks/{id}"),
+    "tasks/cancel": ("POST", "/v1/tasks/{id}:cancel"),
+    "tasks/resubscribe": ("POST", "/v1/tasks/{id}:subscribe")
+}
+
+# Oneof wrappers used by HTTP+JSON servers that serialize the protobuf messages directly
+_REST_WRAPPERS = {
+    "task": "task", "message": "message", "msg": "message",
+    "statusUpdate": "status-update", "artifactUpdate": "artifact-update"
+}
+
+
+@dataclass(frozen=True)
+class AgentEndpoint:
+    """Where and how to reach an agent, as negotiated from its Agent Card."""
+    transport: str
+    url: str
+    # False only when the card explicitly says capabilities.streaming is false
+    streaming: bool = True
+
+
+def normalize_transport(name: Any) -> str:
+    """
+    Canonical transport name for a card value ("JSONRPC", "HTTP+JSON", "GRPC", ...).
+    """
+    key = str(name or JSONRPC).strip().upper()
+    return _TRANSPORT_ALIASES.get(key, key)
+
+
+def _rebase(url: str, card_url: str, base_url: str) -> str:
+    """
+    Map a URL advertised by the card onto the configured base URL.
+    Cards often advertise an internal address (e.g. http://localhost:9999); the
+    configured base URL is the one known to work from here.
+    """
+    if not card_url:
+        return url
+    card_root = card_url.rstrip("/")
+    if url.rstrip("/") == card_root:
+        return base_url
+    if url.startswith(card_root + "/"):
+        return base_url.rstrip("/") + url[len(card_root):]
+    return url
+
+
+def select_endpoint(base_url: str, card: Optional[dict[str, Any]]) -> AgentEndpoint:
+    """
+    Pick the transport to use for an agent from its (cached) Agent Card.
+    The card's preferredTransport wins when supported; otherwise the first supported
+    entry of additionalInterfaces in SUPPORTED_TRANSPORTS order. Without a card,
+    or without any supported interface, JSON-RPC at the configured URL is used.
+    """
+    if not card:
+        return AgentEndpoint(JSONRPC, base_url)
+
+    streaming = (card.get("capabilities") or {}).get("streaming") is not False
+    card_url = str(card.get("url") or "")
+    preferred = normalize_transport(card.get("preferredTransport"))
+
+    interfaces = {preferred: base_url}
+    for interface in card.get("additionalInterfaces") or []:
+        if not isinstance(interface, dict) or not interface.get("url"):
+            continue
+        transport = normalize_transport(interface.get("transport"))
+        interfaces.setdefault(transport, _rebase(str(interface["url"]), card_url, base_url))
+
+    if preferred in SUPPORTED_TRANSPORTS:
+        return AgentEndpoint(preferred, base_url, streaming)
+    for transport in SUPPORTED_TRANSPORTS:
+        if transport in interfaces:
+            return AgentEndpoint(transport, interfaces[transport], streaming)
+    return AgentEndpoint(JSONRPC, base_url, streaming)
+
+
+def send_request(
+    endpoint: AgentEndpoint,
+    method: str,
+    params: dict[str, Any],
+    headers: dict[str, str],
+    timeout: float,
+    inline_files: Optional[list[InlineFile]] = None,
+    stream: bool = False
+) -> "requests.Response":
+    """
+    Send an A2A method call over the endpoint's transport using the pooled session.
+    Only call inside the send callable given to send_with_limits: the body is
+    rebuilt on every attempt.
+    """
+    extra = {"stream": True} if stream else {}
+
+    if endpoint.transport == HTTP_JSON:
+        from urllib.parse import quote
+
+        verb, path = _REST_ROUTES[method]
+        url = endpoint.url.rstrip("/") + path.format(id=quote(str(params.get("id", "")), safe=""))
+        if verb == "GET":
+            query = {"historyLength": params["historyLength"]} if "historyLength" in params else None
+            return get_session().get(url, params=query, headers=headers, timeout=timeout, **extra)
+        body = {key: value for key, value in params.items() if key != "id"}
+        return get_session().post(
+            url, headers=headers, timeout=timeout, **extra, **request_payload(body, inline_files or [])
+        )
+
+    import uuid
+
+    rpc_request = {
+        "jsonrpc": "2.0",
+        "method": method,
+        "params": params,
+        "id": str(uuid.uuid4())
+    }
+    return get_session().post(
+        endpoint.url, headers=headers, timeout=timeout, **extra, **request_payload(rpc_request, inline_files or [])
+    )
+
+
+def normalize_rest_object(value: Any) -> Any:
+    """
+    Unwrap {"task": {...}} style oneof wrappers and TASK_STATE_* enum names.
+    """
+    if not isinstance(value, dict):
+        return value
+    if "kind" not in value and len(value) == 1:
+        key, inner = next(iter(value.items()))
+        if key in _REST_WRAPPERS and isinstance(inner, dict):
+            value = dict(inner)
+            value.setdefault("kind", _REST_WRAPPERS[key])
+
+    status = value.get("status")
+    if isinstance(status, dict) and str(status.get("state", "")).startswith("TASK_STATE_"):
+        state = status["state"][len("TASK_STATE_"):].lower().replace("_", "-")
+        value = {**value, "status": {**status, "state": "canceled" if state == "cancelled" else state}}
+    return value
+
+
+def read_result(endpoint: AgentEndpoint, response: "requests.Response") -> tuple[Any, Optional[Any]]:
+    """
+    Decode a unary response into (result, error).
+    Raises for transport failures, and json.JSONDecodeError for unparseable bodies
+    and JSON-RPC bodies that are not an object.
+    """
+    if endpoint.transport == HTTP_JSON:
+        if 400 <= response.status_code < 500:
+            try:
+                body = response.json()
+            except ValueError:
+                response.raise_for_status()
+            message = body.get("message", body) if isinstance(body, dict) else body
+            return None, {"code": response.status_code, "message": message}
+        response.raise_for_status()
+        return normalize_rest_object(response.json()), None
+
+    response.raise_for_status()
+    rpc_response = response.json()
+    if not isinstance(rpc_response, dict):
+        raise json.JSONDecodeError("JSON-RPC response is not an object", "", 0)
+    return rpc_response.get("result"), rpc_response.get("error")
+
+
+def read_event(endpoint: AgentEndpoint, event_data: Any) -> tuple[Any, Optional[Any]]:
+    """
+    Decode one streamed SSE event payload into (result, error).
+    """
+    if endpoint.transport == HTTP_JSON:
+        if isinstance(event_data, dict) and "error" in event_data and len(event_data) == 1:
+            return None, event_data["error"]
+        return normalize_rest_object(event_data), None
+    if not isinstance(event_data, dict):
+        return None, None
+    return event_data.get("result", {}), event_data.get("error")